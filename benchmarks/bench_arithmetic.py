@@ -0,0 +1,99 @@
+"""
+Benchmark image arithmetic against the previous float32 implementation.
+
+The previous versions promoted both inputs to float32, then clipped and cast
+the result back to uint8. The current versions work on uint8 directly
+(saturating OpenCV arithmetic, a blocked uint16 multiply, cached tables for
+the constant ops).
+
+For each op the script reports the largest absolute difference from the
+previous output (expected 0 or 1), the best time, and the peak memory
+allocated while the op runs as a multiple of the input image size.
+
+Usage:
+    python benchmarks/bench_arithmetic.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import arithmetic  # noqa: E402
+
+SHAPE = (3000, 4000, 3)
+REPEATS = 3
+
+
+# Previous implementation
+def _legacy_clip(result):
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+
+LEGACY = {
+    'add_images': lambda a, b: _legacy_clip(a.astype(np.float32) + b.astype(np.float32)),
+    'subtract_images': lambda a, b: _legacy_clip(a.astype(np.float32) - b.astype(np.float32)),
+    'absolute_difference': lambda a, b: _legacy_clip(np.abs(a.astype(np.float32) - b.astype(np.float32))),
+    'multiply_images': lambda a, b: _legacy_clip(a.astype(np.float32) * b.astype(np.float32) / 255.0),
+    'divide_images': lambda a, b: _legacy_clip(
+        a.astype(np.float32) / np.where(b == 0, 1, b).astype(np.float32) * 255.0),
+    'blend_images': lambda a, b: _legacy_clip(0.3 * a.astype(np.float32) + 0.7 * b.astype(np.float32)),
+    'add_constant': lambda a, b: _legacy_clip(a.astype(np.float32) + 40.5),
+    'multiply_constant': lambda a, b: _legacy_clip(a.astype(np.float32) * 1.7),
+}
+
+CURRENT = {
+    'add_images': arithmetic.add_images,
+    'subtract_images': arithmetic.subtract_images,
+    'absolute_difference': arithmetic.absolute_difference,
+    'multiply_images': arithmetic.multiply_images,
+    'divide_images': arithmetic.divide_images,
+    'blend_images': lambda a, b, out=None: arithmetic.blend_images(a, b, 0.3, 0.7, out=out),
+    'add_constant': lambda a, b, out=None: arithmetic.add_constant(a, 40.5, out=out),
+    'multiply_constant': lambda a, b, out=None: arithmetic.multiply_constant(a, 1.7, out=out),
+}
+
+
+def _best_ms(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * min(times)
+
+
+def _peak_ratio(fn, nbytes):
+    """Peak bytes allocated by fn, relative to one image"""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / nbytes
+
+
+def main():
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 256, SHAPE, dtype=np.uint8)
+    b = rng.integers(0, 256, SHAPE, dtype=np.uint8)
+    out = np.empty_like(a)
+    print(f"Image: {SHAPE[1]}x{SHAPE[0]} RGB uint8")
+    print(f"{'op':20} {'max diff':>8} {'legacy ms':>10} {'current ms':>10} {'speedup':>8} "
+          f"{'legacy mem':>10} {'current mem':>11} {'with out=':>9}")
+    for name, legacy in LEGACY.items():
+        current = CURRENT[name]
+        diff = np.abs(legacy(a, b).astype(np.int16) - current(a, b)).max()
+        old_ms = _best_ms(lambda: legacy(a, b))
+        new_ms = _best_ms(lambda: current(a, b, out=out))
+        old_mem = _peak_ratio(lambda: legacy(a, b), a.nbytes)
+        new_mem = _peak_ratio(lambda: current(a, b), a.nbytes)
+        out_mem = _peak_ratio(lambda: current(a, b, out=out), a.nbytes)
+        print(f"{name:20} {diff:8d} {old_ms:10.1f} {new_ms:10.1f} {old_ms / new_ms:7.1f}x "
+              f"{old_mem:9.1f}x {new_mem:10.1f}x {out_mem:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Calibrate and cross-check every op registered in processing.backends.
+
+For each op and backend the script prints the largest absolute difference
+from the reference (NumPy) implementation, the calibration time per size
+class, and which backend was chosen. It exits with status 1 if any backend
+exceeds its op's tolerance, so it can run as a check on new machines or
+after adding a backend.
+
+Usage:
+    python benchmarks/bench_backends.py
+    PROCESSING_BACKENDS=opencv python benchmarks/bench_backends.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import ops, backends  # noqa: E402,F401
+
+# Odd sizes exercise row padding and partial SIMD blocks
+CHECK_SHAPES = [(97, 131, 3), (480, 640, 3)]
+
+
+def main():
+    rng = np.random.default_rng(1)
+    timings = backends.calibrate()
+    chosen = backends.selection()
+    failed = False
+    for name, backend_names in backends.available().items():
+        op = backends._ops[name]
+        diffs = {b: 0 for b in backend_names}
+        for shape in CHECK_SHAPES:
+            img = rng.integers(0, 256, shape, dtype=np.uint8)
+            for backend, diff in backends.cross_check(name, img).items():
+                diffs[backend] = max(diffs[backend], diff)
+        print(f"{name} (tolerance {op.tolerance})")
+        for backend in backend_names:
+            bad = diffs[backend] > op.tolerance
+            failed |= bad
+            times = ', '.join(f"{size} {1000 * timings[name][size][backend]:.2f} ms"
+                              for size in timings[name] if backend in timings[name][size])
+            picked = [size for size, b in chosen[name].items() if b == backend]
+            print(f"  {backend:8} max diff {diffs[backend]:3d}{'  FAIL' if bad else ''}  {times}"
+                  f"{'  <- ' + ', '.join(picked) if picked else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Benchmark parameter tweaks in an edit chain (processing.chain).
+
+A five-stage chain (tint, gamma, sharpen, blur, brightness/contrast) runs
+once on a 12MP image; then one stage's parameter is changed and the chain
+is brought up to date again. The script compares that incremental update
+with re-running the whole chain, for a tweak of each adjustable stage, and
+checks both give the same image.
+
+Usage:
+    python benchmarks/bench_chain.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import ops  # noqa: E402
+from processing.chain import EditChain  # noqa: E402
+
+SHAPE = (3000, 4000, 3)
+
+STAGES = [
+    (ops.rgb_yellow, {}),
+    (ops.gamma_correction, {'gamma': 0.8}),
+    (ops.sharpen, {}),
+    (ops.gaussian_blur_5x5, {}),
+    (ops.brightness_contrast, {'brightness': 10, 'contrast': 1.2}),
+]
+
+TWEAKS = [
+    (1, {'gamma': 0.9}),
+    (4, {'contrast': 1.3}),
+]
+
+
+def _full(img, chain):
+    for stage in chain.stages:
+        img = stage.op(img, **stage.kwargs)
+    return img
+
+
+def main():
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, SHAPE, dtype=np.uint8)
+    chain = EditChain(img)
+    for op, kwargs in STAGES:
+        chain.append(op, **kwargs)
+    chain.result()
+    print(f"Image: {SHAPE[1]}x{SHAPE[0]} RGB uint8, {len(STAGES)} stages")
+    print(f"{'tweak':38} {'full ms':>8} {'incremental ms':>15} {'stages run':>11} {'same':>5}")
+    for index, kwargs in TWEAKS:
+        chain.set_params(index, **kwargs)
+        before = chain.evaluations
+        start = time.perf_counter()
+        result = chain.result()
+        incremental = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = _full(img, chain)
+        full = time.perf_counter() - start
+        name = f"{chain.stages[index].name} {kwargs}"
+        print(f"{name:38} {1000 * full:8.0f} {1000 * incremental:15.0f} "
+              f"{chain.evaluations - before:11d} {str(np.array_equal(result, expected)):>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark opening images through processing.decode_cache.
+
+For a large TIFF and PNG the script times a plain decode, a cache miss
+(decode plus storing the .npy entry), a hit in a new cache object (the file
+is hashed again, as in a new process) and a hit in the same cache object
+(unchanged files are not rehashed). It also reports the memory allocated
+while opening, as a multiple of the image size: a hit maps the entry
+instead of allocating it.
+
+Usage:
+    python benchmarks/bench_decode_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import io  # noqa: E402
+from processing.decode_cache import DecodeCache  # noqa: E402
+
+SHAPE = (4480, 6720, 3)  # ~30MP
+FORMATS = ('.tif', '.png')
+
+
+def _ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return 1000 * (time.perf_counter() - start), result
+
+
+def _alloc_ratio(fn, nbytes):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / nbytes
+
+
+def main():
+    rng = np.random.default_rng(0)
+    img = np.empty(SHAPE, np.uint8)
+    img[:] = np.linspace(0, 255, SHAPE[1], dtype=np.uint8)[None, :, None]
+    img += rng.integers(0, 8, SHAPE, dtype=np.uint8)
+    print(f"Image: {SHAPE[1]}x{SHAPE[0]} RGB uint8")
+    print(f"{'format':7} {'decode':>8} {'miss':>8} {'rehash hit':>10} {'hit':>8} "
+          f"{'decode mem':>10} {'hit mem':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for ext in FORMATS:
+            path = os.path.join(tmp, 'image' + ext)
+            io.write_image(path, img)
+            store = os.path.join(tmp, 'cache' + ext)
+            decode, _ = _ms(lambda: io.read_image(path))
+            cache = DecodeCache(store)
+            miss, _ = _ms(lambda: cache.read_image(path))
+            rehash, _ = _ms(lambda: DecodeCache(store).read_image(path))
+            hit, mapped = _ms(lambda: cache.read_image(path))
+            assert np.array_equal(mapped, img)
+            decode_mem = _alloc_ratio(lambda: io.read_image(path), img.nbytes)
+            hit_mem = _alloc_ratio(lambda: cache.read_image(path), img.nbytes)
+            print(f"{ext:7} {decode:6.0f}ms {miss:6.0f}ms {rehash:8.0f}ms {hit:6.2f}ms "
+                  f"{decode_mem:9.2f}x {hit_mem:7.3f}x")
+
+
+if __name__ == '__main__':
+    main()
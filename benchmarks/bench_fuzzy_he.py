@@ -0,0 +1,125 @@
+"""
+Benchmark fuzzy histogram equalization against the previous implementation.
+
+The previous version built three float32 membership maps per channel and
+blended three identical cv2.equalizeHist results with them. The current
+version builds one 256-entry table per channel from a single histogram and
+applies it in one pass.
+
+Equivalence is reported two ways:
+  * legacy vs legacy-as-LUT: the previous per-pixel computation evaluated
+    once per intensity, showing the single-pass LUT technique reproduces a
+    per-pixel fuzzy blend exactly;
+  * legacy vs current: how far the real fuzzy equalization moves from the
+    previous output (which was plain equalization minus rounding).
+
+Usage:
+    python benchmarks/bench_fuzzy_he.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import histogram  # noqa: E402
+
+SHAPE = (3000, 4000)
+REPEATS = 3
+
+
+# Previous implementation
+def _legacy_triangular_membership(x, center, width):
+    left = center - width
+    right = center + width
+    membership = np.zeros_like(x, dtype=np.float32)
+    mask_left = (x >= left) & (x < center)
+    mask_right = (x >= center) & (x <= right)
+    membership[mask_left] = (x[mask_left] - left) / (center - left)
+    membership[mask_right] = (right - x[mask_right]) / (right - center)
+    return membership
+
+
+def _legacy_equalize_channel(channel, eq=None):
+    dark = _legacy_triangular_membership(channel, 64, 64)
+    medium = _legacy_triangular_membership(channel, 128, 64)
+    bright = _legacy_triangular_membership(channel, 192, 64)
+    for _ in range(3):
+        cv2.calcHist([channel.astype(np.uint8)], [0], None, [256], [0, 256])
+    if eq is None:
+        eq = [cv2.equalizeHist(channel.astype(np.uint8)) for _ in range(3)]
+    return (dark * eq[0] + medium * eq[1] + bright * eq[2]) / (dark + medium + bright + 1e-6)
+
+
+def legacy_rgb(img):
+    img_f = img.astype(np.float32)
+    channels = [_legacy_equalize_channel(img_f[:, :, ch]) for ch in range(3)]
+    return np.clip(cv2.merge(channels), 0, 255).astype(np.uint8)
+
+
+def legacy_gray(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    eq = _legacy_equalize_channel(gray.astype(np.float32))
+    return np.clip(np.stack([eq, eq, eq], axis=2), 0, 255).astype(np.uint8)
+
+
+def _legacy_lut(channel):
+    """The previous per-pixel formula evaluated once per intensity"""
+    levels = np.arange(256, dtype=np.float32)
+    eq = histogram.equalization_lut(cv2.calcHist([channel], [0], None, [256], [0, 256]))
+    eq = eq.astype(np.uint8)
+    values = _legacy_equalize_channel(levels, [eq, eq, eq])
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+def legacy_rgb_as_lut(img):
+    return cv2.merge([cv2.LUT(img[:, :, ch], _legacy_lut(img[:, :, ch])) for ch in range(3)])
+
+
+def _best_ms(fn, img):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(img)
+        times.append(time.perf_counter() - start)
+    return 1000 * min(times)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    # Smooth, low-contrast content so equalization has something to do
+    base = rng.normal(110, 25, (SHAPE[0] // 8, SHAPE[1] // 8, 3))
+    img = cv2.resize(base, (SHAPE[1], SHAPE[0]), interpolation=cv2.INTER_CUBIC)
+    img = np.clip(img + rng.normal(0, 8, img.shape), 0, 255).astype(np.uint8)
+    print(f"Image: {SHAPE[1]}x{SHAPE[0]} RGB")
+
+    ref_rgb = legacy_rgb(img)
+    lut_rgb = legacy_rgb_as_lut(img)
+    new_rgb = histogram.fuzzy_histogram_equalization_rgb(img)
+    ref_gray = legacy_gray(img)
+    new_gray = histogram.fuzzy_histogram_equalization_grayscale(img)
+
+    print("Equivalence")
+    print(f"  legacy RGB vs legacy-as-LUT: max abs diff "
+          f"{np.abs(ref_rgb.astype(int) - lut_rgb).max()}")
+    print(f"  legacy RGB vs current:       mean abs diff "
+          f"{np.abs(ref_rgb.astype(int) - new_rgb).mean():.2f}")
+    print(f"  legacy gray vs current:      mean abs diff "
+          f"{np.abs(ref_gray[:, :, 0].astype(int) - new_gray).mean():.2f}")
+
+    print("Speed (best of %d)" % REPEATS)
+    for name, legacy, current in [
+        ('RGB', legacy_rgb, histogram.fuzzy_histogram_equalization_rgb),
+        ('grayscale', legacy_gray, histogram.fuzzy_histogram_equalization_grayscale),
+    ]:
+        old_ms = _best_ms(legacy, img)
+        new_ms = _best_ms(current, img)
+        print(f"  {name:9}: legacy {old_ms:8.1f} ms, current {new_ms:7.1f} ms, "
+              f"{old_ms / new_ms:5.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the undo/redo history in processing.history on a 50MP image.
+
+Twenty steps are pushed and then undone one at a time, first for whole-image
+ops (every tile changes) and then for local edits (a small patch per step,
+so unchanged tiles are shared). For each run the script reports the memory
+the history holds against keeping every result (20 x the image size), the
+time per push and the time per undo, with dropped results either replayed
+or spilled to disk.
+
+Usage:
+    python benchmarks/bench_history.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import ops  # noqa: E402
+from processing.history import History  # noqa: E402
+
+SHAPE = (5773, 8660, 3)  # ~50MP
+STEPS = 20
+BUDGET = 1024 * 1024 * 1024
+
+
+def _patch(img, step):
+    """Local edit: darken one 200x200 patch"""
+    out = img.copy()
+    y, x = 250 * step, 400 * step
+    out[y:y + 200, x:x + 200] //= 2
+    return out
+
+
+def _run(name, img, step_op, spill_dir):
+    history = History(budget_bytes=BUDGET, spill_dir=spill_dir)
+    history.reset(img)
+    current = img
+    push = 0.0
+    for step in range(STEPS):
+        current = step_op(current, step)
+        start = time.perf_counter()
+        history.push(current, step_op, (step,))
+        push += time.perf_counter() - start
+    held = history.memory_bytes()
+    start = time.perf_counter()
+    while history.can_undo():
+        history.undo()
+        history.image()
+    undo = time.perf_counter() - start
+    storage = [e.storage for e in history.entries[1:]]
+    history.close()
+    mode = 'spill' if spill_dir else 'replay'
+    print(f"{name:12} {mode:7} {held / 2**20:8.0f} MB {STEPS * img.nbytes / 2**20:8.0f} MB "
+          f"{1000 * push / STEPS:8.0f} ms {1000 * undo / STEPS:8.0f} ms  "
+          f"{storage.count('memory')} in memory, {storage.count('disk')} on disk")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, SHAPE, dtype=np.uint8)
+    img.setflags(write=False)
+    print(f"Image: {SHAPE[1]}x{SHAPE[0]} RGB uint8 ({img.nbytes / 2**20:.0f} MB), "
+          f"{STEPS} steps, budget {BUDGET / 2**20:.0f} MB")
+    print(f"{'steps':12} {'dropped':7} {'held':>11} {'naive':>11} {'push':>11} {'undo':>11}")
+
+    def whole(current, step):
+        return ops.gamma_correction(current, gamma=0.9 + 0.01 * step)
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        for spill in (None, spill_dir):
+            _run('whole-image', img, whole, spill)
+        _run('local patch', img, _patch, None)
+
+
+if __name__ == '__main__':
+    main()
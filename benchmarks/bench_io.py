@@ -0,0 +1,89 @@
+"""
+Benchmark image file I/O in processing.io against the previous Qt path.
+
+Opening used to decode with QPixmap(file_path) and convert the pixmap to an
+array; saving went through QPixmap.save on the GUI thread. processing.io
+decodes with cv2.imdecode straight to an array and encodes with
+cv2.imencode. The script times both on a ~30MP photo-like image, plus the
+reduced JPEG decodes used for previews and the time save_output_as now
+blocks the GUI thread (queueing the write on the background writer).
+
+Usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_io.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import cv2
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QPixmap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import io  # noqa: E402
+from processing.qt import numpy_to_pixmap, pixmap_to_numpy  # noqa: E402
+
+SHAPE = (4480, 6720, 3)  # ~30MP
+FORMATS = ('.jpg', '.png', '.tif')
+REPEATS = 3
+
+
+def _best_ms(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * min(times)
+
+
+def _photo(shape):
+    """Smooth gradients with mild noise, so the codecs see photo-like data"""
+    rng = np.random.default_rng(0)
+    h, w = shape[:2]
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, w, dtype=np.float32)[None, :]
+    base = np.dstack(np.broadcast_arrays(x * 255, y * 255, (1 - x * y) * 255))
+    small = rng.normal(0, 4, (h // 8, w // 8, 3)).astype(np.float32)
+    base += cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.clip(base, 0, 255).astype(np.uint8)
+
+
+def main():
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841 (QPixmap needs it)
+    img = _photo(SHAPE)
+    pixmap = numpy_to_pixmap(img)
+    print(f"Image: {SHAPE[1]}x{SHAPE[0]} RGB uint8 ({SHAPE[0] * SHAPE[1] / 1e6:.0f}MP)")
+    print(f"{'format':7} {'Qt open':>9} {'io open':>9} {'Qt save':>9} {'io save':>9} "
+          f"{'GUI block':>9} {'size MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for ext in FORMATS:
+            path = os.path.join(tmp, 'image' + ext)
+            io.write_image(path, img)
+            qt_open = _best_ms(lambda: pixmap_to_numpy(QPixmap(path)))
+            io_open = _best_ms(lambda: io.read_image(path, keep_depth=True))
+            qt_save = _best_ms(lambda: pixmap.save(os.path.join(tmp, 'qt' + ext)))
+            io_save = _best_ms(lambda: io.write_image(os.path.join(tmp, 'io' + ext), img))
+            with io.ImageWriter() as writer:
+                futures = []
+                block = _best_ms(lambda: futures.append(
+                    writer.submit(os.path.join(tmp, 'async' + ext), img)))
+            for future in futures:
+                future.result()
+            size = os.path.getsize(path) / 1e6
+            print(f"{ext:7} {qt_open:8.0f}ms {io_open:8.0f}ms {qt_save:8.0f}ms {io_save:8.0f}ms "
+                  f"{block:8.2f}ms {size:8.1f}")
+
+        path = os.path.join(tmp, 'image.jpg')
+        print("\nReduced JPEG decode (previews):")
+        for reduce in io.REDUCTIONS:
+            ms = _best_ms(lambda: io.read_image(path, reduce=reduce))
+            shape = io.read_image(path, reduce=reduce).shape
+            print(f"  1/{reduce}: {ms:7.0f} ms  {shape[1]}x{shape[0]}")
+
+
+if __name__ == '__main__':
+    main()
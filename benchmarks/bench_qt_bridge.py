@@ -0,0 +1,136 @@
+"""
+Benchmark the QPixmap/QImage <-> NumPy bridge in processing.qt.
+
+Compares the previous conversion path (ARGB32 readback, BGRA slice + copy,
+np.stack/ascontiguousarray, QImage.copy) with the zero-copy bridge, and
+counts how many full-frame buffers each path allocates.
+
+Usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_qt_bridge.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QPixmap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing.qt import numpy_to_qimage, qimage_to_numpy  # noqa: E402
+
+FRAMES = {
+    '12MP': (3000, 4000),
+    '50MP': (5773, 8660),
+}
+REPEATS = 5
+
+
+def _buffer_range(obj):
+    """Byte range of the pixel buffer behind an array or QImage (None for QPixmap)"""
+    if isinstance(obj, np.ndarray):
+        start = end = obj.__array_interface__['data'][0]
+        for size, stride in zip(obj.shape, obj.strides):
+            if stride < 0:
+                start += stride * (size - 1)
+            else:
+                end += stride * (size - 1)
+        return start, end + obj.itemsize
+    if isinstance(obj, QImage):
+        start = int(obj.constBits())
+        return start, start + obj.sizeInBytes()
+    return None
+
+
+def _run_steps(steps, value):
+    """Apply steps in order, counting those whose output lives in a new buffer"""
+    copies = 0
+    for step in steps:
+        result = step(value)
+        before, after = _buffer_range(value), _buffer_range(result)
+        if after is None or before is None or after[0] >= before[1] or after[1] <= before[0]:
+            copies += 1
+        value = result
+    return value, copies
+
+
+# Previous implementation, step by step
+def _legacy_to_numpy_steps():
+    def readback(pix):
+        return pix.toImage()
+
+    def to_argb32(img):
+        return img.convertToFormat(QImage.Format_ARGB32)
+
+    def bgra_view(img):
+        ptr = img.bits()
+        ptr.setsize(img.byteCount())
+        arr = np.frombuffer(ptr, np.uint8).reshape((img.height(), img.bytesPerLine() // 4, 4))
+        return arr[:, :img.width(), 0:3][:, :, ::-1]
+
+    def detach(arr):
+        return arr.copy()
+
+    return [readback, to_argb32, bgra_view, detach]
+
+
+def _legacy_to_pixmap_steps(gray):
+    steps = []
+    if gray:
+        steps.append(lambda arr: np.stack([arr, arr, arr], axis=2))
+    steps.append(np.ascontiguousarray)
+
+    def wrap(arr):
+        qimg = QImage(arr.data, arr.shape[1], arr.shape[0], 3 * arr.shape[1], QImage.Format_RGB888)
+        qimg._array = arr
+        return qimg
+
+    steps.append(wrap)
+    steps.append(lambda qimg: qimg.copy())
+    steps.append(QPixmap.fromImage)
+    return steps
+
+
+def _bridge_to_numpy_steps():
+    return [lambda pix: pix.toImage(), qimage_to_numpy]
+
+
+def _bridge_to_pixmap_steps():
+    return [numpy_to_qimage, QPixmap.fromImage]
+
+
+def _measure(steps, value):
+    times = []
+    copies = 0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        _, copies = _run_steps(steps, value)
+        times.append(time.perf_counter() - start)
+    return copies, 1000 * min(times)
+
+
+def main():
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841
+    rng = np.random.default_rng(0)
+    print(f"{'frame':6} {'direction':22} {'path':7} {'copies':>6} {'best ms':>9}")
+    for label, (h, w) in FRAMES.items():
+        rgb = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        gray = rgb[:, :, 0].copy()
+        pix = QPixmap.fromImage(numpy_to_qimage(rgb))
+
+        cases = [
+            ('QPixmap -> ndarray', 'legacy', _legacy_to_numpy_steps(), pix),
+            ('QPixmap -> ndarray', 'bridge', _bridge_to_numpy_steps(), pix),
+            ('RGB ndarray -> QPixmap', 'legacy', _legacy_to_pixmap_steps(False), rgb),
+            ('RGB ndarray -> QPixmap', 'bridge', _bridge_to_pixmap_steps(), rgb),
+            ('gray ndarray -> QPixmap', 'legacy', _legacy_to_pixmap_steps(True), gray),
+            ('gray ndarray -> QPixmap', 'bridge', _bridge_to_pixmap_steps(), gray),
+        ]
+        for direction, path, steps, value in cases:
+            copies, best = _measure(steps, value)
+            print(f"{label:6} {direction:22} {path:7} {copies:6d} {best:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,57 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QAction, QMenu
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QAction, QMenu, QDialog
 from PyQt5 import uic
-from PyQt5.QtWidgets import QFileDialog, QMessageBox, QGraphicsScene, QInputDialog
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QGraphicsScene, QInputDialog, QProgressBar, QPushButton
 from PyQt5.QtGui import QPixmap, QPainter
 from PyQt5.QtCore import Qt, QRectF
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UI_DIR = os.path.join(BASE_DIR, 'ui')
 
+# Parameter sliders of the adjustable ops: (name, label, minimum, maximum, default, decimals)
+OP_PARAMS = {
+    'gamma_correction': [('gamma', 'Gamma', 0.01, 10.0, 1.0, 2)],
+    'brightness_contrast': [('brightness', 'Brightness', -255, 255, 0, 0),
+                            ('contrast', 'Contrast (>0)', 0.01, 10.0, 1.0, 2)],
+    'bit_depth': [('bits', 'Bits', 1, 7, 4, 0)],
+}
+
+
+def _apply_op(fn, arr, args, kwargs):
+    """Run an op as the window does; also replays steps of the undo history"""
+    import numpy as np
+    out = fn(arr, *args, **kwargs)
+    # Results keep the input's depth (16-bit and float images are saved as
+    # such); other types from an 8-bit input, e.g. float gradients, are saturated
+    if out.dtype != arr.dtype and arr.dtype == np.uint8:
+        out = np.clip(out, 0, 255).astype(np.uint8)
+    return out
+
+
+def _run_op(fn, arr, args, kwargs):
+    """Worker-thread part of an operation: compute and wrap the result for display"""
+    from processing.qt import numpy_to_qimage
+    out = _apply_op(fn, arr, args, kwargs)
+    # Grayscale (H, W) results are displayed as Grayscale8 directly
+    return out, numpy_to_qimage(out)
+
+
+def _run_replay(img, steps):
+    """Worker-thread part of undo/redo: recompute a result the history dropped"""
+    from processing.qt import numpy_to_qimage
+    for fn, args, kwargs in steps:
+        img = _apply_op(fn, img, args, kwargs)
+    return img, numpy_to_qimage(img)
+
+
+def _run_chain(chain):
+    """Worker-thread part of chained mode: bring the edit chain up to date"""
+    from processing.qt import numpy_to_qimage
+    out = chain.result()
+    return out, numpy_to_qimage(out)
+
+
 class TentangWindow(QWidget):
     def __init__(self, parent=None, on_close=None):
         super().__init__(parent)
@@ -41,6 +84,11 @@ class MainWindow(QMainWindow):
         # Internal state
         self._input_pixmap: QPixmap = None
         self._output_pixmap: QPixmap = None
+        # Read-only arrays of the images above, converted once per image
+        self._input_array = None
+        self._output_array = None
+        # Downscaled copies of the input for live previews, built on first use
+        self._preview_pyramid = None
 
         buka_action = self.findChild(QAction, 'actionBuka')
         if buka_action is not None:
@@ -50,6 +98,10 @@ class MainWindow(QMainWindow):
         if simpan_sebagai is not None:
             simpan_sebagai.triggered.connect(self.save_output_as)
 
+        ekspor_resep = self.findChild(QAction, 'actionEkspor_Resep')
+        if ekspor_resep is not None:
+            ekspor_resep.triggered.connect(self.export_recipe)
+
         keluar_action = self.findChild(QAction, 'actionKeluar')
         if keluar_action is not None:
             keluar_action.triggered.connect(self.close)
@@ -85,6 +137,38 @@ class MainWindow(QMainWindow):
         # Wire standalone Edge Detection menu actions
         self._wire_edge_detection_actions()
 
+        # Background processing: ops run off the GUI thread, progress shown in the status bar
+        from ui.jobs import BackgroundWriter, JobRunner
+        self._jobs = JobRunner(self)
+        self._jobs.finished.connect(self._on_job_finished)
+        self._jobs.failed.connect(self._on_job_failed)
+        self._jobs.busy_changed.connect(self._on_job_busy)
+        self._progress_bar = QProgressBar()
+        self._progress_bar.setRange(0, 0)  # busy indicator, ops do not report progress
+        self._progress_bar.setMaximumWidth(160)
+        self._progress_bar.hide()
+        self._cancel_button = QPushButton('Batal')
+        self._cancel_button.clicked.connect(self._jobs.cancel)
+        self._cancel_button.hide()
+        self.statusBar().addPermanentWidget(self._progress_bar)
+        self.statusBar().addPermanentWidget(self._cancel_button)
+        # Saved files are encoded off the GUI thread too
+        self._writer = BackgroundWriter(self)
+        self._writer.saved.connect(self._on_saved)
+        self._writer.failed.connect(self._on_save_failed)
+
+        # Undo/redo of results; older results are dropped past the memory
+        # budget and recomputed from the input when they are stepped back to
+        from processing.history import History
+        self._history = History(apply=_apply_op)
+        self._submitted_op = None  # (fn, args, kwargs, label) of the latest job
+        self._replaying = None  # history entry the latest job recomputes
+        # Chained mode: each op applies to the previous result, stages cached
+        from processing.chain import EditChain
+        self._chain = EditChain(apply=_apply_op)
+        self._chained = False
+        self._wire_edit_actions()
+
     def _display_pixmap_on_left(self, pixmap: QPixmap):
         if pixmap.isNull():
             QMessageBox.warning(self, 'Gagal Membuka', 'Gambar tidak valid atau tidak dapat dimuat.')
@@ -112,13 +196,32 @@ class MainWindow(QMainWindow):
         )
         if not file_path:
             return
-        pixmap = QPixmap(file_path)
-        if pixmap.isNull():
+        from processing.qt import numpy_to_pixmap
+        from processing.utils import _readonly
+        from processing.decode_cache import load_image
+        try:
+            # Decode at the file's own depth (or map it from the decode cache);
+            # the pixmap is an 8-bit copy for display
+            arr = load_image(file_path, keep_depth=True)
+        except ValueError:
             QMessageBox.warning(self, 'Gagal Membuka', 'Tidak dapat memuat file gambar yang dipilih.')
             return
+        pixmap = numpy_to_pixmap(arr)
+        # A job still running belongs to the previous image: drop its result
+        # rather than show it or record it in the new image's history
+        self._jobs.cancel()
+        self._submitted_op = None
+        self._replaying = None
         self._current_image_path = file_path
         self._input_pixmap = pixmap
+        self._input_array = _readonly(arr)
         self._output_pixmap = None
+        self._output_array = None
+        self._preview_pyramid = None
+        self._history.reset(self._input_array, os.path.basename(file_path))
+        self._chain.clear()
+        self._chain.set_source(self._input_array)
+        self._update_history_actions()
         self._display_pixmap_on_left(pixmap)
         self._right_scene.clear()
         self.statusBar().showMessage(f'Terbuka: {os.path.basename(file_path)}', 5000)
@@ -160,30 +263,54 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, 'Simpan', f'Gagal membuat direktori: {e}')
                 return
 
-        # Try to save with better error handling
-        try:
-            # Ensure pixmap is valid
-            if self._output_pixmap.isNull():
-                QMessageBox.warning(self, 'Simpan', 'Gambar output tidak valid.')
-                return
+        # Write the array rather than the pixmap, so grayscale results are saved
+        # as 8-bit single-channel files instead of the 32-bit display format.
+        # Encoding runs on the writer thread; the array is read-only, so it is safe
+        self.statusBar().showMessage(f'Menyimpan: {os.path.basename(file_path)}')
+        self._writer.save(file_path, self._output_array, quality=95)
 
-            # Try to save
-            success = self._output_pixmap.save(file_path)
+    def export_recipe(self):
+        """Save the ops behind the current result as a recipe for batch mode"""
+        if self._chained:
+            recipe = self._chain.recipe()
+        else:
+            entry = self._history.current
+            # Every op starts from the input, so the recipe is the current step alone
+            recipe = [] if entry is None or entry is self._history.root else \
+                [{'op': entry.op.__name__, **entry.kwargs}]
+        if not recipe:
+            QMessageBox.information(self, 'Ekspor Resep', 'Tidak ada operasi untuk diekspor. Lakukan pemrosesan terlebih dahulu.')
+            return
 
-            if success:
-                self.statusBar().showMessage(f'Tersimpan: {os.path.basename(file_path)}', 5000)
-            else:
-                # Try alternative approach for JPEG
-                if file_path.lower().endswith(('.jpg', '.jpeg')):
-                    # For JPEG, try converting to RGB first if needed
-                    temp_pixmap = self._output_pixmap
-                    success = temp_pixmap.save(file_path, 'JPEG', 95)  # 95% quality
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            'Ekspor Resep',
+            '',
+            'JSON (*.json);;YAML (*.yaml *.yml)'
+        )
+        if not file_path:
+            return
+        if selected_filter.startswith('YAML'):
+            if not any(file_path.lower().endswith(ext) for ext in ['.yaml', '.yml']):
+                file_path += '.yaml'
+        elif not file_path.lower().endswith('.json'):
+            file_path += '.json'
 
-                if not success:
-                    QMessageBox.warning(self, 'Simpan', f'Gagal menyimpan gambar ke: {file_path}\nPeriksa izin file dan direktori.')
+        from processing.recipe import save_recipe
+        try:
+            save_recipe(file_path, recipe)
+        except (OSError, ImportError, ValueError) as e:
+            QMessageBox.warning(self, 'Ekspor Resep', f'Gagal menyimpan resep ke: {file_path}\n{e}')
+            return
+        self.statusBar().showMessage(f'Resep tersimpan: {os.path.basename(file_path)} '
+                                     f'({len(recipe)} langkah)', 5000)
+
+    def _on_saved(self, file_path):
+        self.statusBar().showMessage(f'Tersimpan: {os.path.basename(file_path)}', 5000)
 
-        except Exception as e:
-            QMessageBox.warning(self, 'Simpan', f'Error saat menyimpan: {str(e)}')
+    def _on_save_failed(self, file_path, message):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, 'Simpan', f'Gagal menyimpan gambar ke: {file_path}\n{message}')
 
     def _reset_tentang_window(self):
         self.tentang_window = None
@@ -196,29 +323,180 @@ class MainWindow(QMainWindow):
         return True
 
     def _apply_and_show(self, fn, checked=False, *args, **kwargs):
-        """Run fn on input image (numpy), show result on right."""
+        """Run fn on input image (numpy) in the background, show result on right."""
         if not self._require_input():
             return
-        from processing.qt import pixmap_to_numpy, numpy_to_pixmap
-        import numpy as np
-        arr = pixmap_to_numpy(self._input_pixmap)
-        try:
-            out = fn(arr, *args, **kwargs)
-        except Exception as e:
-            QMessageBox.warning(self, 'Error', f'Gagal memproses gambar: {e}')
+        label = getattr(fn, '__name__', 'operasi')
+        if self._chained:
+            # Stages take keyword parameters only, which is all the menus pass
+            self._chain.append(fn, label, **kwargs)
+            self._submit_chain(label)
             return
-        # Ensure uint8 RGB
-        if out.dtype != np.uint8:
-            out = np.clip(out, 0, 255).astype(np.uint8)
-        if out.ndim == 2:
-            out = np.stack([out, out, out], axis=2)
-        out_pix = numpy_to_pixmap(out)
+        self._submitted_op = (fn, args, kwargs, label)
+        self._replaying = None
+        self._jobs.submit(_run_op, fn, self._input_array, args, kwargs, label=label)
+
+    def _submit_chain(self, label):
+        """Recompute the edit chain from its first dirty stage in the background"""
+        self._submitted_op = None
+        self._replaying = None
+        self._update_history_actions()
+        if not len(self._chain):
+            self._output_pixmap = None
+            self._output_array = None
+            self._right_scene.clear()
+            return
+        self._jobs.submit(_run_chain, self._chain, label=label)
+
+    def _on_job_finished(self, result):
+        """Receive a finished operation on the GUI thread and display it"""
+        from processing.utils import _readonly
+        out, qimg = result
+        out_pix = QPixmap.fromImage(qimg)
         # Ensure pixmap is valid before storing
         if out_pix.isNull():
             QMessageBox.warning(self, 'Error', 'Gagal membuat gambar output yang valid.')
             return
         self._output_pixmap = out_pix
+        self._output_array = _readonly(out)
         self._display_pixmap_on_right(out_pix)
+        # Only the latest submission is delivered, so this is its result.
+        # Every op starts from the input image, which is the history's root;
+        # in chained mode the edit chain keeps the steps instead
+        if self._submitted_op is not None:
+            fn, args, kwargs, label = self._submitted_op
+            self._history.push(self._output_array, fn, args, kwargs, label,
+                               parent=self._history.root)
+        elif self._replaying is not None:
+            self._history.store(self._replaying, self._output_array)
+            self._replaying = None
+        self._update_history_actions()
+
+    # ---- Undo / redo ----
+    def _wire_edit_actions(self):
+        self._undo_action = self.findChild(QAction, 'actionUrungkan')
+        if self._undo_action is not None:
+            self._undo_action.triggered.connect(self._undo)
+        self._redo_action = self.findChild(QAction, 'actionUlangi')
+        if self._redo_action is not None:
+            self._redo_action.triggered.connect(self._redo)
+        chained = self.findChild(QAction, 'actionMode_Berantai')
+        if chained is not None:
+            chained.toggled.connect(self._on_chained_mode)
+        edit_step = self.findChild(QAction, 'actionUbah_Langkah')
+        if edit_step is not None:
+            edit_step.triggered.connect(self._edit_chain_step)
+        self._update_history_actions()
+
+    def _update_history_actions(self):
+        # Chained mode undoes stages of the chain, normal mode steps through results
+        steps = self._chain if self._chained else self._history
+        if self._undo_action is not None:
+            self._undo_action.setEnabled(steps.can_undo())
+        if self._redo_action is not None:
+            self._redo_action.setEnabled(steps.can_redo())
+
+    def _undo(self):
+        if self._chained:
+            stage = self._chain.undo()
+            if stage is not None:
+                self._submit_chain(f'urungkan {stage.label}')
+            return
+        entry = self._history.undo()
+        if entry is not None:
+            self._show_history_entry(entry)
+
+    def _redo(self):
+        if self._chained:
+            stage = self._chain.redo()
+            if stage is not None:
+                self._submit_chain(stage.label)
+            return
+        entry = self._history.redo()
+        if entry is not None:
+            self._show_history_entry(entry)
+
+    def _show_history_entry(self, entry):
+        """Show the result recorded at entry on the right; the root clears the output"""
+        from processing.qt import numpy_to_pixmap
+        if self._replaying is not None:
+            # A result being recomputed for an earlier undo/redo is not wanted now
+            self._jobs.cancel()
+            self._replaying = None
+        source, steps = self._history.replay_steps(entry)
+        if entry is self._history.root:
+            self._output_pixmap = None
+            self._output_array = None
+            self._right_scene.clear()
+        elif steps:
+            # The result was dropped; replay the ops off the GUI thread and
+            # keep the result in the history when it arrives
+            self._submitted_op = None
+            self._replaying = entry
+            self._jobs.submit(_run_replay, self._history.image(source),
+                              [(s.op, s.args, s.kwargs) for s in steps], label=entry.label)
+        else:
+            self._output_array = self._history.image(entry)
+            self._output_pixmap = numpy_to_pixmap(self._output_array)
+            self._display_pixmap_on_right(self._output_pixmap)
+        self._update_history_actions()
+        self.statusBar().showMessage(f'Riwayat: {entry.label or "gambar asli"}', 3000)
+
+    # ---- Chained mode ----
+    def _on_chained_mode(self, checked):
+        """Start a new edit chain from the input image, or go back to single ops"""
+        self._jobs.cancel()
+        self._chained = checked
+        self._chain.clear()
+        self._chain.set_source(self._input_array)
+        if checked:
+            self._output_pixmap = None
+            self._output_array = None
+            self._right_scene.clear()
+            self.statusBar().showMessage('Mode berantai: operasi diterapkan ke hasil sebelumnya', 5000)
+        self._update_history_actions()
+
+    def _edit_chain_step(self):
+        """Change the parameters of an earlier step; that step and later ones are recomputed"""
+        if not self._chained or not len(self._chain):
+            QMessageBox.information(self, 'Ubah Langkah', 'Aktifkan Mode Berantai dan terapkan operasi terlebih dahulu.')
+            return
+        stages = self._chain.stages
+        items = [f'{i + 1}. {s.label} ' + ', '.join(f'{k}={v}' for k, v in s.kwargs.items())
+                 for i, s in enumerate(stages)]
+        item, ok = QInputDialog.getItem(self, 'Ubah Langkah', 'Langkah:', items, len(items) - 1, False)
+        if not ok:
+            return
+        index = items.index(item)
+        stage = stages[index]
+        params = OP_PARAMS.get(stage.name)
+        if params is None:
+            QMessageBox.information(self, 'Ubah Langkah', f'{stage.label} tidak memiliki parameter.')
+            return
+        source = self._chain.input_of(index)
+        if source is None:
+            QMessageBox.information(self, 'Ubah Langkah', 'Tunggu hingga pemrosesan selesai.')
+            return
+        # Sliders start from the step's current values
+        params = [(n, lbl, lo, hi, stage.kwargs.get(n, default), dec)
+                  for n, lbl, lo, hi, default, dec in params]
+        fixed = {k: v for k, v in stage.kwargs.items() if k not in {p[0] for p in params}}
+        values = self._ask_with_preview(stage.label, stage.op, params, source=source, **fixed)
+        if values is None:
+            return
+        self._chain.set_params(index, **values)
+        self._submit_chain(f'{stage.label} dan {len(stages) - index - 1} langkah berikutnya')
+
+    def _on_job_failed(self, message):
+        QMessageBox.warning(self, 'Error', f'Gagal memproses gambar: {message}')
+
+    def _on_job_busy(self, busy, label):
+        self._progress_bar.setVisible(busy)
+        self._cancel_button.setVisible(busy)
+        if busy:
+            self.statusBar().showMessage(f'Memproses: {label}...')
+        else:
+            self.statusBar().clearMessage()
 
     def _wire_colors_actions(self):
         from functools import partial
@@ -282,35 +560,88 @@ class MainWindow(QMainWindow):
                 act.triggered.connect(partial(self._apply_and_show, ops.bit_depth, bits=bits))
 
     # Parameterized handlers
+    def _show_preview(self, arr):
+        """Show a downscaled result on the right, stretched over the full-size image rect"""
+        from processing.qt import numpy_to_pixmap
+        full_h, full_w = self._input_array.shape[:2]
+        pix = numpy_to_pixmap(arr)
+        self._right_scene.clear()
+        item = self._right_scene.addPixmap(pix)
+        item.setTransformationMode(Qt.SmoothTransformation)
+        item.setScale(full_w / arr.shape[1])
+        rect = QRectF(0, 0, full_w, full_h)
+        self._right_scene.setSceneRect(rect)
+        self.graphicsView_2.fitInView(rect, Qt.KeepAspectRatio)
+
+    def _working_array(self):
+        """Image the next op applies to: the input, or the chain's result in chained mode"""
+        if self._chained and len(self._chain):
+            cached = self._chain.stages[-1].result
+            if cached is not None:
+                return cached
+        return self._input_array
+
+    def _ask_with_preview(self, title, fn, params, source=None, **fixed):
+        """Show parameter sliders with a live preview of fn; returns chosen values or None
+
+        The preview runs on the pyramid level matching the output view size,
+        of source (default: the image the next op applies to); the caller
+        renders full resolution once the values are committed.
+        """
+        from processing.preview import PreviewPyramid
+        from ui.preview_dialog import PreviewDialog
+        source = self._working_array() if source is None else source
+        if self._preview_pyramid is None or self._preview_pyramid.full is not source:
+            self._preview_pyramid = PreviewPyramid(source)
+        viewport = self.graphicsView_2.viewport().size()
+        level = self._preview_pyramid.level_for(viewport.width(), viewport.height())
+
+        def preview(values):
+            try:
+                self._show_preview(fn(level, **fixed, **values))
+            except Exception as e:
+                self.statusBar().showMessage(f'Pratinjau gagal: {e}', 3000)
+
+        dialog = PreviewDialog(self, title, params, preview)
+        preview(dialog.values())
+        accepted = dialog.exec_() == QDialog.Accepted
+        # Put back the last committed result until the full-resolution one arrives
+        if self._output_pixmap is not None:
+            self._display_pixmap_on_right(self._output_pixmap)
+        else:
+            self._right_scene.clear()
+        return dialog.values() if accepted else None
+
     def _on_gamma(self):
         if not self._require_input():
             return
-        gamma, ok = QInputDialog.getDouble(self, 'Gamma Correction', 'Gamma (e.g., 0.5..3.0):', 1.0, 0.01, 10.0, 2)
-        if not ok:
-            return
         from processing import ops
-        self._apply_and_show(ops.gamma_correction, gamma=gamma)
+        values = self._ask_with_preview('Gamma Correction', ops.gamma_correction,
+                                        OP_PARAMS['gamma_correction'])
+        if values is None:
+            return
+        self._apply_and_show(ops.gamma_correction, **values)
 
     def _on_contrast_only(self):
         if not self._require_input():
             return
-        contrast, ok = QInputDialog.getDouble(self, 'Contrast', 'Factor (>0, e.g., 1.2):', 1.2, 0.01, 10.0, 2)
-        if not ok:
-            return
         from processing import ops
-        self._apply_and_show(ops.brightness_contrast, brightness=0.0, contrast=contrast)
+        values = self._ask_with_preview('Contrast', ops.brightness_contrast,
+                                        [('contrast', 'Factor (>0)', 0.01, 10.0, 1.2, 2)],
+                                        brightness=0.0)
+        if values is None:
+            return
+        self._apply_and_show(ops.brightness_contrast, brightness=0.0, **values)
 
     def _on_brightness_contrast(self):
         if not self._require_input():
             return
-        brightness, ok1 = QInputDialog.getInt(self, 'Brightness - Contrast', 'Brightness (-255..255):', 0, -255, 255, 1)
-        if not ok1:
-            return
-        contrast, ok2 = QInputDialog.getDouble(self, 'Brightness - Contrast', 'Contrast (>0):', 1.0, 0.01, 10.0, 2)
-        if not ok2:
-            return
         from processing import ops
-        self._apply_and_show(ops.brightness_contrast, brightness=brightness, contrast=contrast)
+        values = self._ask_with_preview('Brightness - Contrast', ops.brightness_contrast,
+                                        OP_PARAMS['brightness_contrast'])
+        if values is None:
+            return
+        self._apply_and_show(ops.brightness_contrast, **values)
 
     def _wire_image_processing_actions(self):
         from functools import partial
@@ -355,19 +686,19 @@ class MainWindow(QMainWindow):
         if not self._require_input():
             return
         from processing.qt import show_input_histogram
-        show_input_histogram(self._input_pixmap)
+        show_input_histogram(self._input_array)
 
     def _show_output_histogram(self):
         """Show histogram for output image"""
         from processing.qt import show_output_histogram
-        show_output_histogram(self._output_pixmap)
+        show_output_histogram(self._output_array)
 
     def _show_input_output_histogram(self):
         """Show histograms for both input and output images"""
         if not self._require_input():
             return
         from processing.qt import show_input_output_histogram
-        show_input_output_histogram(self._input_pixmap, self._output_pixmap)
+        show_input_output_histogram(self._input_array, self._output_array)
 
     def _wire_arithmetic_actions(self):
         """Wire Arithmetical Operation menu actions"""
@@ -423,7 +754,8 @@ class MainWindow(QMainWindow):
         from ui.arithmetic_dialog import ArithmeticDialog
         # Pass the current input image if available, otherwise None
         input_image = self._input_pixmap if hasattr(self, '_input_pixmap') and self._input_pixmap else None
-        dialog = ArithmeticDialog(self, input_image)
+        input_array = self._input_array if input_image is not None else None
+        dialog = ArithmeticDialog(self, input_image, input_array)
         dialog.exec_()
 
     def show_tentang(self):
@@ -448,4 +780,8 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    # Time the compute backends now, not on the job thread of the first op that needs them
+    import threading
+    from processing import backends, ops  # noqa: F401  (ops registers the backends)
+    threading.Thread(target=backends.calibrate, name='backend-calibration', daemon=True).start()
     sys.exit(app.exec_())
@@ -1,2 +1,4 @@
 # Image processing package
-from . import ops, qt, utils, colors, enhancement, bitdepth, filters
\ No newline at end of file
+# `qt` is not imported here so that headless tools (e.g. processing.batch)
+# can use the package without PyQt5 installed; import processing.qt explicitly.
+from . import ops, utils, colors, enhancement, bitdepth, filters
@@ -1,104 +1,224 @@
 """
 Arithmetic operations for image processing.
 This module contains functions for basic arithmetic operations on images.
+
+uint8 images use saturating OpenCV arithmetic and cached tables. Other
+pixel types are computed in float32 and saturated to the common type of the
+operands; the 255 in multiply and divide is that type's white level.
+Operands of different depths are first rescaled to the common type, so a
+white uint8 pixel counts as white in a uint16 or float image too.
 """
 
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional
+
 import numpy as np
-from PyQt5.QtWidgets import QInputDialog, QFileDialog, QMessageBox
-from .utils import _ensure_numpy
+import cv2
+from .utils import _ensure_numpy, _is_frozen, convert_depth, max_value, saturate
+from .lut import get_lut, apply_lut, levels
+
+# Elements per block for ops that need a widened temporary
+_BLOCK_ELEMENTS = 1 << 20
+
+_LEVELS_F32 = np.arange(256, dtype=np.float32)
+
+
+def _is_uint8(*imgs: np.ndarray) -> bool:
+    return all(img.dtype == np.uint8 for img in imgs)
+
+
+def _check_out(out: Optional[np.ndarray], shape: tuple, dtype=np.uint8) -> Optional[np.ndarray]:
+    """Validate a caller-provided output buffer"""
+    if out is not None and (out.shape != shape or out.dtype != dtype):
+        raise ValueError(f"out must be a {np.dtype(dtype)} array of shape {shape}, "
+                         f"got {out.dtype} {out.shape}")
+    return out
+
+
+def _saturate(result: np.ndarray, dtype, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Clip a float32 result to the range of dtype and truncate (non-uint8 fallback)"""
+    if out is None:
+        return saturate(result, dtype)
+    out[...] = saturate(result, dtype)
+    return out
+
+
+def _common_dtype(*imgs: np.ndarray) -> np.dtype:
+    return np.result_type(*imgs)
+
+
+def _constant_lut(name: str, constant: float, formula, dtype=np.uint8) -> np.ndarray:
+    """Cached table of a float32 constant op, truncated exactly like the float path"""
+    dtype = np.dtype(dtype)
+
+    def build():
+        values = _LEVELS_F32 if dtype == np.uint8 else levels(dtype).astype(np.float32)
+        return saturate(formula(values), dtype)
+
+    return get_lut((name, dtype.str, float(constant)), build)
 
 
-def add_images(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+def _apply_constant(img: np.ndarray, name: str, constant: float, formula,
+                    out: Optional[np.ndarray]) -> np.ndarray:
+    """Constant op through a table for integer images, in float32 for float images"""
+    out = _check_out(out, img.shape, img.dtype)
+    if img.dtype == np.uint8:
+        return cv2.LUT(img, _constant_lut(name, constant, formula), dst=out)
+    if img.dtype == np.uint16:
+        result = apply_lut(img, _constant_lut(name, constant, formula, img.dtype))
+        if out is None:
+            return result
+        out[...] = result
+        return out
+    return _saturate(formula(img.astype(np.float32, copy=False)), img.dtype, out)
+
+
+def add_images(img1: np.ndarray, img2: np.ndarray,
+               out: Optional[np.ndarray] = None) -> np.ndarray:
     """Add two images pixel-wise"""
     _ensure_numpy()
     # Ensure images have the same dimensions
     img1, img2 = ensure_same_dimensions(img1, img2)
-    result = img1.astype(np.float32) + img2.astype(np.float32)
-    return np.clip(result, 0, 255).astype(np.uint8)
+    dtype = _common_dtype(img1, img2)
+    out = _check_out(out, img1.shape, dtype)
+    if not _is_uint8(img1, img2):
+        return _saturate(img1.astype(np.float32) + img2.astype(np.float32), dtype, out)
+    # Saturating uint8 addition, no promotion
+    return cv2.add(img1, img2, dst=out)
 
 
-def add_constant(img: np.ndarray, constant: float) -> np.ndarray:
+def add_constant(img: np.ndarray, constant: float,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
     """Add a constant value to image"""
     _ensure_numpy()
-    result = img.astype(np.float32) + constant
-    return np.clip(result, 0, 255).astype(np.uint8)
+    return _apply_constant(img, 'add_constant', constant, lambda v: v + np.float32(constant), out)
 
 
-def subtract_images(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+def subtract_images(img1: np.ndarray, img2: np.ndarray,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
     """Subtract img2 from img1 pixel-wise"""
     _ensure_numpy()
     # Ensure images have the same dimensions
     img1, img2 = ensure_same_dimensions(img1, img2)
-    result = img1.astype(np.float32) - img2.astype(np.float32)
-    return np.clip(result, 0, 255).astype(np.uint8)
+    dtype = _common_dtype(img1, img2)
+    out = _check_out(out, img1.shape, dtype)
+    if not _is_uint8(img1, img2):
+        return _saturate(img1.astype(np.float32) - img2.astype(np.float32), dtype, out)
+    return cv2.subtract(img1, img2, dst=out)
 
 
-def subtract_constant(img: np.ndarray, constant: float) -> np.ndarray:
+def subtract_constant(img: np.ndarray, constant: float,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
     """Subtract a constant value from image"""
     _ensure_numpy()
-    result = img.astype(np.float32) - constant
-    return np.clip(result, 0, 255).astype(np.uint8)
+    return _apply_constant(img, 'subtract_constant', constant, lambda v: v - np.float32(constant), out)
 
 
-def absolute_difference(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+def absolute_difference(img1: np.ndarray, img2: np.ndarray,
+                        out: Optional[np.ndarray] = None) -> np.ndarray:
     """Compute absolute difference between two images"""
     _ensure_numpy()
     # Ensure images have the same dimensions
     img1, img2 = ensure_same_dimensions(img1, img2)
-    result = np.abs(img1.astype(np.float32) - img2.astype(np.float32))
-    return np.clip(result, 0, 255).astype(np.uint8)
+    dtype = _common_dtype(img1, img2)
+    out = _check_out(out, img1.shape, dtype)
+    if not _is_uint8(img1, img2):
+        return _saturate(np.abs(img1.astype(np.float32) - img2.astype(np.float32)), dtype, out)
+    return cv2.absdiff(img1, img2, dst=out)
 
 
-def multiply_images(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+def multiply_images(img1: np.ndarray, img2: np.ndarray,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
     """Multiply two images pixel-wise"""
     _ensure_numpy()
     # Ensure images have the same dimensions
     img1, img2 = ensure_same_dimensions(img1, img2)
-    result = img1.astype(np.float32) * img2.astype(np.float32) / 255.0
-    return np.clip(result, 0, 255).astype(np.uint8)
-
-
-def multiply_constant(img: np.ndarray, constant: float) -> np.ndarray:
+    dtype = _common_dtype(img1, img2)
+    out = _check_out(out, img1.shape, dtype)
+    if not _is_uint8(img1, img2):
+        white = np.float32(max_value(dtype))
+        return _saturate(img1.astype(np.float32) * img2.astype(np.float32) / white, dtype, out)
+    if out is None:
+        out = np.empty_like(img1)
+
+    # Products fit in uint16; widen one block of rows at a time to keep temporaries small
+    rows = max(1, _BLOCK_ELEMENTS // max(1, img1[:1].size))
+    product = np.empty((min(rows, img1.shape[0]),) + img1.shape[1:], np.uint16)
+    scaled = np.empty_like(product)
+    for y0 in range(0, img1.shape[0], rows):
+        n = min(rows, img1.shape[0] - y0)
+        p, q = product[:n], scaled[:n]
+        np.multiply(img1[y0:y0 + n], img2[y0:y0 + n], out=p, dtype=np.uint16)
+        # floor(p / 255) == (p + (p >> 8) + 1) >> 8 for p <= 255 * 255
+        np.right_shift(p, 8, out=q)
+        q += p
+        q += 1
+        q >>= 8
+        out[y0:y0 + n] = q
+    return out
+
+
+def multiply_constant(img: np.ndarray, constant: float,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
     """Multiply image by a constant value"""
     _ensure_numpy()
-    result = img.astype(np.float32) * constant
-    return np.clip(result, 0, 255).astype(np.uint8)
+    return _apply_constant(img, 'multiply_constant', constant, lambda v: v * np.float32(constant), out)
 
 
-def divide_images(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+def divide_images(img1: np.ndarray, img2: np.ndarray,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
     """Divide img1 by img2 pixel-wise"""
     _ensure_numpy()
     # Ensure images have the same dimensions
     img1, img2 = ensure_same_dimensions(img1, img2)
-    # Avoid division by zero
-    img2_float = img2.astype(np.float32)
-    img2_float[img2_float == 0] = 1  # Replace zeros with 1 to avoid division by zero
-    result = img1.astype(np.float32) / img2_float * 255.0
-    return np.clip(result, 0, 255).astype(np.uint8)
-
-
-def divide_constant(img: np.ndarray, constant: float) -> np.ndarray:
+    dtype = _common_dtype(img1, img2)
+    out = _check_out(out, img1.shape, dtype)
+    if not _is_uint8(img1, img2):
+        # Avoid division by zero
+        img2_float = img2.astype(np.float32)
+        img2_float[img2_float == 0] = 1  # Replace zeros with 1 to avoid division by zero
+        white = np.float32(max_value(dtype))
+        return _saturate(img1.astype(np.float32) / img2_float * white, dtype, out)
+    # Saturating img1 * 255 / img2, rounded; OpenCV writes 0 where img2 is 0
+    out = cv2.divide(img1, img2, dst=out, scale=255)
+    # Dividing by zero counts as dividing by 1, which saturates any non-zero pixel
+    # One mask, reused in place: 255 where img2 == 0 and img1 > 0
+    mask = cv2.compare(img2, 0, cv2.CMP_EQ)
+    cv2.min(mask, img1, dst=mask)
+    cv2.compare(mask, 0, cv2.CMP_GT, dst=mask)
+    return cv2.bitwise_or(out, mask, dst=out)
+
+
+def divide_constant(img: np.ndarray, constant: float,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
     """Divide image by a constant value"""
     _ensure_numpy()
     if constant == 0:
         raise ValueError("Cannot divide by zero")
-    result = img.astype(np.float32) / constant
-    return np.clip(result, 0, 255).astype(np.uint8)
+    return _apply_constant(img, 'divide_constant', constant, lambda v: v / np.float32(constant), out)
 
 
-def blend_images(img1: np.ndarray, img2: np.ndarray, alpha: float, beta: float) -> np.ndarray:
+def blend_images(img1: np.ndarray, img2: np.ndarray, alpha: float, beta: float,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
     """Blend two images using linear combination: alpha*img1 + beta*img2"""
     _ensure_numpy()
     # Ensure images have the same dimensions
     img1, img2 = ensure_same_dimensions(img1, img2)
-    result = alpha * img1.astype(np.float32) + beta * img2.astype(np.float32)
-    return np.clip(result, 0, 255).astype(np.uint8)
+    dtype = _common_dtype(img1, img2)
+    out = _check_out(out, img1.shape, dtype)
+    if not _is_uint8(img1, img2):
+        weighted = np.float32(alpha) * img1.astype(np.float32) + np.float32(beta) * img2.astype(np.float32)
+        return _saturate(weighted, dtype, out)
+    # Weighted sum computed and saturated per pixel, rounded to nearest
+    return cv2.addWeighted(img1, alpha, img2, beta, 0, dst=out)
 
 
 def get_second_image() -> np.ndarray:
     """Helper function to get second image from file dialog"""
-    from processing.qt import pixmap_to_numpy
-    from PyQt5.QtGui import QPixmap
+    from PyQt5.QtWidgets import QFileDialog, QMessageBox
+    from .decode_cache import load_image
 
     file_path, _ = QFileDialog.getOpenFileName(
         None,
@@ -109,16 +229,16 @@ def get_second_image() -> np.ndarray:
     if not file_path:
         return None
 
-    pixmap = QPixmap(file_path)
-    if pixmap.isNull():
+    try:
+        return load_image(file_path, keep_depth=True)
+    except ValueError:
         QMessageBox.warning(None, 'Error', 'Cannot load the selected image.')
         return None
 
-    return pixmap_to_numpy(pixmap)
-
 
 def get_constant_value(prompt: str, default: float = 0.0) -> float:
     """Helper function to get constant value from user input"""
+    from PyQt5.QtWidgets import QInputDialog
     value, ok = QInputDialog.getDouble(None, 'Enter Value', prompt, default, -255.0, 255.0, 2)
     if not ok:
         return None
@@ -127,6 +247,7 @@ def get_constant_value(prompt: str, default: float = 0.0) -> float:
 
 def get_blend_parameters() -> tuple:
     """Helper function to get alpha and beta values for blending"""
+    from PyQt5.QtWidgets import QInputDialog
     alpha, ok1 = QInputDialog.getDouble(None, 'Blend Parameters', 'Alpha (weight for first image):', 0.5, 0.0, 1.0, 2)
     if not ok1:
         return None, None
@@ -138,20 +259,127 @@ def get_blend_parameters() -> tuple:
     return alpha, beta
 
 
-def resize_image_to_match(img: np.ndarray, target_shape: tuple) -> np.ndarray:
-    """Resize image to match target dimensions using OpenCV"""
-    _ensure_numpy()
-    import cv2
-    target_height, target_width = target_shape[:2]
-    resized = cv2.resize(img, (target_width, target_height), interpolation=cv2.INTER_LINEAR)
-    return resized
+# How an operand is fitted to the other image's size
+ALIGN_POLICIES = ('stretch', 'letterbox', 'center-crop', 'tile')
+
+
+def _interpolation(src_shape: tuple, dst_size: tuple) -> int:
+    """INTER_AREA when shrinking in both directions, INTER_LINEAR otherwise"""
+    if dst_size[0] <= src_shape[1] and dst_size[1] <= src_shape[0]:
+        return cv2.INTER_AREA
+    return cv2.INTER_LINEAR
+
 
+def _scaled(img: np.ndarray, scale: float) -> np.ndarray:
+    height, width = img.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(img, size, interpolation=_interpolation(img.shape, size))
 
-def ensure_same_dimensions(img1: np.ndarray, img2: np.ndarray) -> tuple:
-    """Ensure both images have the same dimensions by resizing the second to match the first"""
-    if img1.shape == img2.shape:
-        return img1, img2
 
-    # Resize img2 to match img1 dimensions
-    resized_img2 = resize_image_to_match(img2, img1.shape)
-    return img1, resized_img2
\ No newline at end of file
+def resize_image_to_match(img: np.ndarray, target_shape: tuple, policy: str = 'stretch') -> np.ndarray:
+    """Resize image to match target dimensions using OpenCV
+
+    policy is one of ALIGN_POLICIES: 'stretch' ignores the aspect ratio,
+    'letterbox' fits the whole image and pads with black, 'center-crop'
+    fills the target and crops the overflow, 'tile' repeats the image at
+    its own size.
+    """
+    _ensure_numpy()
+    target_height, target_width = target_shape[:2]
+    height, width = img.shape[:2]
+    if policy == 'stretch':
+        size = (target_width, target_height)
+        return cv2.resize(img, size, interpolation=_interpolation(img.shape, size))
+    if policy == 'letterbox':
+        fitted = _scaled(img, min(target_width / width, target_height / height))
+        fh, fw = fitted.shape[:2]
+        top, left = (target_height - fh) // 2, (target_width - fw) // 2
+        return cv2.copyMakeBorder(fitted, top, target_height - fh - top, left,
+                                  target_width - fw - left, cv2.BORDER_CONSTANT, value=0)
+    if policy == 'center-crop':
+        covered = _scaled(img, max(target_width / width, target_height / height))
+        ch, cw = covered.shape[:2]
+        top, left = (ch - target_height) // 2, (cw - target_width) // 2
+        return np.ascontiguousarray(covered[top:top + target_height, left:left + target_width])
+    if policy == 'tile':
+        reps = (-(-target_height // height), -(-target_width // width)) + (1,) * (img.ndim - 2)
+        return np.ascontiguousarray(np.tile(img, reps)[:target_height, :target_width])
+    raise ValueError(f"Unknown alignment policy: {policy!r}")
+
+
+class ResizeCache:
+    """Thread-safe LRU cache of resized operands keyed by source identity, target size and policy
+
+    Only frozen sources (read-only down to the data they view) are cached:
+    they cannot change after resizing, so the cached copy stays valid for
+    as long as the source is alive.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, img: np.ndarray, target_shape: tuple, policy: str = 'stretch') -> np.ndarray:
+        """Resized copy of img, reused while img is alive and unchanged"""
+        if not _is_frozen(img):
+            return resize_image_to_match(img, target_shape, policy)
+        key = (id(img), img.shape, tuple(target_shape[:2]), policy)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is img:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        resized = resize_image_to_match(img, target_shape, policy)
+        resized.setflags(write=False)
+
+        with self._lock:
+            self._entries[key] = (weakref.ref(img), resized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return resized
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def match_channels(img: np.ndarray, like: np.ndarray) -> np.ndarray:
+    """Convert img between (H, W) grayscale and RGB to match the layout of like"""
+    if img.ndim == like.ndim:
+        return img
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+
+def ensure_same_dimensions(img1: np.ndarray, img2: np.ndarray, policy: str = 'stretch',
+                           cache: Optional[ResizeCache] = None) -> tuple:
+    """Ensure both images have the same dimensions by resizing the second to match the first
+
+    policy is one of ALIGN_POLICIES; a ResizeCache reuses earlier resizes of img2.
+    A grayscale (H, W) operand is expanded to RGB when the other one is RGB,
+    and operands of different depths are rescaled to their common type.
+    """
+    if img1.shape[:2] != img2.shape[:2]:
+        # Resize img2 to match img1 dimensions
+        if cache is not None:
+            img2 = cache.get(img2, img1.shape, policy)
+        else:
+            img2 = resize_image_to_match(img2, img1.shape, policy)
+
+    if img1.ndim == 2 and img2.ndim == 3:
+        img1 = match_channels(img1, img2)
+    elif img2.ndim == 2 and img1.ndim == 3:
+        img2 = match_channels(img2, img1)
+
+    if img1.dtype != img2.dtype:
+        dtype = _common_dtype(img1, img2)
+        img1, img2 = convert_depth(img1, dtype), convert_depth(img2, dtype)
+    return img1, img2
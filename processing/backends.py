@@ -0,0 +1,261 @@
+"""
+Compute backend registry for image processing operations.
+This module lets an op have several implementations (NumPy, OpenCV, an
+optional numba JIT kernel) and picks the fastest one for the current
+machine and image size.
+
+The function an op is defined with is its reference implementation and is
+registered as the 'numpy' backend. Other backends register against the op's
+name. The first time an op runs on an image of a given size class, every
+implementation is timed on a synthetic image of that size; the fastest one
+whose output matches the reference exactly is used from then on, so results
+do not change with the machine or image size. Alternative backends only ever
+see uint8 input; anything else runs the reference.
+
+Backends that differ from the reference by up to the op's tolerance (e.g.
+rounding off by one) are opt-in: pin() them, or name them in the
+PROCESSING_BACKENDS environment variable, a comma-separated list of backend
+names (preferred wherever available) and op=backend entries:
+    PROCESSING_BACKENDS=opencv
+    PROCESSING_BACKENDS=numpy,to_grayscale_luminance=numba
+
+benchmarks/bench_backends.py prints the calibration and cross-check results;
+tests/test_backends.py asserts every backend stays within its tolerance.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+REFERENCE = 'numpy'
+ENV_VAR = 'PROCESSING_BACKENDS'
+
+# Size classes: (name, largest pixel count in the class, calibration shape)
+SIZE_CLASSES = (
+    ('small', 512 * 512, (256, 256, 3)),
+    ('large', None, (1024, 1024, 3)),
+)
+
+_CALIBRATION_REPEATS = 3
+
+
+class _Op:
+    """Implementations of one op and the backend chosen per size class"""
+
+    def __init__(self, name: str, reference: Callable, tolerance: int, sample_kwargs: Dict):
+        self.name = name
+        self.impls = OrderedDict([(REFERENCE, reference)])
+        self.tolerance = tolerance
+        self.sample_kwargs = dict(sample_kwargs or {})
+        self.selected = {}
+        self.timings = {}
+        self.pinned = None
+
+
+_ops: Dict[str, _Op] = OrderedDict()
+# Reentrant: an implementation being calibrated may itself call a dispatched op
+_lock = threading.RLock()
+_env_loaded = False
+_preferred: List[str] = []
+
+
+def _size_class(img: np.ndarray) -> str:
+    pixels = img.shape[0] * img.shape[1] if img.ndim >= 2 else img.size
+    for name, limit, _ in SIZE_CLASSES:
+        if limit is None or pixels <= limit:
+            return name
+    return SIZE_CLASSES[-1][0]
+
+
+def _load_env():
+    """Apply PROCESSING_BACKENDS once, after the ops have registered"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    # The first dispatched calls may come from several pool threads at once
+    with _lock:
+        if _env_loaded:
+            return
+        for entry in filter(None, (e.strip() for e in os.environ.get(ENV_VAR, '').split(','))):
+            if '=' not in entry:
+                _preferred.append(entry)
+                continue
+            name, backend = (part.strip() for part in entry.split('=', 1))
+            try:
+                pin(name, backend)
+            except ValueError as e:
+                warnings.warn(f"Ignoring {ENV_VAR} entry {entry!r}: {e}")
+        # Set last, so threads that skip the lock see the whole configuration
+        _env_loaded = True
+
+
+def _choose(op: _Op, img: np.ndarray) -> Callable:
+    if img.dtype != np.uint8 or len(op.impls) == 1:
+        return op.impls[REFERENCE]
+    _load_env()
+    # Read once: pin() may change it from another thread meanwhile
+    pinned = op.pinned
+    if pinned is not None:
+        return op.impls[pinned]
+    for backend in _preferred:
+        if backend in op.impls:
+            return op.impls[backend]
+    size = _size_class(img)
+    backend = op.selected.get(size)
+    if backend is None:
+        backend = _calibrate_op(op, size)
+    return op.impls[backend]
+
+
+def dispatched(tolerance: int = 0, sample_kwargs: Optional[Dict] = None):
+    """Make the decorated function an op whose implementation is picked per call
+
+    The decorated function is the reference ('numpy') implementation.
+    tolerance is the largest absolute difference from the reference other
+    backends may produce; sample_kwargs are the parameters used when timing
+    and cross-checking.
+    """
+    def decorate(fn: Callable) -> Callable:
+        op = _Op(fn.__name__, fn, tolerance, sample_kwargs)
+        _ops[op.name] = op
+
+        @functools.wraps(fn)
+        def dispatch(img: np.ndarray, *args, **kwargs):
+            return _choose(op, img)(img, *args, **kwargs)
+
+        return dispatch
+    return decorate
+
+
+def implementation(op_name: str, backend: str):
+    """Register the decorated function as backend for op_name"""
+    def decorate(fn: Callable) -> Callable:
+        if op_name not in _ops:
+            raise ValueError(f"Unknown op: {op_name!r}")
+        op = _ops[op_name]
+        with _lock:
+            op.impls[backend] = fn
+            # A new candidate invalidates earlier calibration
+            op.selected.clear()
+        return fn
+    return decorate
+
+
+def available() -> Dict[str, List[str]]:
+    """Backends registered for each op"""
+    return {name: list(op.impls) for name, op in _ops.items()}
+
+
+def pin(op_name: str, backend: Optional[str] = None):
+    """Always use backend for op_name; None returns to automatic selection"""
+    if op_name not in _ops:
+        raise ValueError(f"Unknown op: {op_name!r}")
+    op = _ops[op_name]
+    with _lock:
+        if backend is not None and backend not in op.impls:
+            raise ValueError(f"No {backend!r} backend for {op_name} (have {', '.join(op.impls)})")
+        op.pinned = backend
+
+
+def selection() -> Dict[str, Dict[str, str]]:
+    """Backend currently used per op and size class (pinned choices included)"""
+    result = {}
+    for name, op in _ops.items():
+        if op.pinned is not None:
+            result[name] = {size: op.pinned for size, _, _ in SIZE_CLASSES}
+        else:
+            result[name] = dict(op.selected)
+    return result
+
+
+def select(choices: Dict[str, Dict[str, str]]):
+    """Use the backends in choices, as returned by selection(), instead of calibrating"""
+    with _lock:
+        for name, sizes in choices.items():
+            if name not in _ops:
+                raise ValueError(f"Unknown op: {name!r}")
+            op = _ops[name]
+            for size, backend in sizes.items():
+                if backend not in op.impls:
+                    raise ValueError(f"No {backend!r} backend for {name} (have {', '.join(op.impls)})")
+                op.selected[size] = backend
+
+
+def calibrate_for(fn: Callable, **kwargs) -> Dict[str, Dict[str, str]]:
+    """Run fn on a sample of every size class, calibrating the ops it uses; returns selection()"""
+    for _, _, shape in SIZE_CLASSES:
+        try:
+            fn(_sample(shape), **kwargs)
+        except Exception:
+            pass  # the ops fn reached before failing are calibrated all the same
+    return selection()
+
+
+def _sample(shape: Tuple[int, ...]) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, shape, dtype=np.uint8)
+
+
+def _max_diff(a: np.ndarray, b: np.ndarray) -> int:
+    if a.shape != b.shape:
+        return sys.maxsize
+    return int(np.abs(a.astype(np.int32) - b.astype(np.int32)).max()) if a.size else 0
+
+
+def _check(op: _Op, img: np.ndarray) -> Dict[str, int]:
+    reference = op.impls[REFERENCE](img, **op.sample_kwargs)
+    return {backend: _max_diff(reference, impl(img, **op.sample_kwargs))
+            for backend, impl in op.impls.items()}
+
+
+def _calibrate_op(op: _Op, size: str) -> str:
+    """Time every implementation on a sample image and record the fastest exact one"""
+    with _lock:
+        if size in op.selected:
+            return op.selected[size]
+        shape = next(s for name, _, s in SIZE_CLASSES if name == size)
+        img = _sample(shape)
+        diffs = _check(op, img)
+        timings = {}
+        for backend, impl in op.impls.items():
+            if diffs[backend] > op.tolerance:
+                continue
+            best = float('inf')
+            for _ in range(_CALIBRATION_REPEATS):
+                start = time.perf_counter()
+                impl(img, **op.sample_kwargs)
+                best = min(best, time.perf_counter() - start)
+            timings[backend] = best
+        op.timings[size] = timings
+        # Backends within tolerance are timed for reporting but only used when asked for
+        exact = [backend for backend in timings if diffs[backend] == 0]
+        op.selected[size] = min(exact, key=timings.get)
+        return op.selected[size]
+
+
+def calibrate(op_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Re-run the calibration now; returns seconds per op, size class and backend"""
+    names = op_names or list(_ops)
+    for name in names:
+        op = _ops[name]
+        with _lock:
+            op.selected.clear()
+        for size, _, _ in SIZE_CLASSES:
+            _calibrate_op(op, size)
+    return {name: dict(_ops[name].timings) for name in names}
+
+
+def cross_check(op_name: str, img: Optional[np.ndarray] = None) -> Dict[str, int]:
+    """Largest absolute difference of each backend from the reference on img"""
+    if op_name not in _ops:
+        raise ValueError(f"Unknown op: {op_name!r}")
+    if img is None:
+        img = _sample(SIZE_CLASSES[0][2])
+    return _check(_ops[op_name], img)
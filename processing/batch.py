@@ -0,0 +1,324 @@
+"""
+Headless batch processing for image processing operations.
+This module runs any single-image function from processing.ops over many files
+using a process pool, without importing PyQt5.
+
+Usage:
+    python -m processing.batch "photos/**/*.jpg" out/ sobel
+    python -m processing.batch "scans/*.png" out/ gamma_correction --gamma 0.8
+    python -m processing.batch "in/*.png" out/ brightness_contrast --brightness 20 --contrast 1.3
+    python -m processing.batch "scans/*.tif" out/ gamma_correction --gamma 0.8 --keep-depth
+    python -m processing.batch "raw/*.png" out/ sharpen --ext .jpg --quality 90 --progressive
+    python -m processing.batch "scans/*.tif" out/ sobel --cache-dir ~/.cache/decoded
+    python -m processing.batch "photos/**/*.jpg" out/ --recipe look.json
+"""
+
+import argparse
+import glob
+import inspect
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import backends, ops
+from .io import TIFF_COMPRESSION, write_image
+from . import decode_cache
+
+
+# Functions exported by ops that are not single-image operations
+_NON_BATCH_OPS = {
+    'get_second_image',
+    'get_constant_value',
+    'get_blend_parameters',
+    # Return raw int16/float32 data rather than an image
+    'image_gradients',
+    'gradient_magnitude',
+}
+
+# Per-process state, set once by _init_worker
+_worker_fn = None
+_worker_kwargs: Dict = {}
+_worker_keep_depth = False
+_worker_encode: Dict = {}
+
+
+# Parameter types that can be given on the command line or in a recipe
+_SCALAR_TYPES = (int, float, str, bool)
+
+
+def available_ops() -> List[str]:
+    """List ops that take a single image and can run in batch mode"""
+    names = []
+    for name, fn in inspect.getmembers(ops, inspect.isfunction):
+        if name.startswith('_') or name in _NON_BATCH_OPS:
+            continue
+        params = list(inspect.signature(fn).parameters.values())
+        if not params:
+            continue
+        # Every parameter after the image must have a default or be a scalar
+        # that can be given, e.g. bits for bit_depth (not a second image)
+        if all(p.default is not inspect.Parameter.empty or p.annotation in _SCALAR_TYPES
+               for p in params[1:]):
+            names.append(name)
+    return names
+
+
+def resolve_op(name: str, kwargs: Dict):
+    """Look up an op by name and validate its parameters"""
+    if name not in available_ops():
+        raise ValueError(f"Unknown or unsupported op: {name!r}")
+    fn = getattr(ops, name)
+    signature = inspect.signature(fn)
+    try:
+        signature.bind(None, **kwargs)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for {name}: {e}") from None
+    for key, value in kwargs.items():
+        annotation = signature.parameters[key].annotation
+        if annotation not in _SCALAR_TYPES:
+            raise ValueError(f"Invalid parameters for {name}: {key!r} cannot be set")
+        if annotation in (int, float):
+            # Whole numbers are accepted for float parameters, e.g. "brightness": 20
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        else:
+            valid = isinstance(value, annotation)
+        if not valid:
+            raise ValueError(f"Invalid parameters for {name}: {key} must be {annotation.__name__}, "
+                             f"got {value!r}")
+    return fn
+
+
+def _init_worker(op_name: Optional[str], kwargs: Dict, keep_depth: bool = False,
+                 encode_options: Optional[Dict] = None, cache: Optional[Tuple[str, int]] = None,
+                 recipe: Optional[List[Dict]] = None,
+                 backend_choices: Optional[Dict[str, Dict[str, str]]] = None):
+    """Resolve the op, or compile the recipe, once per worker process"""
+    global _worker_fn, _worker_kwargs, _worker_keep_depth, _worker_encode
+    import cv2
+    # One pool process per core already; keep OpenCV from oversubscribing
+    cv2.setNumThreads(1)
+    if backend_choices:
+        # Calibrated once by run(), so every worker uses the same backends
+        backends.select(backend_choices)
+    if recipe is not None:
+        from .recipe import compile_recipe, warm_up
+        # run() compiled it once already, so errors here are unexpected;
+        # an initializer that raises makes the pool respawn workers forever
+        _worker_fn = compile_recipe(recipe, warm_up_dtypes=())
+        _worker_kwargs = {}
+        for dtype in (np.uint8, np.uint16) if keep_depth else (np.uint8,):
+            try:
+                warm_up(_worker_fn, dtype)
+            except Exception:
+                pass  # files the recipe cannot process are reported one by one instead
+    else:
+        _worker_fn = resolve_op(op_name, kwargs)
+        _worker_kwargs = kwargs
+    _worker_keep_depth = keep_depth
+    _worker_encode = encode_options or {}
+    if cache is not None:
+        decode_cache.configure(*cache)
+
+
+def _process_one(job: Tuple[str, str]) -> Tuple[str, float, Optional[str]]:
+    """Read, process and write one file; returns (source, seconds, error)"""
+    src, dst = job
+    start = time.perf_counter()
+    try:
+        img = decode_cache.load_image(src, keep_depth=_worker_keep_depth)
+        out = _worker_fn(img, **_worker_kwargs)
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        write_image(dst, out, **_worker_encode)
+    except Exception as e:
+        return src, time.perf_counter() - start, str(e)
+    return src, time.perf_counter() - start, None
+
+
+def _glob_root(pattern: str) -> str:
+    """Return the directory part of a glob pattern before the first wildcard"""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    root = os.sep.join(parts)
+    if not os.path.isdir(root):
+        root = os.path.dirname(root)
+    return root or '.'
+
+
+def plan_jobs(pattern: str, output_dir: str, ext: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Map every file matching pattern to its path under output_dir, keeping the tree layout"""
+    root = _glob_root(pattern)
+    jobs = []
+    for src in sorted(glob.iglob(pattern, recursive=True)):
+        if not os.path.isfile(src):
+            continue
+        rel = os.path.relpath(src, root)
+        if ext:
+            rel = os.path.splitext(rel)[0] + ext
+        jobs.append((src, os.path.join(output_dir, rel)))
+    return jobs
+
+
+def run(jobs: List[Tuple[str, str]], op_name: Optional[str], kwargs: Dict,
+        workers: Optional[int] = None, chunksize: int = 8, verbose: bool = True,
+        keep_depth: bool = False, encode_options: Optional[Dict] = None,
+        cache_dir: Optional[str] = None,
+        cache_bytes: int = decode_cache.DEFAULT_MAX_BYTES,
+        recipe: Optional[List[Dict]] = None) -> Dict:
+    """Process jobs in a worker pool, streaming results; returns a summary dict
+
+    With keep_depth=True 16-bit and float files are processed and written at
+    their own depth instead of being decoded to 8-bit RGB. encode_options are
+    passed to processing.io.write_image (JPEG quality, PNG compression, ...).
+    cache_dir is a decode cache shared by the workers, so later runs over the
+    same sources skip decoding. A recipe (see processing.recipe) replaces
+    op_name and kwargs; each worker compiles it once.
+    """
+    # Fail fast in the parent process
+    if recipe is not None:
+        from .recipe import compile_recipe, validate_recipe
+        recipe = validate_recipe(recipe)
+        fn, fn_kwargs = compile_recipe(recipe), {}
+    else:
+        fn, fn_kwargs = resolve_op(op_name, kwargs), kwargs
+    # Time backends here rather than in every worker, which could also pick differently
+    backend_choices = backends.calibrate_for(fn, **fn_kwargs)
+    cache = None
+    if cache_dir is not None:
+        decode_cache.DecodeCache(cache_dir, cache_bytes)  # create it and check the size once
+        cache = (cache_dir, cache_bytes)
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(op_name, kwargs, keep_depth, encode_options, cache,
+                                                             recipe, backend_choices)) as pool:
+        for src, seconds, error in pool.imap_unordered(_process_one, jobs, chunksize):
+            if error is not None:
+                failures.append((src, error))
+                print(f"FAILED {src}: {error}", file=sys.stderr)
+                continue
+            latencies.append(seconds)
+            if verbose:
+                print(f"{seconds * 1000:8.1f} ms  {src}")
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    summary = {
+        'processed': len(latencies),
+        'failed': len(failures),
+        'elapsed': elapsed,
+        'images_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        summary['mean_ms'] = 1000 * sum(latencies) / len(latencies)
+        summary['p50_ms'] = 1000 * latencies[len(latencies) // 2]
+        summary['p95_ms'] = 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return summary
+
+
+def _parse_param(text: str) -> Tuple[str, object]:
+    """Parse a KEY=VALUE parameter, converting numbers"""
+    if '=' not in text:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got {text!r}")
+    key, value = text.split('=', 1)
+    for convert in (int, float):
+        try:
+            return key, convert(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m processing.batch',
+        description='Apply a processing.ops function or a recipe to every image matching a glob.')
+    parser.add_argument('input', nargs='?', help='Input glob, e.g. "photos/**/*.jpg" (quote it)')
+    parser.add_argument('output', nargs='?', help='Output directory')
+    parser.add_argument('op', nargs='?', help='Op name from processing.ops')
+    parser.add_argument('--gamma', type=float, help='gamma for gamma_correction')
+    parser.add_argument('--bits', type=int, help='bits for bit_depth')
+    parser.add_argument('--brightness', type=float, help='brightness for brightness_contrast')
+    parser.add_argument('--contrast', type=float, help='contrast for brightness_contrast')
+    parser.add_argument('--param', action='append', type=_parse_param, default=[],
+                        metavar='KEY=VALUE', help='Any other op parameter (repeatable)')
+    parser.add_argument('--recipe', metavar='FILE',
+                        help='JSON/YAML recipe of ops to apply instead of a single op')
+    parser.add_argument('--keep-depth', action='store_true',
+                        help='Keep 16-bit/float pixels and grayscale files single-channel')
+    parser.add_argument('--ext', help='Output extension, e.g. .png (default: keep input extension)')
+    parser.add_argument('--quality', type=int, choices=range(101), metavar='0-100',
+                        help='JPEG quality')
+    parser.add_argument('--progressive', action='store_true', help='Write progressive JPEG')
+    parser.add_argument('--optimize', action='store_true', help='Optimize JPEG Huffman tables')
+    parser.add_argument('--png-compression', type=int, choices=range(10), metavar='0-9',
+                        help='PNG zlib compression level')
+    parser.add_argument('--tiff-compression', choices=sorted(TIFF_COMPRESSION),
+                        help='TIFF compression')
+    parser.add_argument('--cache-dir', help='Decode cache directory, reused across runs')
+    parser.add_argument('--cache-mb', type=float, default=decode_cache.DEFAULT_MAX_BYTES / 2**20,
+                        help='Decode cache size bound in MB (default: %(default)d)')
+    parser.add_argument('-j', '--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunksize', type=int, default=8, help='Files handed to a worker at a time')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print per-file latency')
+    parser.add_argument('--list-ops', action='store_true', help='List available ops and exit')
+    args = parser.parse_args(argv)
+
+    if args.list_ops:
+        print('\n'.join(available_ops()))
+        return 0
+    if not (args.input and args.output and (args.op or args.recipe)):
+        parser.error('input, output and op (or --recipe) are required')
+    if args.op and args.recipe:
+        parser.error('give either an op or --recipe, not both')
+
+    kwargs = dict(args.param)
+    for key in ('gamma', 'bits', 'brightness', 'contrast'):
+        value = getattr(args, key)
+        if value is not None:
+            kwargs[key] = value
+    if args.recipe and kwargs:
+        parser.error('op parameters belong in the recipe when --recipe is given')
+    ext = args.ext
+    if ext and not ext.startswith('.'):
+        ext = '.' + ext
+
+    recipe = None
+    if args.recipe:
+        from .recipe import load_recipe
+        try:
+            recipe = load_recipe(args.recipe)
+        except (OSError, ImportError, ValueError) as e:
+            parser.error(str(e))
+
+    jobs = plan_jobs(args.input, args.output, ext)
+    if not jobs:
+        print(f"No files match {args.input!r}", file=sys.stderr)
+        return 1
+
+    encode_options = {'quality': args.quality, 'progressive': args.progressive,
+                      'optimize': args.optimize, 'png_compression': args.png_compression,
+                      'tiff_compression': args.tiff_compression}
+    try:
+        # run() checks the op, or compiles the recipe, before starting any worker
+        summary = run(jobs, args.op, kwargs, args.workers, args.chunksize, not args.quiet,
+                      args.keep_depth, encode_options, args.cache_dir, int(args.cache_mb * 2**20),
+                      recipe)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Processed {summary['processed']} images ({summary['failed']} failed) "
+          f"in {summary['elapsed']:.2f} s: {summary['images_per_sec']:.1f} images/sec")
+    if summary['processed']:
+        print(f"Latency per file: mean {summary['mean_ms']:.1f} ms, "
+              f"p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,27 +6,42 @@ This module contains quantization and bit depth manipulation functions.
 import numpy as np
 from typing import Tuple
 from .utils import _ensure_numpy
+from .lut import get_lut, apply_lut, levels
+
+
+def _source_bits(dtype) -> int:
+    """Bits available in a pixel type; floats are quantized like 16-bit data"""
+    return 8 if np.dtype(dtype) == np.uint8 else 16
 
 
 def bit_depth(img: np.ndarray, bits: int) -> np.ndarray:
     """Reduce bit depth using optimized NumPy quantization"""
     _ensure_numpy()
     bits = int(bits)
-    bits = max(1, min(8, bits))  # Allow up to 8 bits
+    bits = max(1, min(_source_bits(img.dtype), bits))  # Up to the depth of the image
+
+    if img.dtype not in (np.uint8, np.uint16):
+        return _quantize_float(img, bits)
+
+    # Quantization map is cached per pixel type and bit depth
+    quant_map = get_lut(('bit_depth', img.dtype.str, bits), lambda: _quant_map(bits, img.dtype))
 
-    # Calculate quantization levels
-    levels = 2 ** bits
-    step = 256 // levels
+    return apply_lut(img, quant_map)
 
-    # Create quantization mapping using NumPy
-    quant_map = np.zeros(256, dtype=np.uint8)
-    for i in range(levels):
-        start = i * step
-        end = min((i + 1) * step, 256)
-        mid = (start + end) // 2
-        quant_map[start:end] = mid
 
-    quantized = quant_map[img]
+def _quant_map(bits: int, dtype=np.uint8) -> np.ndarray:
+    """Map each value of an integer pixel type to the midpoint of its quantization bin"""
+    values = levels(dtype)
+    step = len(values) >> bits
+    return (values // step) * step + step // 2
 
-    return quantized
 
+def _quantize_float(img: np.ndarray, bits: int) -> np.ndarray:
+    """Quantize a 0..1 float image to 2**bits bin midpoints, in float32"""
+    count = np.float32(1 << bits)
+    bins = np.floor(np.clip(img, 0, 1, dtype=np.float32) * count)
+    # 1.0 belongs to the top bin
+    np.minimum(bins, count - 1, out=bins)
+    bins += np.float32(0.5)
+    bins /= count
+    return bins.astype(img.dtype, copy=False)
@@ -0,0 +1,166 @@
+"""
+Chained editing: a sequence of ops, each applied to the previous result.
+This module keeps the result of every stage of an edit chain, so changing
+a stage's parameters recomputes only that stage and the ones after it,
+starting from the cached result of the stage before. The chain doubles as a
+record of the edit: recipe() lists the stages as {"op": name, **params}.
+
+Invalidated stages are replaced by fresh copies rather than modified, so a
+chain can be evaluated on a worker thread while the GUI edits it; a result
+computed for a stage that has since been replaced is never used.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .utils import _readonly
+
+
+def _call(op: Callable, img: np.ndarray, args: Sequence, kwargs: Dict) -> np.ndarray:
+    return op(img, *args, **kwargs)
+
+
+class ChainStage:
+    """One op with its keyword parameters and, once computed, its read-only result"""
+
+    def __init__(self, op: Callable, kwargs: Optional[Dict] = None, label: str = ''):
+        self.op = op
+        self.kwargs = dict(kwargs or {})
+        self.label = label or self.name
+        self.result: Optional[np.ndarray] = None
+
+    @property
+    def name(self) -> str:
+        return getattr(self.op, '__name__', repr(self.op))
+
+    def copy(self, **kwargs) -> 'ChainStage':
+        """The same op with kwargs overriding its parameters, without a result"""
+        return ChainStage(self.op, {**self.kwargs, **kwargs}, self.label)
+
+
+class EditChain:
+    """Ops applied one after another to a source image, with per-stage results cached
+
+    apply(op, img, args, kwargs) runs a stage; args is always empty.
+    Appending clears the redo stack, as do parameter changes and removals.
+    """
+
+    def __init__(self, source: Optional[np.ndarray] = None, apply: Callable = _call):
+        self.apply = apply
+        self._source = source
+        self._stages: List[ChainStage] = []
+        self._redo: List[ChainStage] = []
+        # Stages run so far, to see how much an edit recomputed
+        self.evaluations = 0
+
+    @property
+    def source(self) -> Optional[np.ndarray]:
+        return self._source
+
+    def set_source(self, img: Optional[np.ndarray]):
+        """Replace the source image; every stage is recomputed on the next result()"""
+        self._source = img
+        self._invalidate(0)
+        self._redo.clear()
+
+    @property
+    def stages(self) -> tuple:
+        return tuple(self._stages)
+
+    def __len__(self) -> int:
+        return len(self._stages)
+
+    def _invalidate(self, start: int):
+        for i in range(start, len(self._stages)):
+            self._stages[i] = self._stages[i].copy()
+
+    def append(self, op: Callable, label: str = '', **kwargs) -> ChainStage:
+        """Add op as the last stage"""
+        stage = ChainStage(op, kwargs, label)
+        self._stages.append(stage)
+        self._redo.clear()
+        return stage
+
+    def set_params(self, index: int, **kwargs) -> ChainStage:
+        """Change parameters of stage index; it and the stages after it become dirty"""
+        if not 0 <= index < len(self._stages):
+            raise ValueError(f"No stage {index} in a chain of {len(self._stages)}")
+        self._stages[index] = self._stages[index].copy(**kwargs)
+        self._invalidate(index + 1)
+        self._redo.clear()
+        return self._stages[index]
+
+    def remove(self, index: int) -> ChainStage:
+        """Delete stage index; the stages after it become dirty"""
+        if not 0 <= index < len(self._stages):
+            raise ValueError(f"No stage {index} in a chain of {len(self._stages)}")
+        stage = self._stages.pop(index)
+        self._invalidate(index)
+        self._redo.clear()
+        return stage
+
+    def clear(self):
+        """Remove every stage, keeping the source"""
+        self._stages = []
+        self._redo.clear()
+
+    # ---- Undo / redo of the last stage ----
+    def can_undo(self) -> bool:
+        return bool(self._stages)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo(self) -> Optional[ChainStage]:
+        """Take off the last stage; redo() puts it back with its cached result"""
+        if not self._stages:
+            return None
+        stage = self._stages.pop()
+        self._redo.append(stage)
+        return stage
+
+    def redo(self) -> Optional[ChainStage]:
+        if not self._redo:
+            return None
+        stage = self._redo.pop()
+        self._stages.append(stage)
+        return stage
+
+    # ---- Evaluation ----
+    def dirty_from(self) -> int:
+        """Index of the first stage without a cached result (len(self) if none)"""
+        for i, stage in enumerate(self._stages):
+            if stage.result is None:
+                return i
+        return len(self._stages)
+
+    def input_of(self, index: int) -> Optional[np.ndarray]:
+        """Image stage index is applied to, if it is available without computing"""
+        return self._source if index == 0 else self._stages[index - 1].result
+
+    def result(self, upto: Optional[int] = None) -> np.ndarray:
+        """Read-only result of stage upto (default: the last; the source if there are none)
+
+        Only stages from the first one without a cached result are run.
+        """
+        if self._source is None:
+            raise ValueError("Edit chain has no source image")
+        # Work on a snapshot; the list may be edited from another thread meanwhile
+        stages = self._stages[:len(self._stages) if upto is None else upto + 1]
+        img, start = self._source, 0
+        # Invalidation replaces every later stage too, so a cached result
+        # implies the stages before it are up to date
+        for i in range(len(stages) - 1, -1, -1):
+            if stages[i].result is not None:
+                img, start = stages[i].result, i + 1
+                break
+        for stage in stages[start:]:
+            img = _readonly(self.apply(stage.op, img, (), stage.kwargs))
+            stage.result = img
+            self.evaluations += 1
+        return img
+
+    def recipe(self) -> List[Dict]:
+        """The chain as a list of {"op": name, **params} entries"""
+        return [{'op': stage.name, **stage.kwargs} for stage in self._stages]
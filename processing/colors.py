@@ -4,66 +4,87 @@ This module contains all color-related transformations.
 """
 
 import numpy as np
+import cv2
 from typing import Tuple
 from .utils import _ensure_numpy, _apply_color_tint
+from . import backends
+
+try:
+    import numba
+except ImportError:  # optional JIT backend
+    numba = None
+
+
+def _as_rgb(img: np.ndarray) -> np.ndarray:
+    """Expand a 2-D grayscale image to RGB so it can be tinted; RGB passes through"""
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    return img
 
 
 def rgb_yellow(img: np.ndarray) -> np.ndarray:
     """Apply yellow tint (boost red and green channels)"""
-    return _apply_color_tint(img, r_factor=1.2, g_factor=1.2, b_factor=0.9)
+    return _apply_color_tint(_as_rgb(img), r_factor=1.2, g_factor=1.2, b_factor=0.9)
 
 
 def rgb_cyan(img: np.ndarray) -> np.ndarray:
     """Apply cyan tint (boost green and blue channels)"""
-    return _apply_color_tint(img, r_factor=0.9, g_factor=1.2, b_factor=1.2)
+    return _apply_color_tint(_as_rgb(img), r_factor=0.9, g_factor=1.2, b_factor=1.2)
 
 
 def rgb_orange(img: np.ndarray) -> np.ndarray:
     """Apply orange tint (strong red, slight green, reduce blue)"""
-    return _apply_color_tint(img, r_factor=1.25, g_factor=1.05, b_factor=0.85)
+    return _apply_color_tint(_as_rgb(img), r_factor=1.25, g_factor=1.05, b_factor=0.85)
 
 
 def rgb_purple(img: np.ndarray) -> np.ndarray:
     """Apply purple tint (boost red and blue, reduce green)"""
-    return _apply_color_tint(img, r_factor=1.2, g_factor=0.85, b_factor=1.2)
+    return _apply_color_tint(_as_rgb(img), r_factor=1.2, g_factor=0.85, b_factor=1.2)
 
 
 def rgb_grey(img: np.ndarray) -> np.ndarray:
-    """Convert to grayscale using luminance method"""
+    """Convert to grayscale (H, W) using luminance method"""
     return to_grayscale_luminance(img)
 
 
 def rgb_brown(img: np.ndarray) -> np.ndarray:
     """Apply brown tint (warm colors with darker bias)"""
-    return _apply_color_tint(img, r_factor=1.2, g_factor=1.0, b_factor=0.85, bias=-15)
+    return _apply_color_tint(_as_rgb(img), r_factor=1.2, g_factor=1.0, b_factor=0.85, bias=-15)
 
 
 def rgb_red(img: np.ndarray) -> np.ndarray:
     """Apply red tint (emphasize red channel)"""
-    return _apply_color_tint(img, r_factor=1.25, g_factor=0.9, b_factor=0.9)
+    return _apply_color_tint(_as_rgb(img), r_factor=1.25, g_factor=0.9, b_factor=0.9)
 
 
 # Grayscale conversion methods
+@backends.dispatched(tolerance=1)
 def to_grayscale_average(img: np.ndarray) -> np.ndarray:
-    """Convert RGB image to grayscale using average method"""
+    """Convert RGB image to (H, W) grayscale using average method"""
     _ensure_numpy()
     if img.ndim == 2:
         return img
+    if img.dtype != np.uint8:
+        # OpenCV works in the input's own type, without a float copy
+        return _to_grayscale_average_opencv(img)
 
     # Calculate average of RGB channels (R+G+B)/3
     img_f = img.astype(np.float32)
     gray = np.mean(img_f, axis=2)
     gray_uint8 = np.clip(gray, 0, 255).astype(np.uint8)
 
-    # Return as RGB for consistency
-    return np.stack([gray_uint8, gray_uint8, gray_uint8], axis=2)
+    return gray_uint8
 
 
+@backends.dispatched(tolerance=1)
 def to_grayscale_lightness(img: np.ndarray) -> np.ndarray:
-    """Convert RGB image to grayscale using lightness method (average of min/max)"""
+    """Convert RGB image to (H, W) grayscale using lightness method (average of min/max)"""
     _ensure_numpy()
     if img.ndim == 2:
         return img
+    if img.dtype != np.uint8:
+        # OpenCV works in the input's own type, without a float copy
+        return _to_grayscale_lightness_opencv(img)
 
     # Lightness method: average of min and max RGB values per pixel
     img_f = img.astype(np.float32)
@@ -72,18 +93,169 @@ def to_grayscale_lightness(img: np.ndarray) -> np.ndarray:
     gray = (max_rgb + min_rgb) / 2.0
     gray_uint8 = np.clip(gray, 0, 255).astype(np.uint8)
 
-    # Return as RGB for consistency
-    return np.stack([gray_uint8, gray_uint8, gray_uint8], axis=2)
+    return gray_uint8
 
 
+@backends.dispatched(tolerance=1)
 def to_grayscale_luminance(img: np.ndarray) -> np.ndarray:
-    """Convert RGB image to grayscale using optimized NumPy luminance method"""
+    """Convert RGB image to (H, W) grayscale using optimized NumPy luminance method"""
     _ensure_numpy()
     if img.ndim == 2:
         return img
+    if img.dtype != np.uint8:
+        # OpenCV works in the input's own type, without a float copy
+        return _to_grayscale_luminance_opencv(img)
 
     img_f = img.astype(np.float32)
     gray = np.dot(img_f, [0.299, 0.587, 0.114])
     gray_uint8 = np.clip(gray, 0, 255).astype(np.uint8)
 
-    return np.stack([gray_uint8, gray_uint8, gray_uint8], axis=2)
\ No newline at end of file
+    return gray_uint8
+
+
+# Fixed-point backends: integer weights, no float intermediates, processed in
+# blocks of rows so the widened temporaries stay in cache
+_BLOCK_ELEMENTS = 1 << 16
+
+# 0.299, 0.587, 0.114 scaled to 2**16 (the weights sum to exactly 2**16)
+_LUMINANCE_WEIGHTS_16 = (19595, 38470, 7471)
+
+# floor(s / 3) == (s * 21846) >> 16 for every s <= 765
+_THIRD_16 = 21846
+
+
+def _row_blocks(img: np.ndarray):
+    rows = max(1, _BLOCK_ELEMENTS // max(1, img.shape[1]))
+    for y0 in range(0, img.shape[0], rows):
+        yield y0, min(img.shape[0], y0 + rows)
+
+
+def _gray_average_fixed(img: np.ndarray) -> np.ndarray:
+    """(R + G + B) // 3, identical to the float version"""
+    gray = np.empty(img.shape[:2], np.uint8)
+    acc = None
+    for y0, y1 in _row_blocks(img):
+        block = img[y0:y1]
+        if acc is None:
+            acc = np.empty(block.shape[:2], np.uint32)
+        a = acc[:y1 - y0]
+        np.add(block[..., 0], block[..., 1], out=a, dtype=np.uint32)
+        a += block[..., 2]
+        a *= _THIRD_16
+        a >>= 16
+        gray[y0:y1] = a
+    return gray
+
+
+def _gray_lightness_fixed(img: np.ndarray) -> np.ndarray:
+    """(max + min) // 2 in uint8 without widening, identical to the float version"""
+    gray = np.empty(img.shape[:2], np.uint8)
+    for y0, y1 in _row_blocks(img):
+        block = img[y0:y1]
+        high = np.maximum(block[..., 0], block[..., 1])
+        np.maximum(high, block[..., 2], out=high)
+        low = np.minimum(block[..., 0], block[..., 1])
+        np.minimum(low, block[..., 2], out=low)
+        # floor((a + b) / 2) == (a >> 1) + (b >> 1) + (a & b & 1)
+        carry = high & low
+        carry &= 1
+        high >>= 1
+        low >>= 1
+        high += low
+        high += carry
+        gray[y0:y1] = high
+    return gray
+
+
+def _gray_luminance_fixed(img: np.ndarray) -> np.ndarray:
+    """Weighted sum with 16-bit fixed-point weights; within 1 of the float version"""
+    gray = np.empty(img.shape[:2], np.uint8)
+    wr, wg, wb = _LUMINANCE_WEIGHTS_16
+    acc = term = None
+    for y0, y1 in _row_blocks(img):
+        block = img[y0:y1]
+        if acc is None:
+            acc = np.empty(block.shape[:2], np.uint32)
+            term = np.empty_like(acc)
+        a, t = acc[:y1 - y0], term[:y1 - y0]
+        np.multiply(block[..., 0], wr, out=a, dtype=np.uint32)
+        np.multiply(block[..., 1], wg, out=t, dtype=np.uint32)
+        a += t
+        np.multiply(block[..., 2], wb, out=t, dtype=np.uint32)
+        a += t
+        a >>= 16
+        gray[y0:y1] = a
+    return gray
+
+
+def _fixed_gray(kernel):
+    def convert(img: np.ndarray) -> np.ndarray:
+        if img.ndim == 2:
+            return img
+        return kernel(img)
+    return convert
+
+
+backends.implementation('to_grayscale_average', 'fixed')(_fixed_gray(_gray_average_fixed))
+backends.implementation('to_grayscale_lightness', 'fixed')(_fixed_gray(_gray_lightness_fixed))
+backends.implementation('to_grayscale_luminance', 'fixed')(_fixed_gray(_gray_luminance_fixed))
+
+
+# OpenCV backends; they round where the NumPy versions truncate
+_AVERAGE_WEIGHTS = np.full((1, 3), 1.0 / 3.0, dtype=np.float32)
+
+
+@backends.implementation('to_grayscale_average', 'opencv')
+def _to_grayscale_average_opencv(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return img
+    return cv2.transform(img, _AVERAGE_WEIGHTS)
+
+
+@backends.implementation('to_grayscale_lightness', 'opencv')
+def _to_grayscale_lightness_opencv(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return img
+    r, g, b = cv2.split(img)
+    max_rgb = cv2.max(cv2.max(r, g), b)
+    min_rgb = cv2.min(cv2.min(r, g), b)
+    return cv2.addWeighted(max_rgb, 0.5, min_rgb, 0.5, 0)
+
+
+@backends.implementation('to_grayscale_luminance', 'opencv')
+def _to_grayscale_luminance_opencv(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+
+# numba backends: one fused pass per pixel. Serial on purpose: the parallel
+# TBB layer hangs interpreter exit when first launched from a worker thread,
+# which is where the GUI runs ops
+if numba is not None:
+    @numba.njit(cache=True)
+    def _gray_kernel(img, method):
+        height, width = img.shape[0], img.shape[1]
+        out = np.empty((height, width), dtype=np.uint8)
+        for y in range(height):
+            for x in range(width):
+                r, g, b = np.int32(img[y, x, 0]), np.int32(img[y, x, 1]), np.int32(img[y, x, 2])
+                if method == 0:
+                    v = (r + g + b) // 3
+                elif method == 1:
+                    v = (max(r, g, b) + min(r, g, b)) // 2
+                else:
+                    v = np.int32(r * 0.299 + g * 0.587 + b * 0.114)
+                out[y, x] = v
+        return out
+
+    def _numba_gray(method: int):
+        def convert(img: np.ndarray) -> np.ndarray:
+            if img.ndim == 2:
+                return img
+            return _gray_kernel(np.ascontiguousarray(img), method)
+        return convert
+
+    backends.implementation('to_grayscale_average', 'numba')(_numba_gray(0))
+    backends.implementation('to_grayscale_lightness', 'numba')(_numba_gray(1))
+    backends.implementation('to_grayscale_luminance', 'numba')(_numba_gray(2))
@@ -0,0 +1,200 @@
+"""
+On-disk cache of decoded images for repeated processing of the same sources.
+This module stores decoded images as .npy files in a directory, keyed by a
+hash of the encoded file's contents, so later opens skip decoding. Entries
+are opened with np.load(mmap_mode='r'): a hit costs a hash of the file and
+an mmap, and pixel data is only paged in as the image is touched.
+
+The store is bounded in size: when it grows past max_bytes the least
+recently used entries are deleted (a hit bumps the entry's modification
+time). Entries are written to a temporary file and renamed into place, so
+several processes, e.g. the batch pool, can share one directory. Within a
+process, unchanged files (same path, size and mtime) are not hashed again.
+
+Caching is off unless a directory is configured, with configure() or the
+PROCESSING_DECODE_CACHE environment variable; PROCESSING_DECODE_CACHE_MB
+sets the size bound:
+    PROCESSING_DECODE_CACHE=~/.cache/image-processing python main.py
+"""
+
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import warnings
+from typing import Optional
+
+import numpy as np
+
+from .io import decode_image, read_image
+
+ENV_DIR = 'PROCESSING_DECODE_CACHE'
+ENV_SIZE = 'PROCESSING_DECODE_CACHE_MB'
+DEFAULT_MAX_BYTES = 4096 * 1024 * 1024
+
+
+def _touch(path: str):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+class DecodeCache:
+    """Size-bounded, least-recently-used store of decoded images under directory"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError("Cache size must be positive")
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        # (real path, size, mtime) -> content digest
+        self._digests = {}
+        self._evict_lock = threading.Lock()
+
+    def _entry_path(self, digest: str, keep_depth: bool) -> str:
+        return os.path.join(self.directory, f"{digest}.{'depth' if keep_depth else 'rgb8'}.npy")
+
+    def _digest(self, file_path: str):
+        """Content digest of file_path, and the file's bytes if they had to be read"""
+        data = None
+        try:
+            st = os.stat(file_path)
+            stat_key = (os.path.realpath(file_path), st.st_size, st.st_mtime_ns)
+            digest = self._digests.get(stat_key)
+            if digest is None:
+                data = np.fromfile(file_path, dtype=np.uint8)
+        except OSError as e:
+            raise ValueError(f"Cannot read image: {file_path}: {e}") from None
+        if digest is None:
+            digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+            self._digests[stat_key] = digest
+        return digest, data
+
+    def read_image(self, file_path: str, keep_depth: bool = False) -> np.ndarray:
+        """processing.io.read_image through the cache
+
+        A hit returns a read-only memmap of the stored entry; a miss decodes
+        the file, stores the result and returns the decoded array.
+        """
+        digest, data = self._digest(file_path)
+        entry = self._entry_path(digest, keep_depth)
+        try:
+            img = np.load(entry, mmap_mode='r')
+        except (OSError, ValueError):
+            # Missing, evicted by another process, or unreadable
+            pass
+        else:
+            self.hits += 1
+            _touch(entry)
+            return img
+        self.misses += 1
+        if data is None:
+            return self._store(entry, read_image(file_path, keep_depth))
+        try:
+            img = decode_image(data, keep_depth)
+        except ValueError:
+            raise ValueError(f"Cannot decode image: {file_path}") from None
+        return self._store(entry, img)
+
+    def _store(self, entry: str, img: np.ndarray) -> np.ndarray:
+        if img.nbytes > self.max_bytes:
+            return img
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, img)
+            os.replace(tmp, entry)
+        except OSError:
+            # The cache is best effort; a full disk only costs the speed-up
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return img
+        self.evict()
+        return img
+
+    def _entries(self):
+        """(mtime, size, path) of every entry, oldest first"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.npy')):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self) -> int:
+        """Bytes currently stored"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes: Optional[int] = None):
+        """Delete least recently used entries until the store fits max_bytes"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._evict_lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= limit:
+                    break
+                try:
+                    # Open memmaps of the entry stay valid after the unlink
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                total -= size
+
+    def clear(self):
+        """Delete every entry"""
+        self.evict(0)
+        self._digests.clear()
+
+
+_default: Optional[DecodeCache] = None
+_env_loaded = False
+
+
+def configure(directory: Optional[str], max_bytes: int = DEFAULT_MAX_BYTES) -> Optional[DecodeCache]:
+    """Set the cache load_image uses by default; None turns caching off"""
+    global _default, _env_loaded
+    _env_loaded = True
+    _default = None if directory is None else DecodeCache(directory, max_bytes)
+    return _default
+
+
+def default_cache() -> Optional[DecodeCache]:
+    """The configured cache, set up from the environment on first use"""
+    global _env_loaded
+    if not _env_loaded:
+        _env_loaded = True
+        directory = os.environ.get(ENV_DIR)
+        if directory:
+            max_bytes = DEFAULT_MAX_BYTES
+            if os.environ.get(ENV_SIZE):
+                try:
+                    max_bytes = int(float(os.environ[ENV_SIZE]) * 1024 * 1024)
+                except ValueError:
+                    warnings.warn(f"Ignoring {ENV_SIZE}={os.environ[ENV_SIZE]!r}: not a number")
+            try:
+                configure(directory, max_bytes)
+            except (OSError, ValueError) as e:
+                warnings.warn(f"Decode cache disabled: {e}")
+    return _default
+
+
+def load_image(file_path: str, keep_depth: bool = False,
+               cache: Optional[DecodeCache] = None) -> np.ndarray:
+    """Read an image through cache (default: the configured one), or directly if there is none"""
+    cache = cache or default_cache()
+    if cache is None:
+        return read_image(file_path, keep_depth)
+    return cache.read_image(file_path, keep_depth)
@@ -1,29 +1,79 @@
 """
 Image enhancement operations for brightness, contrast, and other adjustments.
 This module contains all enhancement-related transformations.
+
+uint8 and uint16 images go through cached lookup tables (256 and 65536
+entries); float32 images are evaluated directly in float32. Brightness and
+contrast parameters are in 8-bit units and scale with the pixel type.
 """
 
 import numpy as np
+import cv2
 from typing import Tuple
-from .utils import _ensure_numpy
+from .utils import _ensure_numpy, max_value, saturate
+from .lut import get_lut, apply_lut, levels
+from . import backends
 
 
+@backends.dispatched()
 def invert(img: np.ndarray) -> np.ndarray:
     """Invert image colors using optimized NumPy operations"""
     _ensure_numpy()
+    if img.dtype != np.uint8:
+        return img.dtype.type(max_value(img.dtype)) - img
     return 255 - img
 
 
-def log_brightness(img: np.ndarray) -> np.ndarray:
-    """Apply logarithmic brightness enhancement"""
-    _ensure_numpy()
+@backends.implementation('invert', 'opencv')
+def _invert_opencv(img: np.ndarray) -> np.ndarray:
+    return cv2.bitwise_not(img)
+
+
+def _log_brightness_values(img: np.ndarray, dtype=np.uint8) -> np.ndarray:
+    """Log brightness formula, normalized by the maximum of img, saturated to dtype"""
+    scale = np.float32(max_value(dtype))
     img_f = img.astype(np.float32)
     # Normalize to 0..1
-    img_n = img_f / 255.0
+    img_n = img_f / scale
     log_img = np.log1p(img_n)
     log_img /= log_img.max() if log_img.max() > 0 else 1.0
-    out = (log_img * 255.0)
-    return np.clip(out, 0, 255).astype(np.uint8)
+    out = (log_img * scale)
+    return saturate(out, dtype)
+
+
+def _log_brightness_lut(peak: int, dtype=np.uint8) -> np.ndarray:
+    """Table for an image whose maximum is peak; higher entries are never used"""
+    values = levels(dtype)
+    lut = np.full(len(values), values[-1], dtype=dtype)
+    lut[:peak + 1] = _log_brightness_values(values[:peak + 1], dtype)
+    return lut
+
+
+def log_brightness(img: np.ndarray) -> np.ndarray:
+    """Apply logarithmic brightness enhancement"""
+    _ensure_numpy()
+    if img.dtype not in (np.uint8, np.uint16):
+        return _log_brightness_values(img, img.dtype)
+    # The mapping depends only on the image maximum, so there is one table per maximum
+    peak = int(img.max()) if img.size else 0
+    lut = get_lut(('log_brightness', img.dtype.str, peak), lambda: _log_brightness_lut(peak, img.dtype))
+    return apply_lut(img, lut)
+
+
+def _gamma_values(values: np.ndarray, gamma: float, dtype=np.uint8) -> np.ndarray:
+    """Gamma formula on values scaled to 0..1, saturated to dtype"""
+    scale = max_value(dtype)
+    inv_gamma = 1.0 / gamma
+    if np.dtype(dtype).kind == 'f':
+        # Evaluated in float32; negative values have no real power
+        return np.power(np.maximum(values, 0, dtype=np.float32), np.float32(inv_gamma))
+    out = np.power(values / scale, inv_gamma) * scale
+    return saturate(out, dtype)
+
+
+def _gamma_lut(gamma: float, dtype=np.uint8) -> np.ndarray:
+    """Build the gamma correction table for an integer pixel type"""
+    return _gamma_values(levels(dtype), gamma, dtype)
 
 
 def gamma_correction(img: np.ndarray, gamma: float = 1.0) -> np.ndarray:
@@ -35,30 +85,44 @@ def gamma_correction(img: np.ndarray, gamma: float = 1.0) -> np.ndarray:
     if abs(gamma - 1.0) < 1e-6:
         return img.copy()
 
-    # Use lookup table for better performance on repeated calls
-    inv_gamma = 1.0 / gamma
-    lut = np.power(np.arange(256) / 255.0, inv_gamma) * 255.0
-    lut = np.clip(lut, 0, 255).astype(np.uint8)
+    if img.dtype not in (np.uint8, np.uint16):
+        return _gamma_values(img, gamma, img.dtype).astype(img.dtype, copy=False)
+
+    # Use cached lookup table for better performance on repeated calls
+    lut = get_lut(('gamma_correction', img.dtype.str, gamma), lambda: _gamma_lut(gamma, img.dtype))
 
     # Apply using lookup table (faster than power function per pixel)
-    return lut[img]
+    return apply_lut(img, lut)
 
 
-def brightness_contrast(img: np.ndarray, brightness: float = 0.0, contrast: float = 1.0) -> np.ndarray:
-    """Adjust brightness and contrast using optimized NumPy operations"""
-    _ensure_numpy()
+def _brightness_contrast_values(img: np.ndarray, brightness: float, contrast: float,
+                                dtype=np.uint8) -> np.ndarray:
+    """Brightness/contrast formula evaluated in float32, saturated to dtype"""
+    # Parameters are given for 8-bit images
+    scale = np.float32(max_value(dtype) / 255.0)
 
     # Convert to float32 for calculations
     img_f = img.astype(np.float32)
 
     # Apply brightness adjustment
     if brightness != 0:
-        img_f += brightness
+        img_f += np.float32(brightness) * scale
 
     # Apply contrast adjustment using the formula: (img - 128) * contrast + 128
     if contrast != 1.0:
-        img_f = (img_f - 128.0) * contrast + 128.0
+        mid = np.float32(128.0) * scale
+        img_f = (img_f - mid) * np.float32(contrast) + mid
 
-    # Clip to valid range and convert back to uint8
-    return np.clip(img_f, 0, 255).astype(np.uint8)
+    # Clip to valid range and convert back
+    return saturate(img_f, dtype)
 
+
+def brightness_contrast(img: np.ndarray, brightness: float = 0.0, contrast: float = 1.0) -> np.ndarray:
+    """Adjust brightness and contrast using a cached lookup table"""
+    _ensure_numpy()
+    if img.dtype not in (np.uint8, np.uint16):
+        return _brightness_contrast_values(img, brightness, contrast, img.dtype)
+    lut = get_lut(('brightness_contrast', img.dtype.str, float(brightness), float(contrast)),
+                  lambda: _brightness_contrast_values(levels(img.dtype), brightness, contrast,
+                                                      img.dtype))
+    return apply_lut(img, lut)
@@ -3,9 +3,83 @@ Image filtering operations for image processing.
 This module contains all filter-related transformations including convolution-based filters.
 """
 
+from typing import Tuple, Union
+
 import numpy as np
 import cv2
-from .utils import _ensure_numpy
+from .utils import _ensure_numpy, convert_depth, max_value
+from . import frequency
+
+
+# Kernel size from which gaussian_blur switches to the box approximation
+_BOX_GAUSSIAN_MIN_KSIZE = 25
+
+
+def _check_ksize(ksize: int) -> int:
+    ksize = int(ksize)
+    if ksize < 1 or ksize % 2 == 0:
+        raise ValueError(f"Kernel size must be a positive odd number, got {ksize}")
+    return ksize
+
+
+def _gaussian_box_widths(ksize: int, sigma: float = 0.0, passes: int = 3) -> list:
+    """Box widths whose successive application approximates a Gaussian"""
+    if sigma <= 0:
+        # Same default as cv2.getGaussianKernel
+        sigma = 0.3 * ((ksize - 1) * 0.5 - 1) + 0.8
+    ideal = np.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(np.floor(ideal))
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower + 2
+    m = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes)
+              / (-4 * lower - 4))
+    return [lower if i < m else upper for i in range(passes)]
+
+
+def gaussian_blur_radius(ksize: int, sigma: float = 0.0) -> int:
+    """Pixels of context gaussian_blur reads on each side"""
+    ksize = _check_ksize(ksize)
+    if ksize < _BOX_GAUSSIAN_MIN_KSIZE:
+        return ksize // 2
+    return sum(width // 2 for width in _gaussian_box_widths(ksize, sigma))
+
+
+def convolve(img: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """Filter all channels of img with kernel, picking the cheapest form
+
+    Follows cv2.filter2D conventions (correlation, centred anchor, reflected
+    borders, output in the input dtype). Constant kernels run as box sums,
+    whose cost does not depend on the kernel size; rank-1 kernels run as a
+    row pass and a column pass; large dense kernels go through the FFT,
+    and anything else is a dense cv2.filter2D.
+    """
+    _ensure_numpy()
+    kernel = np.asarray(kernel, dtype=np.float32)
+    kh, kw = kernel.shape
+    value = float(kernel.flat[0])
+
+    if np.all(kernel == value):
+        if abs(value * kh * kw - 1.0) < 1e-6:
+            return cv2.blur(img, (kw, kh))
+        sums = cv2.boxFilter(img, cv2.CV_32F, (kw, kh), normalize=False)
+        out = np.rint(sums * value)
+        if np.issubdtype(img.dtype, np.integer):
+            info = np.iinfo(img.dtype)
+            out = np.clip(out, info.min, info.max)
+        return out.astype(img.dtype)
+
+    if kh > 1 and kw > 1:
+        u, sv, vt = np.linalg.svd(kernel.astype(np.float64))
+        if sv[1] <= 1e-6 * sv[0]:
+            scale = np.sqrt(sv[0])
+            kernel_x = (vt[0] * scale).astype(np.float32)
+            kernel_y = (u[:, 0] * scale).astype(np.float32)
+            return cv2.sepFilter2D(img, -1, kernel_x, kernel_y)
+
+    if kh * kw >= frequency.FFT_MIN_KERNEL_AREA and kh < img.shape[0] and kw < img.shape[1]:
+        return frequency.fft_convolve(img, kernel)
+    return cv2.filter2D(img, -1, kernel)
 
 
 def identity(img: np.ndarray) -> np.ndarray:
@@ -21,9 +95,83 @@ def _to_grayscale_if_needed(img: np.ndarray) -> np.ndarray:
     return img
 
 
-def _to_rgb_stack(gray_img: np.ndarray) -> np.ndarray:
-    """Convert grayscale to RGB stack for consistency"""
-    return np.stack([gray_img, gray_img, gray_img], axis=2)
+# Derivative kernels split into (derivative, smoothing) 1-D parts
+_GRADIENT_KERNELS = {
+    'prewitt': (np.array([-1, 0, 1], np.float32), np.array([1, 1, 1], np.float32)),
+}
+
+
+def image_gradients(img: np.ndarray, operator: str = 'sobel') -> Tuple[np.ndarray, np.ndarray]:
+    """Signed horizontal and vertical derivatives of the grayscale image
+
+    int16 for uint8 images; float32 for uint16 and float images, whose
+    derivatives do not fit in int16. Values are in the image's own units.
+    """
+    _ensure_numpy()
+    if operator != 'sobel' and operator not in _GRADIENT_KERNELS:
+        raise ValueError(f"Unknown gradient operator: {operator!r}")
+    gray = _to_grayscale_if_needed(img)
+    if gray.dtype == np.uint8:
+        if operator == 'sobel':
+            # Both derivatives in a single pass
+            return cv2.spatialGradient(gray)
+        depth = cv2.CV_16S
+    else:
+        max_value(gray.dtype)  # rejects pixel types the package does not handle
+        if operator == 'sobel':
+            return cv2.Sobel(gray, cv2.CV_32F, 1, 0), cv2.Sobel(gray, cv2.CV_32F, 0, 1)
+        depth = cv2.CV_32F
+    derivative, smoothing = _GRADIENT_KERNELS[operator]
+    gx = cv2.sepFilter2D(gray, depth, derivative, smoothing)
+    gy = cv2.sepFilter2D(gray, depth, smoothing, derivative)
+    return gx, gy
+
+
+def gradient_magnitude(img: np.ndarray, operator: str = 'sobel', norm: str = 'l2',
+                       orientation: bool = False
+                       ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """Gradient magnitude (float32), optionally with the orientation in degrees
+
+    norm is 'l1' (|Gx| + |Gy|) or 'l2' (sqrt(Gx^2 + Gy^2)). With
+    orientation=True a (magnitude, angle) pair is returned, the angle in
+    [0, 360) measured from the x axis towards y.
+    """
+    _ensure_numpy()
+    if norm not in ('l1', 'l2'):
+        raise ValueError(f"Unknown gradient norm: {norm!r}")
+    gx, gy = image_gradients(img, operator)
+    if norm == 'l1':
+        if gx.dtype == np.int16:
+            magnitude = (np.abs(gx, dtype=np.int16) + np.abs(gy, dtype=np.int16)).astype(np.float32)
+        else:
+            magnitude = np.abs(gx) + np.abs(gy)
+        if not orientation:
+            return magnitude
+        gx, gy = gx.astype(np.float32), gy.astype(np.float32)
+        return magnitude, cv2.phase(gx, gy, angleInDegrees=True)
+    gx, gy = gx.astype(np.float32), gy.astype(np.float32)
+    if orientation:
+        return cv2.cartToPolar(gx, gy, angleInDegrees=True)
+    return cv2.magnitude(gx, gy)
+
+
+def _saturate_abs(edges: np.ndarray, dtype, alpha: float = 1.0) -> np.ndarray:
+    """|alpha * edges| relative to the white level of dtype, saturated at 1 (float32)"""
+    edges = np.abs(edges * np.float32(alpha / max_value(dtype)))
+    return np.minimum(edges, np.float32(1), out=edges)
+
+
+def _edge_map(img: np.ndarray, operator: str) -> np.ndarray:
+    """Displayable (H, W) edge map: mean of the absolute derivatives, saturated at white
+
+    Keeps the pixel type of img; for uint16 and float images each derivative
+    is saturated at the type's white level, as convertScaleAbs does at 255.
+    """
+    gx, gy = image_gradients(img, operator)
+    if gx.dtype == np.int16:
+        return cv2.addWeighted(cv2.convertScaleAbs(gx), 0.5, cv2.convertScaleAbs(gy), 0.5, 0)
+    edges = cv2.addWeighted(_saturate_abs(gx, img.dtype), 0.5, _saturate_abs(gy, img.dtype), 0.5, 0)
+    return convert_depth(edges, img.dtype)
 
 
 def edge_detection_1(img: np.ndarray) -> np.ndarray:
@@ -37,29 +185,16 @@ def edge_detection_1(img: np.ndarray) -> np.ndarray:
                        [-1, -1, -1]], dtype=np.float32)
 
     edges = cv2.filter2D(gray, -1, kernel)
-    return _to_rgb_stack(edges)
+    if edges.dtype.kind == 'f':
+        # Saturate like the integer types, which clip negative responses to 0
+        np.clip(edges, 0, 1, out=edges)
+    return edges
 
 
 def edge_detection_2(img: np.ndarray) -> np.ndarray:
     """Edge detection using Prewitt kernel"""
     _ensure_numpy()
-    gray = _to_grayscale_if_needed(img)
-
-    # Prewitt horizontal kernel
-    kernel_x = np.array([[-1, 0, 1],
-                         [-1, 0, 1],
-                         [-1, 0, 1]], dtype=np.float32)
-
-    # Prewitt vertical kernel
-    kernel_y = np.array([[-1, -1, -1],
-                         [0,  0,  0],
-                         [1,  1,  1]], dtype=np.float32)
-
-    edges_x = cv2.filter2D(gray, -1, kernel_x)
-    edges_y = cv2.filter2D(gray, -1, kernel_y)
-    edges = cv2.addWeighted(edges_x, 0.5, edges_y, 0.5, 0)
-
-    return _to_rgb_stack(edges)
+    return _edge_map(img, 'prewitt')
 
 
 def edge_detection_3(img: np.ndarray) -> np.ndarray:
@@ -67,43 +202,25 @@ def edge_detection_3(img: np.ndarray) -> np.ndarray:
     _ensure_numpy()
     gray = _to_grayscale_if_needed(img)
 
-    # Laplacian kernel
-    kernel = np.array([[0,  1, 0],
-                       [1, -4, 1],
-                       [0,  1, 0]], dtype=np.float32)
-
-    edges = cv2.filter2D(gray, -1, kernel)
-    # Convert to absolute values and scale
-    edges = np.abs(edges)
-    edges = np.clip(edges * 2, 0, 255).astype(np.uint8)
-
-    return _to_rgb_stack(edges)
+    # 4-neighbour Laplacian kernel, kept signed so negative responses survive
+    if gray.dtype == np.uint8:
+        edges = cv2.Laplacian(gray, cv2.CV_16S, ksize=1)
+        # Absolute values scaled by 2, saturated to uint8
+        return cv2.convertScaleAbs(edges, alpha=2)
+    edges = cv2.Laplacian(gray, cv2.CV_32F, ksize=1)
+    return convert_depth(_saturate_abs(edges, gray.dtype, alpha=2), gray.dtype)
 
 
 def sharpen(img: np.ndarray) -> np.ndarray:
     """Sharpen filter using unsharp masking technique"""
     _ensure_numpy()
-    if img.ndim == 3 and img.shape[2] == 3:
-        # Apply sharpening to each channel
-        channels = cv2.split(img)
-        sharpened_channels = []
-        for ch in channels:
-            sharpened = _sharpen_channel(ch)
-            sharpened_channels.append(sharpened)
-        return cv2.merge(sharpened_channels)
-    else:
-        return _sharpen_channel(img)
-
-
-def _sharpen_channel(channel: np.ndarray) -> np.ndarray:
-    """Sharpen a single channel"""
     # Sharpening kernel
     kernel = np.array([[-1, -1, -1],
                        [-1,  9, -1],
                        [-1, -1, -1]], dtype=np.float32)
 
-    sharpened = cv2.filter2D(channel, -1, kernel)
-    return np.clip(sharpened, 0, 255).astype(np.uint8)
+    # All channels in one call
+    return convolve(img, kernel)
 
 
 def gaussian_blur_3x3(img: np.ndarray) -> np.ndarray:
@@ -118,6 +235,22 @@ def gaussian_blur_5x5(img: np.ndarray) -> np.ndarray:
     return cv2.GaussianBlur(img, (5, 5), 0)
 
 
+def gaussian_blur(img: np.ndarray, ksize: int = 5, sigma: float = 0.0) -> np.ndarray:
+    """Gaussian blur with any odd kernel size
+
+    Large kernels are approximated by three successive box blurs, so the
+    cost per pixel stays constant as the radius grows.
+    """
+    _ensure_numpy()
+    ksize = _check_ksize(ksize)
+    if ksize < _BOX_GAUSSIAN_MIN_KSIZE:
+        return cv2.GaussianBlur(img, (ksize, ksize), sigma)
+    out = img
+    for width in _gaussian_box_widths(ksize, sigma):
+        out = cv2.blur(out, (width, width))
+    return out
+
+
 def unsharp_masking(img: np.ndarray) -> np.ndarray:
     """Unsharp masking for image sharpening"""
     _ensure_numpy()
@@ -132,12 +265,13 @@ def unsharp_masking(img: np.ndarray) -> np.ndarray:
     return sharpened
 
 
-def average_filter(img: np.ndarray) -> np.ndarray:
-    """Average/mean filter"""
+def average_filter(img: np.ndarray, ksize: int = 3) -> np.ndarray:
+    """Average/mean filter with any odd kernel size"""
     _ensure_numpy()
-    # 3x3 average kernel
-    kernel = np.ones((3, 3), np.float32) / 9
-    return cv2.filter2D(img, -1, kernel)
+    ksize = _check_ksize(ksize)
+    # Constant kernel, so this runs as a box sum whose cost does not depend on ksize
+    kernel = np.ones((ksize, ksize), np.float32) / (ksize * ksize)
+    return convolve(img, kernel)
 
 
 def low_pass_filter(img: np.ndarray) -> np.ndarray:
@@ -147,19 +281,23 @@ def low_pass_filter(img: np.ndarray) -> np.ndarray:
     return cv2.GaussianBlur(img, (5, 5), 1.0)
 
 
+def _offset_difference(img: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """img - low saturated at 0, plus mid-grey (128 in 8-bit units) to make it visible"""
+    diff = cv2.subtract(img, low)
+    if diff.dtype.kind == 'f':
+        # Saturate like the integer types
+        np.maximum(diff, 0, out=diff)
+    return cv2.add(diff, 128 * max_value(diff.dtype) / 255)
+
+
 def high_pass_filter(img: np.ndarray) -> np.ndarray:
     """High pass filter - removes low frequency components"""
     _ensure_numpy()
     # Apply low pass filter
     low_pass = cv2.GaussianBlur(img, (5, 5), 1.0)
 
-    # Subtract low pass from original
-    high_pass = cv2.subtract(img, low_pass)
-
-    # Add offset to make result visible
-    high_pass = cv2.add(high_pass, 128)
-
-    return high_pass
+    # Subtract low pass from original, offset to make the result visible
+    return _offset_difference(img, low_pass)
 
 
 def bandstop_filter(img: np.ndarray) -> np.ndarray:
@@ -169,54 +307,17 @@ def bandstop_filter(img: np.ndarray) -> np.ndarray:
     blur_small = cv2.GaussianBlur(img, (3, 3), 0.5)
     blur_large = cv2.GaussianBlur(img, (9, 9), 2.0)
 
-    # Subtract the difference
-    bandstop = cv2.subtract(blur_small, blur_large)
-
-    # Add offset
-    bandstop = cv2.add(bandstop, 128)
-
-    return bandstop
+    # Subtract the difference, with an offset
+    return _offset_difference(blur_small, blur_large)
 
 
 def prewitt(img: np.ndarray) -> np.ndarray:
     """Prewitt edge detection operator"""
     _ensure_numpy()
-    gray = _to_grayscale_if_needed(img)
-
-    # Prewitt horizontal kernel
-    kernel_x = np.array([[-1, 0, 1],
-                         [-1, 0, 1],
-                         [-1, 0, 1]], dtype=np.float32)
-
-    # Prewitt vertical kernel
-    kernel_y = np.array([[-1, -1, -1],
-                         [0,  0,  0],
-                         [1,  1,  1]], dtype=np.float32)
-
-    edges_x = cv2.filter2D(gray, -1, kernel_x)
-    edges_y = cv2.filter2D(gray, -1, kernel_y)
-    edges = cv2.addWeighted(edges_x, 0.5, edges_y, 0.5, 0)
-
-    return _to_rgb_stack(edges)
+    return _edge_map(img, 'prewitt')
 
 
 def sobel(img: np.ndarray) -> np.ndarray:
     """Sobel edge detection operator"""
     _ensure_numpy()
-    gray = _to_grayscale_if_needed(img)
-
-    # Sobel horizontal kernel
-    kernel_x = np.array([[-1, 0, 1],
-                         [-2, 0, 2],
-                         [-1, 0, 1]], dtype=np.float32)
-
-    # Sobel vertical kernel
-    kernel_y = np.array([[-1, -2, -1],
-                         [0,  0,  0],
-                         [1,  2,  1]], dtype=np.float32)
-
-    edges_x = cv2.filter2D(gray, -1, kernel_x)
-    edges_y = cv2.filter2D(gray, -1, kernel_y)
-    edges = cv2.addWeighted(edges_x, 0.5, edges_y, 0.5, 0)
-
-    return _to_rgb_stack(edges)
\ No newline at end of file
+    return _edge_map(img, 'sobel')
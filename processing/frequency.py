@@ -0,0 +1,195 @@
+"""
+Frequency-domain filtering for image processing.
+This module filters images by multiplying their Fourier transform with a
+transfer function, and convolves with large kernels through the FFT.
+
+Transforms are real-input DFTs (OpenCV's packed CCS layout, the equivalent
+of numpy's rfft2) on a padded size that cv2.getOptimalDFTSize makes fast.
+Images are padded by reflection so the periodic transform does not wrap
+opposite borders into each other. Spectra of transfer functions and kernels
+are cached per (padded shape, parameters).
+"""
+
+from typing import Tuple
+
+import numpy as np
+import cv2
+
+from .utils import _ensure_numpy
+from .lut import LUTCache
+
+KINDS = ('ideal', 'butterworth', 'gaussian')
+BANDS = ('lowpass', 'highpass', 'bandpass', 'bandstop')
+
+# Dense kernels with at least this many taps are cheaper through the FFT
+FFT_MIN_KERNEL_AREA = 41 * 41
+
+# Padding is capped so huge spatial extents do not blow up the transform size
+_MAX_MARGIN = 512
+
+# Spectra are as large as the image, so only a few are kept
+_spectrum_cache = LUTCache(maxsize=8)
+
+
+def _frequency_grid(shape: Tuple[int, int]) -> np.ndarray:
+    """Distance of each DFT bin from DC, in cycles per pixel"""
+    fy = np.fft.fftfreq(shape[0]).astype(np.float32)
+    fx = np.fft.fftfreq(shape[1]).astype(np.float32)
+    return np.sqrt(fy[:, None] ** 2 + fx[None, :] ** 2)
+
+
+def _lowpass(d: np.ndarray, kind: str, cutoff: float, order: int) -> np.ndarray:
+    if kind == 'ideal':
+        return (d <= cutoff).astype(np.float32)
+    if kind == 'butterworth':
+        return 1.0 / (1.0 + (d / cutoff) ** (2 * order))
+    return np.exp(-(d * d) / (2.0 * cutoff * cutoff))
+
+
+def _bandstop(d: np.ndarray, kind: str, cutoff: float, width: float, order: int) -> np.ndarray:
+    if kind == 'ideal':
+        return ((d < cutoff - width / 2) | (d > cutoff + width / 2)).astype(np.float32)
+    d2 = d * d - cutoff * cutoff
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if kind == 'butterworth':
+            h = 1.0 / (1.0 + (d * width / d2) ** (2 * order))
+            # On the centre ring d2 == 0 and the response is fully stopped
+            return np.where(d2 == 0, 0.0, h).astype(np.float32)
+        h = 1.0 - np.exp(-(d2 / (d * width)) ** 2)
+        # At DC d == 0 and the band is far away
+        return np.where(d == 0, 1.0, h).astype(np.float32)
+
+
+def transfer_function(shape: Tuple[int, int], kind: str = 'gaussian', band: str = 'lowpass',
+                      cutoff: float = 0.1, width: float = 0.05, order: int = 2) -> np.ndarray:
+    """Real transfer function H(u, v) on the full DFT grid of shape
+
+    cutoff (and width for band filters) are in cycles per pixel, between 0
+    and 0.5. For band filters cutoff is the centre of the band. order only
+    applies to Butterworth filters.
+    """
+    _ensure_numpy()
+    if kind not in KINDS:
+        raise ValueError(f"Unknown filter kind: {kind!r}")
+    if band not in BANDS:
+        raise ValueError(f"Unknown filter band: {band!r}")
+    if not 0 < cutoff <= 0.5:
+        raise ValueError("Cutoff must be in (0, 0.5] cycles per pixel")
+    if band in ('bandpass', 'bandstop') and not 0 < width <= 1:
+        raise ValueError("Band width must be in (0, 1] cycles per pixel")
+
+    d = _frequency_grid(shape)
+    if band in ('lowpass', 'highpass'):
+        h = _lowpass(d, kind, cutoff, order)
+    else:
+        h = _bandstop(d, kind, cutoff, width, order)
+    if band in ('highpass', 'bandpass'):
+        h = 1.0 - h
+    return h.astype(np.float32)
+
+
+def _transfer_spectrum(shape: Tuple[int, int], kind: str, band: str, cutoff: float,
+                       width: float, order: int) -> np.ndarray:
+    """Transfer function in the packed layout cv2.mulSpectrums expects"""
+    def build():
+        h = transfer_function(shape, kind, band, cutoff, width, order)
+        # H is real and even, so its impulse response is real; transforming
+        # that back gives H in the packed layout of a real DFT
+        impulse = cv2.idft(cv2.merge([h, np.zeros_like(h)]),
+                           flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT)
+        return cv2.dft(impulse)
+
+    key = ('transfer', shape, kind, band, float(cutoff), float(width), int(order))
+    return _spectrum_cache.get(key, build)
+
+
+def _kernel_spectrum(shape: Tuple[int, int], kernel: np.ndarray) -> np.ndarray:
+    """Spectrum of kernel zero-padded to shape, with the kernel's top-left at the origin"""
+    def build():
+        padded = np.zeros(shape, np.float32)
+        padded[:kernel.shape[0], :kernel.shape[1]] = kernel
+        return cv2.dft(padded)
+
+    key = ('kernel', shape, kernel.shape, kernel.tobytes())
+    return _spectrum_cache.get(key, build)
+
+
+def _to_dtype(result: np.ndarray, dtype) -> np.ndarray:
+    """Round and saturate a float result to the input dtype"""
+    if dtype == np.uint8:
+        np.maximum(result, 0, out=result)
+        return cv2.convertScaleAbs(result)
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return np.clip(np.rint(result), info.min, info.max).astype(dtype)
+    return result.astype(dtype, copy=False)
+
+
+def _correlate_channels(img: np.ndarray, spectrum: np.ndarray, padded_shape: Tuple[int, int],
+                        top: int, left: int) -> list:
+    """Correlate each padded channel with the packed spectrum; float32 results, uncropped"""
+    h, w = img.shape[:2]
+    bottom = padded_shape[0] - h - top
+    right = padded_shape[1] - w - left
+    channels = [img] if img.ndim == 2 else cv2.split(img)
+    results = []
+    for channel in channels:
+        padded = cv2.copyMakeBorder(channel, top, bottom, left, right, cv2.BORDER_REFLECT_101)
+        spectrum_in = cv2.dft(padded.astype(np.float32, copy=False))
+        product = cv2.mulSpectrums(spectrum_in, spectrum, 0, conjB=True)
+        results.append(cv2.idft(product, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT))
+    return results
+
+
+def _margin(extent: float, size: int) -> int:
+    # Reflection needs the margin to stay inside the image
+    return int(max(0, min(np.ceil(extent), _MAX_MARGIN, size - 1)))
+
+
+def frequency_filter(img: np.ndarray, kind: str = 'gaussian', band: str = 'lowpass',
+                     cutoff: float = 0.1, width: float = 0.05, order: int = 2,
+                     offset: float = 0.0) -> np.ndarray:
+    """Filter an image with an ideal, Butterworth or Gaussian transfer function
+
+    band is 'lowpass', 'highpass', 'bandpass' or 'bandstop'; cutoff and width
+    are in cycles per pixel (0.5 is the Nyquist frequency). offset is added
+    after filtering, e.g. 128 to view high-pass output around mid-gray.
+    """
+    _ensure_numpy()
+    h, w = img.shape[:2]
+    # Spatial extent: three sigmas of a Gaussian whose cutoff is the lowest band edge
+    lowest = min(cutoff, width) if band in ('bandpass', 'bandstop') else cutoff
+    extent = 3.0 / (2.0 * np.pi * max(lowest, 1e-6))
+    top, left = _margin(extent, h), _margin(extent, w)
+    padded_shape = (cv2.getOptimalDFTSize(h + 2 * top), cv2.getOptimalDFTSize(w + 2 * left))
+
+    spectrum = _transfer_spectrum(padded_shape, kind, band, cutoff, width, order)
+    results = []
+    for filtered in _correlate_channels(img, spectrum, padded_shape, top, left):
+        filtered = filtered[top:top + h, left:left + w]
+        if offset:
+            filtered = filtered + np.float32(offset)
+        results.append(_to_dtype(filtered, img.dtype))
+    return results[0] if img.ndim == 2 else cv2.merge(results)
+
+
+def fft_convolve(img: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """Filter with kernel through the FFT, with cv2.filter2D conventions
+
+    Like filter2D this is a correlation with the anchor at the kernel centre,
+    reflected borders, and output in the input dtype.
+    """
+    _ensure_numpy()
+    kernel = np.ascontiguousarray(kernel, dtype=np.float32)
+    kh, kw = kernel.shape
+    h, w = img.shape[:2]
+    top, left = kh // 2, kw // 2
+    if top >= h or left >= w:
+        raise ValueError("Kernel is larger than the image")
+    # Enough room that the circular correlation never wraps into the output
+    padded_shape = (cv2.getOptimalDFTSize(h + kh - 1), cv2.getOptimalDFTSize(w + kw - 1))
+
+    spectrum = _kernel_spectrum(padded_shape, kernel)
+    results = [_to_dtype(filtered[:h, :w], img.dtype)
+               for filtered in _correlate_channels(img, spectrum, padded_shape, top, left)]
+    return results[0] if img.ndim == 2 else cv2.merge(results)
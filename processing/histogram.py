@@ -3,49 +3,235 @@ Histogram equalization and fuzzy histogram equalization operations.
 This module contains histogram-based image enhancement functions.
 """
 
+import threading
+import weakref
+from collections import OrderedDict
+
 import numpy as np
 import cv2
-from .utils import _ensure_numpy
+from .utils import _ensure_numpy, _is_frozen, convert_depth, max_value
+from .lut import apply_lut, levels
+
+
+# Bins counted by default per pixel type: one per value for integer images
+_DEFAULT_BINS = {np.dtype(np.uint8): 256, np.dtype(np.uint16): 65536, np.dtype(np.float32): 256}
+
+
+def _value_range(dtype) -> tuple:
+    """Range covered by the bins: every integer value, or 0..1 (inclusive) for floats"""
+    if np.dtype(dtype).kind == 'f':
+        # calcHist excludes the upper bound, and 1.0 is a valid value
+        return 0.0, float(np.nextafter(np.float32(1), np.float32(2)))
+    return 0, int(np.iinfo(dtype).max) + 1
+
+
+class ImageHistogram:
+    """Per-channel and luminance histograms of a uint8, uint16 or float32 image
+
+    All bins are counted in one sweep per channel. For edits that touch only
+    a tile or ROI, update_region subtracts the old pixels and adds the new
+    ones instead of recounting the whole image.
+
+    bins defaults to one bin per value for integer images (256 or 65536) and
+    256 bins over 0..1 for float images; fewer bins group neighbouring values.
+    """
+
+    def __init__(self, img: np.ndarray = None, luminance: bool = True, bins: int = None):
+        self.with_luminance = luminance
+        self.bins = bins
+        self.value_range = None
+        self.channel_counts = None
+        self.luminance_counts = None
+        if img is not None:
+            self.add(img)
+
+    def _count(self, img: np.ndarray, luminance: bool):
+        if img.dtype not in _DEFAULT_BINS:
+            raise ValueError(f"Histogram engine requires uint8, uint16 or float32 data, got {img.dtype}")
+        if self.value_range is None:
+            self.bins = self.bins or _DEFAULT_BINS[img.dtype]
+            self.value_range = _value_range(img.dtype)
+        bins, ranges = [self.bins], list(self.value_range)
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        counts = np.empty((channels, self.bins), dtype=np.int64)
+        for ch in range(channels):
+            counts[ch] = cv2.calcHist([img], [ch], None, bins, ranges).ravel()
+        lum = None
+        if luminance and channels == 3:
+            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+            lum = cv2.calcHist([gray], [0], None, bins, ranges).ravel().astype(np.int64)
+        return counts, lum
+
+    def add(self, region: np.ndarray):
+        """Count the pixels of region"""
+        counts, lum = self._count(region, self.with_luminance)
+        if self.channel_counts is None:
+            self.channel_counts = counts
+            self.luminance_counts = lum
+            return
+        self.channel_counts += counts
+        if lum is not None:
+            self.luminance_counts += lum
+
+    def subtract(self, region: np.ndarray):
+        """Remove the pixels of region from the counts"""
+        counts, lum = self._count(region, self.with_luminance)
+        self.channel_counts -= counts
+        if lum is not None:
+            self.luminance_counts -= lum
+
+    def update_region(self, old_region: np.ndarray, new_region: np.ndarray):
+        """Account for a tile or ROI whose pixels changed from old_region to new_region"""
+        self.subtract(old_region)
+        self.add(new_region)
+
+    @property
+    def channels(self) -> int:
+        return self.channel_counts.shape[0]
+
+    @property
+    def bin_edges(self) -> np.ndarray:
+        """Lower edge of each bin followed by the upper edge of the last one"""
+        return np.linspace(self.value_range[0], self.value_range[1], self.bins + 1)
+
+    @property
+    def luminance(self) -> np.ndarray:
+        """Luminance histogram (the single channel for grayscale images)"""
+        if self.channels == 1:
+            return self.channel_counts[0]
+        if self.luminance_counts is None:
+            raise ValueError("Luminance was not counted for this histogram")
+        return self.luminance_counts
+
+    def copy(self) -> 'ImageHistogram':
+        other = ImageHistogram(luminance=self.with_luminance, bins=self.bins)
+        other.value_range = self.value_range
+        other.channel_counts = self.channel_counts.copy()
+        if self.luminance_counts is not None:
+            other.luminance_counts = self.luminance_counts.copy()
+        return other
+
+
+# Histograms of frozen images, keyed by array identity (see histogram_of).
+# Used from the GUI thread and from worker threads running ops
+_HISTOGRAM_CACHE_SIZE = 8
+_histogram_cache = OrderedDict()
+_histogram_lock = threading.Lock()
+
+
+def histogram_of(img: np.ndarray, bins: int = None) -> ImageHistogram:
+    """Histogram of img, cached for frozen arrays
+
+    Arrays that are read-only down to the data they view cannot change
+    after counting, so views and equalization ops called on the same cached
+    image share one result. Other arrays are always recounted.
+    """
+    bins = bins or _DEFAULT_BINS.get(img.dtype)
+    if not _is_frozen(img):
+        return ImageHistogram(img, bins=bins)
+    key = (id(img), bins)
+    with _histogram_lock:
+        entry = _histogram_cache.get(key)
+        if entry is not None and entry[0]() is img:
+            _histogram_cache.move_to_end(key)
+            return entry[1]
+    hist = ImageHistogram(img, bins=bins)
+    with _histogram_lock:
+        _histogram_cache[key] = (weakref.ref(img), hist)
+        _histogram_cache.move_to_end(key)
+        while len(_histogram_cache) > _HISTOGRAM_CACHE_SIZE:
+            _histogram_cache.popitem(last=False)
+    return hist
 
 
 def histogram_equalization(img: np.ndarray) -> np.ndarray:
     """Apply histogram equalization to the image"""
     _ensure_numpy()
-    if img.ndim == 2:
-        # Grayscale image
-        return cv2.equalizeHist(img)
-    elif img.ndim == 3 and img.shape[2] == 3:
-        # RGB image - equalize each channel separately
-        channels = cv2.split(img)
-        eq_channels = [cv2.equalizeHist(ch) for ch in channels]
-        return cv2.merge(eq_channels)
+    if img.dtype.kind == 'f':
+        # Equalized over 65536 levels, then returned at the input's type
+        return convert_depth(histogram_equalization(convert_depth(img, np.uint16)), img.dtype)
+    if img.dtype not in (np.uint8, np.uint16):
+        raise ValueError(f"Histogram equalization requires a uint8, uint16 or float image, got {img.dtype}")
+    if img.ndim == 2 or (img.ndim == 3 and img.shape[2] == 3):
+        # Same tables as cv2.equalizeHist, per channel, applied in one pass
+        hist = histogram_of(img)
+        luts = [equalization_lut(counts) for counts in hist.channel_counts]
+        if img.ndim == 2:
+            return apply_lut(img, luts[0])
+        return apply_lut(img, np.stack(luts, axis=1).reshape(-1, 1, 3))
     else:
         raise ValueError(f"Unsupported image shape: {img.shape}")
 
 
+def equalization_lut(hist: np.ndarray) -> np.ndarray:
+    """Build the table cv2.equalizeHist would use for a channel with this histogram
+
+    One entry per bin: a 256-bin histogram gives a uint8 table, a 65536-bin
+    histogram a uint16 table.
+    """
+    hist = np.asarray(hist, dtype=np.int64).ravel()
+    levels = len(hist)
+    dtype = np.uint8 if levels <= 256 else np.uint16
+    total = int(hist.sum())
+    nonzero = np.flatnonzero(hist)
+    if len(nonzero) == 0:
+        return np.zeros(levels, dtype=dtype)
+    first = nonzero[0]
+    if hist[first] == total:
+        # Single-valued channel: OpenCV maps everything to that value
+        return np.full(levels, first, dtype=dtype)
+
+    # Same arithmetic as OpenCV: skip the first occupied bin, scale in float32, round
+    scale = np.float32((levels - 1) / (total - hist[first]))
+    cdf = np.cumsum(hist) - hist[first]
+    cdf[:first + 1] = 0
+    lut = np.rint(cdf.astype(np.float32) * scale)
+    return np.clip(lut, 0, levels - 1).astype(dtype)
+
+
+def _fuzzy_histogram(img: np.ndarray) -> ImageHistogram:
+    # The fuzzy sets are defined on the 8-bit intensity scale
+    return histogram_of(img if img.dtype == np.uint8 else convert_depth(img, np.uint8))
+
+
+def _apply_fuzzy_luts(img: np.ndarray, luts: list) -> np.ndarray:
+    """Map img through 8-bit fuzzy tables, one per channel, keeping its pixel type
+
+    The tables vary smoothly with intensity, so 16-bit and float pixels are
+    mapped by interpolating between entries rather than rounded to 8 bits.
+    """
+    if img.dtype == np.uint8:
+        return apply_lut(img, luts[0] if img.ndim == 2 else np.stack(luts, axis=1).reshape(256, 1, 3))
+    entries = np.arange(256, dtype=np.float64)
+    scale = 255 / max_value(img.dtype)
+    if img.dtype == np.uint16:
+        positions = levels(img.dtype) * scale
+        tables = [convert_depth(np.interp(positions, entries, lut).astype(np.float32) / 255, img.dtype)
+                  for lut in luts]
+        return apply_lut(img, tables[0] if img.ndim == 2 else np.stack(tables, axis=1).reshape(-1, 1, 3))
+    out = np.empty(img.shape, img.dtype)
+    for ch, lut in enumerate(luts):
+        src, dst = (img, out) if img.ndim == 2 else (img[..., ch], out[..., ch])
+        dst[...] = np.interp(src * scale, entries, lut) / 255
+    return out
+
+
 def fuzzy_histogram_equalization_rgb(img: np.ndarray) -> np.ndarray:
     """Apply fuzzy histogram equalization to RGB image"""
     _ensure_numpy()
+    if img.ndim == 2:
+        # A single channel has nothing to equalize per colour
+        return fuzzy_histogram_equalization_grayscale(img)
     if img.ndim != 3 or img.shape[2] != 3:
         raise ValueError("Fuzzy HE RGB requires RGB image")
 
-    # Convert to float for calculations
-    img_f = img.astype(np.float32)
-
-    # Apply fuzzy HE to each channel
-    result_channels = []
-    for ch in range(3):
-        channel = img_f[:, :, ch]
-        eq_channel = _fuzzy_equalize_channel(channel)
-        result_channels.append(eq_channel)
-
-    # Merge channels back
-    result = cv2.merge(result_channels)
-    return np.clip(result, 0, 255).astype(np.uint8)
+    # One table per channel from the shared histogram, applied in a single pass
+    luts = [fuzzy_equalization_lut(counts) for counts in _fuzzy_histogram(img).channel_counts]
+    return _apply_fuzzy_luts(img, luts)
 
 
 def fuzzy_histogram_equalization_grayscale(img: np.ndarray) -> np.ndarray:
-    """Apply fuzzy histogram equalization to grayscale image"""
+    """Apply fuzzy histogram equalization to the grayscale image; returns (H, W)"""
     _ensure_numpy()
     if img.ndim == 3 and img.shape[2] == 3:
         # Convert RGB to grayscale first
@@ -55,65 +241,53 @@ def fuzzy_histogram_equalization_grayscale(img: np.ndarray) -> np.ndarray:
     else:
         raise ValueError(f"Unsupported image shape: {img.shape}")
 
-    # Apply fuzzy equalization
-    eq_gray = _fuzzy_equalize_channel(gray.astype(np.float32))
-
-    # Return as RGB for consistency
-    eq_rgb = np.stack([eq_gray, eq_gray, eq_gray], axis=2)
-    return np.clip(eq_rgb, 0, 255).astype(np.uint8)
-
-
-def _fuzzy_equalize_channel(channel: np.ndarray) -> np.ndarray:
-    """Apply fuzzy histogram equalization to a single channel"""
-    # Define fuzzy membership functions
-    # Using triangular membership functions for dark, medium, bright
-
-    # Parameters for fuzzy sets
-    dark_center = 64
-    medium_center = 128
-    bright_center = 192
-    width = 64  # Width of triangular functions
-
-    # Calculate membership degrees
-    dark_membership = _triangular_membership(channel, dark_center, width)
-    medium_membership = _triangular_membership(channel, medium_center, width)
-    bright_membership = _triangular_membership(channel, bright_center, width)
+    # Apply fuzzy equalization; the luminance histogram is shared with the views
+    return _apply_fuzzy_luts(gray, [fuzzy_equalization_lut(_fuzzy_histogram(img).luminance)])
 
-    # Calculate histogram for each fuzzy set
-    hist_dark = cv2.calcHist([channel.astype(np.uint8)], [0], None, [256], [0, 256])
-    hist_medium = cv2.calcHist([channel.astype(np.uint8)], [0], None, [256], [0, 256])
-    hist_bright = cv2.calcHist([channel.astype(np.uint8)], [0], None, [256], [0, 256])
 
-    # Apply fuzzy equalization
-    # This is a simplified implementation
-    # In practice, fuzzy HE involves more complex operations
+# Fuzzy sets for dark, medium and bright intensities: (left, center, right).
+# The outer sets are shoulders, so memberships sum to 1 at every intensity.
+_FUZZY_SETS = ((0, 64, 128), (64, 128, 192), (128, 192, 255))
 
-    # For simplicity, we'll use a weighted combination
-    # based on membership degrees and equalized histograms
 
-    # Equalize each fuzzy histogram
-    eq_hist_dark = cv2.equalizeHist(channel.astype(np.uint8))
-    eq_hist_medium = cv2.equalizeHist(channel.astype(np.uint8))
-    eq_hist_bright = cv2.equalizeHist(channel.astype(np.uint8))
+def _fuzzy_memberships() -> np.ndarray:
+    """Membership degree of each of the 256 intensities in each fuzzy set, shape (3, 256)"""
+    x = np.arange(256, dtype=np.float64)
+    memberships = np.empty((len(_FUZZY_SETS), 256))
+    for k, (left, center, right) in enumerate(_FUZZY_SETS):
+        rising = (x - left) / (center - left)
+        falling = (right - x) / (right - center)
+        if k == 0:
+            rising = np.ones_like(x)
+        if k == len(_FUZZY_SETS) - 1:
+            falling = np.ones_like(x)
+        memberships[k] = np.clip(np.minimum(rising, falling), 0.0, 1.0)
+    return memberships
 
-    # Combine using membership weights
-    result = (dark_membership * eq_hist_dark +
-              medium_membership * eq_hist_medium +
-              bright_membership * eq_hist_bright) / (dark_membership + medium_membership + bright_membership + 1e-6)
 
-    return result
+_MEMBERSHIPS = _fuzzy_memberships()
 
 
-def _triangular_membership(x: np.ndarray, center: float, width: float) -> np.ndarray:
-    """Calculate triangular membership function"""
-    left = center - width
-    right = center + width
+def fuzzy_equalization_lut(hist: np.ndarray) -> np.ndarray:
+    """Build the fuzzy histogram equalization table for a channel with this histogram
 
-    membership = np.zeros_like(x, dtype=np.float32)
-    mask_left = (x >= left) & (x < center)
-    mask_right = (x >= center) & (x <= right)
+    Each fuzzy set gets its own histogram (the image histogram weighted by
+    the set's membership) and equalizes its share of pixels over the set's
+    support. An intensity's output is the membership-weighted average of
+    the per-set mappings.
+    """
+    hist = np.asarray(hist, dtype=np.float64).ravel()
+    x = np.arange(256, dtype=np.float64)
+    set_hist = _MEMBERSHIPS * hist
+    totals = set_hist.sum(axis=1, keepdims=True)
+    cdf = np.cumsum(set_hist, axis=1) / np.where(totals > 0, totals, 1.0)
 
-    membership[mask_left] = (x[mask_left] - left) / (center - left)
-    membership[mask_right] = (right - x[mask_right]) / (right - center)
+    lows = np.array([s[0] for s in _FUZZY_SETS], dtype=np.float64)[:, None]
+    highs = np.array([s[2] for s in _FUZZY_SETS], dtype=np.float64)[:, None]
+    mapped = lows + (highs - lows) * cdf
+    # A set with no pixels leaves intensities where they are
+    mapped = np.where(totals > 0, mapped, x)
 
-    return membership
\ No newline at end of file
+    weights = _MEMBERSHIPS.sum(axis=0)
+    out = (_MEMBERSHIPS * mapped).sum(axis=0) / weights
+    return np.clip(np.rint(out), 0, 255).astype(np.uint8)
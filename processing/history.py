@@ -0,0 +1,276 @@
+"""
+Undo/redo history of image processing results with bounded memory.
+This module records each step as the op that produced it, its parameters
+and the entry it was applied to, and keeps the resulting images only as
+far as a memory budget allows.
+
+Results are stored as grids of read-only tiles. A tile equal to the tile at
+the same place in the parent's (or the previous entry's) result is shared
+instead of copied, so a step that changes part of an image costs only the
+changed tiles; tiles never change once stored (copy-on-write). When the
+stored tiles exceed the budget, the oldest results are spilled to .npy
+files if a spill directory is given, or dropped otherwise. Every
+keyframe_interval-th step from the root is a keyframe and is released only
+after all other steps. A dropped result is rebuilt on demand by replaying
+the recorded ops from the nearest ancestor still available; the root image
+is always kept.
+"""
+
+import os
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .utils import _readonly
+
+DEFAULT_BUDGET = 1024 * 1024 * 1024
+DEFAULT_TILE_SIZE = 256
+DEFAULT_KEYFRAME_INTERVAL = 8
+
+
+def _call(op: Callable, img: np.ndarray, args: Sequence, kwargs: Dict) -> np.ndarray:
+    return op(img, *args, **kwargs)
+
+
+class _Tiles:
+    """An image as a grid of read-only tiles, shared with other images where equal"""
+
+    def __init__(self, img: np.ndarray, tile_size: int, bases: Sequence['_Tiles'] = (),
+                 copy: bool = True):
+        self.shape = img.shape
+        self.dtype = img.dtype
+        self.tile_size = tile_size
+        bases = [b for b in bases if b is not None and b.shape == img.shape
+                 and b.dtype == img.dtype and b.tile_size == tile_size]
+        self.grid = {}
+        h, w = img.shape[:2]
+        for y in range(0, h, tile_size):
+            for x in range(0, w, tile_size):
+                block = img[y:y + tile_size, x:x + tile_size]
+                for base in bases:
+                    tile = base.grid[(y, x)]
+                    if tile is block or np.array_equal(tile, block):
+                        break
+                else:
+                    tile = _readonly(block.copy() if copy else block)
+                self.grid[(y, x)] = tile
+
+    def assemble(self) -> np.ndarray:
+        out = np.empty(self.shape, self.dtype)
+        for (y, x), tile in self.grid.items():
+            out[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        return _readonly(out)
+
+
+class HistoryEntry:
+    """One step: op(parent's image, *args, **kwargs) and, budget permitting, its result"""
+
+    def __init__(self, op: Optional[Callable], args: Sequence, kwargs: Dict, label: str,
+                 parent: Optional['HistoryEntry'], keyframe: bool):
+        self.op = op
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs)
+        self.label = label
+        self.parent = parent
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.keyframe = keyframe
+        self._tiles: Optional[_Tiles] = None
+        self._spilled: Optional[str] = None
+
+    @property
+    def storage(self) -> str:
+        """'memory', 'disk', or 'replay' when the result has to be recomputed"""
+        if self._tiles is not None:
+            return 'memory'
+        return 'disk' if self._spilled is not None else 'replay'
+
+
+class History:
+    """Linear undo/redo stack of processing results under a memory budget
+
+    reset() starts a history from an image (the root entry); push() records
+    a result, dropping any steps that were undone. apply(op, img, args,
+    kwargs) is used to replay a step and must reproduce what was pushed.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET, tile_size: int = DEFAULT_TILE_SIZE,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 spill_dir: Optional[str] = None, apply: Callable = _call):
+        if budget_bytes < 0:
+            raise ValueError("Memory budget must not be negative")
+        if tile_size < 1 or keyframe_interval < 1:
+            raise ValueError("Tile size and keyframe interval must be positive")
+        self.budget_bytes = budget_bytes
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.spill_dir = spill_dir
+        self.apply = apply
+        self.entries: List[HistoryEntry] = []
+        self.index = -1
+        self._spill_tmp = None
+
+    # ---- Navigation ----
+    @property
+    def root(self) -> Optional[HistoryEntry]:
+        return self.entries[0] if self.entries else None
+
+    @property
+    def current(self) -> Optional[HistoryEntry]:
+        return self.entries[self.index] if self.entries else None
+
+    def can_undo(self) -> bool:
+        return self.index > 0
+
+    def can_redo(self) -> bool:
+        return self.index < len(self.entries) - 1
+
+    def undo(self) -> Optional[HistoryEntry]:
+        """Step back; returns the entry now current, or None if there is nothing to undo"""
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        return self.current
+
+    def redo(self) -> Optional[HistoryEntry]:
+        """Step forward again; returns the entry now current, or None"""
+        if not self.can_redo():
+            return None
+        self.index += 1
+        return self.current
+
+    # ---- Recording ----
+    def reset(self, image: np.ndarray, label: str = '') -> HistoryEntry:
+        """Start over from image; the root keeps a reference to it rather than a copy"""
+        self.close()
+        root = HistoryEntry(None, (), {}, label, None, keyframe=True)
+        root._tiles = _Tiles(image, self.tile_size, copy=False)
+        self.entries = [root]
+        self.index = 0
+        return root
+
+    def push(self, result: np.ndarray, op: Callable, args: Sequence = (),
+             kwargs: Optional[Dict] = None, label: str = '',
+             parent: Optional[HistoryEntry] = None) -> HistoryEntry:
+        """Record result = op(parent's image, *args, **kwargs) as the new current step
+
+        parent defaults to the current entry. Steps after the current one
+        (undone steps) are discarded.
+        """
+        if not self.entries:
+            raise ValueError("History has no root image; call reset() first")
+        parent = parent or self.current
+        if parent not in self.entries[:self.index + 1]:
+            raise ValueError("Parent is not in the history")
+        for dropped in self.entries[self.index + 1:]:
+            self._discard_spill(dropped)
+        del self.entries[self.index + 1:]
+
+        depth = parent.depth + 1
+        entry = HistoryEntry(op, args, kwargs or {}, label, parent,
+                             keyframe=depth % self.keyframe_interval == 0)
+        entry._tiles = _Tiles(result, self.tile_size, (parent._tiles, self.current._tiles))
+        self.entries.append(entry)
+        self.index += 1
+        self._enforce_budget()
+        return entry
+
+    # ---- Results ----
+    def image(self, entry: Optional[HistoryEntry] = None) -> np.ndarray:
+        """Read-only image of entry (default: current), replaying ops if it was dropped"""
+        entry = entry or self.current
+        if entry is None:
+            raise ValueError("History is empty")
+        if entry._tiles is not None:
+            return entry._tiles.assemble()
+        if entry._spilled is not None:
+            return np.load(entry._spilled, mmap_mode='r')
+        source, steps = self.replay_steps(entry)
+        img = self.image(source)
+        for step in steps:
+            img = self.apply(step.op, img, step.args, step.kwargs)
+        return self.store(entry, img)
+
+    def replay_steps(self, entry: Optional[HistoryEntry] = None) -> tuple:
+        """(source, steps): the nearest stored ancestor of entry and the steps leading from it
+
+        steps is empty when entry's result is stored. Replaying them with
+        apply() and passing the result to store() does what image() does, so
+        the costly part can run on another thread.
+        """
+        entry = entry or self.current
+        steps = []
+        source = entry
+        # The root is always stored
+        while source._tiles is None and source._spilled is None:
+            steps.append(source)
+            source = source.parent
+        return source, steps[::-1]
+
+    def store(self, entry: HistoryEntry, img: np.ndarray) -> np.ndarray:
+        """Keep a rebuilt result of entry, since it is likely to be shown again; returns it read-only
+
+        Ignored if entry has since left the history.
+        """
+        if entry in self.entries and entry._tiles is None:
+            entry._tiles = _Tiles(img, self.tile_size, (entry.parent._tiles,))
+            self._enforce_budget(keep=entry)
+        return _readonly(img)
+
+    def memory_bytes(self) -> int:
+        """Bytes held by stored tiles, counting shared tiles once; the root image is not counted"""
+        seen = {id(tile) for tile in self.root._tiles.grid.values()} if self.entries else set()
+        total = 0
+        for entry in self.entries[1:]:
+            if entry._tiles is None:
+                continue
+            for tile in entry._tiles.grid.values():
+                if id(tile) not in seen:
+                    seen.add(id(tile))
+                    total += tile.nbytes
+        return total
+
+    # ---- Budget ----
+    def _enforce_budget(self, keep: Optional[HistoryEntry] = None):
+        protected = (self.root, self.current, keep)
+        while self.memory_bytes() > self.budget_bytes:
+            stored = [e for e in self.entries if e._tiles is not None
+                      and not any(e is p for p in protected)]
+            if not stored:
+                break
+            # Oldest ordinary steps go first, keyframes last
+            victim = min(stored, key=lambda e: (e.keyframe, self.entries.index(e)))
+            self._release(victim)
+
+    def _release(self, entry: HistoryEntry):
+        if self.spill_dir is not None:
+            if self._spill_tmp is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill_tmp = tempfile.TemporaryDirectory(dir=self.spill_dir, prefix='history-')
+            path = os.path.join(self._spill_tmp.name, f'{id(entry):x}.npy')
+            try:
+                np.save(path, entry._tiles.assemble())
+                entry._spilled = path
+            except OSError:
+                # Disk full or unwritable: fall back to replaying the step
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        entry._tiles = None
+
+    def _discard_spill(self, entry: HistoryEntry):
+        if entry._spilled is not None:
+            try:
+                os.remove(entry._spilled)
+            except OSError:
+                pass
+            entry._spilled = None
+
+    def close(self):
+        """Forget every entry and delete spill files"""
+        self.entries = []
+        self.index = -1
+        if self._spill_tmp is not None:
+            self._spill_tmp.cleanup()
+            self._spill_tmp = None
@@ -0,0 +1,286 @@
+"""
+Image file input and output for image processing operations.
+This module decodes files straight to NumPy arrays and encodes arrays back
+to files without going through Qt, so it works in scripts and worker
+processes as well as in the GUI.
+
+Files are decoded with cv2.imdecode, which applies the EXIF orientation;
+formats OpenCV cannot read (e.g. GIF) fall back to Pillow. JPEG files can be
+decoded at 1/2, 1/4 or 1/8 resolution, which skips most of the decoding
+work when only a preview is needed. Encoder settings (PNG compression, JPEG
+quality, progressive and optimized JPEG, TIFF compression) are keyword
+arguments of write_image, and write_image_async runs the encoder on a
+background thread.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import cv2
+
+from .utils import PIXEL_TYPES, convert_depth
+
+# Decode reductions; the JPEG decoder does these natively
+REDUCTIONS = (1, 2, 4, 8)
+
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Keeps the file's depth and channel count but, unlike IMREAD_UNCHANGED,
+# still applies the EXIF orientation
+_KEEP_DEPTH_FLAGS = cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR
+
+# JPEG is always 8-bit, so keep_depth decodes it reduced natively as well
+_REDUCED_KEEP_DEPTH_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2 | _KEEP_DEPTH_FLAGS,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4 | _KEEP_DEPTH_FLAGS,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8 | _KEEP_DEPTH_FLAGS,
+}
+
+_JPEG_MAGIC = b'\xff\xd8\xff'
+
+# Pixel types each format can store; other types are converted to the deepest one
+_FORMAT_DEPTHS = {
+    '.png': (np.uint8, np.uint16),
+    '.tif': (np.uint8, np.uint16, np.float32),
+    '.tiff': (np.uint8, np.uint16, np.float32),
+    '.hdr': (np.float32,),
+    '.pfm': (np.float32,),
+}
+# OpenCV writes EXR only when built with OpenEXR and enabled through the
+# OPENCV_IO_ENABLE_OPENEXR environment variable, which is off by default
+if cv2.haveImageWriter('.exr'):
+    _FORMAT_DEPTHS['.exr'] = (np.float32,)
+
+TIFF_COMPRESSION = {
+    'none': cv2.IMWRITE_TIFF_COMPRESSION_NONE,
+    'lzw': cv2.IMWRITE_TIFF_COMPRESSION_LZW,
+    'deflate': cv2.IMWRITE_TIFF_COMPRESSION_ADOBE_DEFLATE,
+    'packbits': cv2.IMWRITE_TIFF_COMPRESSION_PACKBITS,
+}
+
+
+def _from_decoded(img: np.ndarray) -> np.ndarray:
+    """RGB or (H, W) array in one of PIXEL_TYPES from a BGR(A) decoder result"""
+    if img.ndim == 3:
+        if img.shape[2] == 1:
+            img = img[:, :, 0]
+        else:
+            code = cv2.COLOR_BGRA2RGB if img.shape[2] == 4 else cv2.COLOR_BGR2RGB
+            img = cv2.cvtColor(img, code)
+    if img.dtype.kind == 'f' and img.dtype != np.float32:
+        img = img.astype(np.float32)
+    if img.dtype not in PIXEL_TYPES:
+        raise ValueError(f"Unsupported pixel type: {img.dtype}")
+    return img
+
+
+def _shrink(img: np.ndarray, reduce: int) -> np.ndarray:
+    if reduce == 1:
+        return img
+    h, w = img.shape[:2]
+    size = (max(1, -(-w // reduce)), max(1, -(-h // reduce)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def _decode_pillow(data: np.ndarray, keep_depth: bool, reduce: int) -> Optional[np.ndarray]:
+    """Pillow fallback for formats OpenCV cannot decode; None if Pillow cannot either"""
+    from io import BytesIO
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    try:
+        pil_img = ImageOps.exif_transpose(Image.open(BytesIO(data.tobytes())))
+    except (UnidentifiedImageError, OSError):
+        return None
+    if not (keep_depth and pil_img.mode in ('L', 'I;16', 'F')):
+        pil_img = pil_img.convert('RGB')
+    if reduce > 1:
+        pil_img = pil_img.reduce(reduce)
+    return np.array(pil_img, dtype=np.uint16 if pil_img.mode == 'I;16' else None)
+
+
+def decode_image(data: Union[bytes, np.ndarray], keep_depth: bool = False,
+                 reduce: int = 1) -> np.ndarray:
+    """Decode an encoded image to an RGB uint8 array, or at its own depth with keep_depth
+
+    With keep_depth=True 16-bit and float images keep their pixel type and
+    single-channel images are returned as (H, W); alpha is dropped. reduce
+    (1, 2, 4 or 8) divides both dimensions, rounding up: JPEG is scaled
+    while decoding, other formats are decoded in full and then shrunk.
+    """
+    if reduce not in REDUCTIONS:
+        raise ValueError(f"Reduction must be one of {REDUCTIONS}")
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, bytes) else data
+    if keep_depth:
+        native = reduce > 1 and data[:len(_JPEG_MAGIC)].tobytes() == _JPEG_MAGIC
+        img = cv2.imdecode(data, _REDUCED_KEEP_DEPTH_FLAGS[reduce] if native else _KEEP_DEPTH_FLAGS)
+        if img is not None:
+            img = _from_decoded(img)
+            return img if native else _shrink(img, reduce)
+    else:
+        img = cv2.imdecode(data, _REDUCED_FLAGS.get(reduce, cv2.IMREAD_COLOR))
+        if img is not None:
+            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img = _decode_pillow(data, keep_depth, reduce)
+    if img is None:
+        raise ValueError("Cannot decode image")
+    return img
+
+
+def read_image(file_path: str, keep_depth: bool = False, reduce: int = 1) -> np.ndarray:
+    """Decode an image file without going through Qt
+
+    keep_depth and reduce are as in decode_image.
+    """
+    try:
+        data = np.fromfile(file_path, dtype=np.uint8)
+    except OSError as e:
+        raise ValueError(f"Cannot read image: {file_path}: {e}") from None
+    try:
+        return decode_image(data, keep_depth, reduce)
+    except ValueError:
+        raise ValueError(f"Cannot decode image: {file_path}") from None
+
+
+def image_size(file_path: str) -> Tuple[int, int]:
+    """(width, height) of an image file from its header, after EXIF orientation"""
+    from PIL import Image, UnidentifiedImageError
+    try:
+        with Image.open(file_path) as pil_img:
+            width, height = pil_img.size
+            # Orientations 5-8 swap the axes
+            if pil_img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                width, height = height, width
+    except (UnidentifiedImageError, OSError):
+        raise ValueError(f"Cannot read image: {file_path}") from None
+    return width, height
+
+
+def read_preview(file_path: str, width: int, height: int) -> np.ndarray:
+    """Decode file_path at the smallest reduction that still covers width x height
+
+    The result is RGB uint8 and at least the requested size unless the
+    image itself is smaller.
+    """
+    full_width, full_height = image_size(file_path)
+    reduce = 1
+    for factor in REDUCTIONS:
+        if full_width // factor >= width and full_height // factor >= height:
+            reduce = factor
+    return read_image(file_path, reduce=reduce)
+
+
+def encode_params(ext: str, quality: Optional[int] = None, progressive: bool = False,
+                  optimize: bool = False, png_compression: Optional[int] = None,
+                  tiff_compression: Optional[str] = None) -> List[int]:
+    """cv2.imencode parameters for ext; options that do not apply to the format are ignored
+
+    quality is the JPEG quality (0-100), png_compression the zlib level
+    (0-9) and tiff_compression one of TIFF_COMPRESSION.
+    """
+    ext = ext.lower()
+    params = []
+    if ext in ('.jpg', '.jpeg'):
+        if quality is not None:
+            if not 0 <= quality <= 100:
+                raise ValueError("JPEG quality must be between 0 and 100")
+            params += [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        if progressive:
+            params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+        if optimize:
+            params += [cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+    elif ext == '.png' and png_compression is not None:
+        if not 0 <= png_compression <= 9:
+            raise ValueError("PNG compression must be between 0 and 9")
+        params += [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+    elif ext in ('.tif', '.tiff') and tiff_compression is not None:
+        if tiff_compression not in TIFF_COMPRESSION:
+            raise ValueError(f"Unknown TIFF compression: {tiff_compression!r}")
+        params += [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSION[tiff_compression]]
+    return params
+
+
+def encode_image(arr: np.ndarray, ext: str = '.png', **options) -> np.ndarray:
+    """Encode an RGB or grayscale array in the format of ext; returns the encoded bytes
+
+    uint16 and float32 images are encoded at their own depth where the format
+    supports it (PNG, TIFF; HDR, PFM and, if enabled in OpenCV, EXR for
+    floats) and converted otherwise.
+    Keyword options are those of encode_params.
+    """
+    ext = ext.lower()
+    if ext == '.exr' and ext not in _FORMAT_DEPTHS:
+        raise ValueError("Cannot encode image as .exr: this OpenCV has no EXR codec or it is "
+                         "disabled (set OPENCV_IO_ENABLE_OPENEXR=1 in the environment)")
+    params = encode_params(ext, **options)
+    depths = _FORMAT_DEPTHS.get(ext, (np.uint8,))
+    if arr.dtype not in depths:
+        arr = convert_depth(arr, depths[-1] if arr.dtype.itemsize > 1 else depths[0])
+    if arr.ndim == 3 and arr.shape[2] == 3:
+        arr = cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+    elif arr.ndim != 2:
+        raise ValueError(f"Unsupported array shape: {arr.shape}")
+    try:
+        ok, buf = cv2.imencode(ext, arr, params)
+    except cv2.error as e:
+        raise ValueError(f"Cannot encode image as {ext}: {e}") from None
+    if not ok:
+        raise ValueError(f"Cannot encode image as {ext}")
+    return buf
+
+
+def write_image(file_path: str, arr: np.ndarray, **options) -> None:
+    """Encode an array to file, format chosen by extension (PNG by default)
+
+    Keyword options are those of encode_params, e.g. quality=90 for JPEG or
+    tiff_compression='lzw'.
+    """
+    ext = os.path.splitext(file_path)[1] or '.png'
+    encode_image(arr, ext, **options).tofile(file_path)
+
+
+class ImageWriter:
+    """Encodes and writes images on background threads
+
+    With one worker (the default) files are written in submission order;
+    with more, writes may finish in any order. The array must not be
+    modified until its future is done; read-only arrays are safe to pass
+    as they are.
+    """
+
+    def __init__(self, workers: int = 1):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-writer')
+
+    def submit(self, file_path: str, arr: np.ndarray, **options) -> Future:
+        """Queue a write_image call; the future's result is file_path"""
+        def write():
+            write_image(file_path, arr, **options)
+            return file_path
+        return self._pool.submit(write)
+
+    def close(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def write_image_async(file_path: str, arr: np.ndarray, **options) -> Future:
+    """write_image on the shared background writer"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ImageWriter()
+    return _writer.submit(file_path, arr, **options)
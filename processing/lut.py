@@ -0,0 +1,107 @@
+"""
+Lookup table registry for point operations.
+This module caches the tables used by parameterized point ops so repeated
+calls with the same settings only pay for the per-pixel lookup. Tables have
+256 entries for uint8 images and 65536 for uint16 images.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Callable, Hashable
+
+import numpy as np
+import cv2
+
+# Pixels looked up per block by apply_lut when OpenCV cannot do it
+_BLOCK_ELEMENTS = 1 << 16
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LUTCache:
+    """Thread-safe LRU cache of lookup tables keyed by (op, parameters)"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, builder: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the table for key, building it with builder() on a miss"""
+        with self._lock:
+            lut = self._tables.get(key)
+            if lut is not None:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return lut
+            self.misses += 1
+
+        lut = np.ascontiguousarray(builder())
+        # Tables are shared between callers, so they must not be modified
+        lut.setflags(write=False)
+
+        with self._lock:
+            self._tables[key] = lut
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.maxsize:
+                self._tables.popitem(last=False)
+        return lut
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._tables))
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared registry used by all point ops
+_registry = LUTCache()
+
+
+def get_lut(key: Hashable, builder: Callable[[], np.ndarray]) -> np.ndarray:
+    """Fetch a table from the shared registry"""
+    return _registry.get(key, builder)
+
+
+def lut_cache_info() -> CacheInfo:
+    """Report hits, misses and size of the shared registry"""
+    return _registry.info()
+
+
+def clear_lut_cache():
+    """Drop all cached tables and reset the counters"""
+    _registry.clear()
+
+
+def levels(dtype) -> np.ndarray:
+    """Every value of an integer pixel type, in order: the identity table"""
+    dtype = np.dtype(dtype)
+    if dtype not in (np.uint8, np.uint16):
+        raise ValueError(f"Lookup tables need uint8 or uint16 pixels, got {dtype}")
+    return np.arange(np.iinfo(dtype).max + 1, dtype=dtype)
+
+
+def apply_lut(img: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Map every pixel of a uint8 or uint16 image through a table indexed by pixel value
+
+    lut may also have shape (N, 1, C) to map each of C channels through its own table.
+    """
+    if lut.dtype == np.uint8 and img.dtype == np.uint8 and lut.shape[0] == 256:
+        return cv2.LUT(img, lut)
+    out = np.empty(img.shape, lut.dtype)
+    # np.take widens the indices to intp, so go a block of rows at a time
+    rows = max(1, _BLOCK_ELEMENTS // max(1, img[:1].size))
+    for y0 in range(0, img.shape[0], rows):
+        src, dst = img[y0:y0 + rows], out[y0:y0 + rows]
+        if lut.ndim == 3:
+            for ch in range(lut.shape[2]):
+                np.take(lut[:, 0, ch], src[..., ch], out=dst[..., ch])
+        else:
+            np.take(lut, src, out=dst)
+    return out
@@ -1,6 +1,8 @@
 import numpy as np
 
-# Core image ops expect uint8 arrays.
+# Core image ops expect uint8 arrays. Point ops, tints, grayscale, histograms
+# and arithmetic also take uint16 and float32 (nominally 0..1) arrays and
+# return the same type.
 # Channel order for inputs/outputs is RGB (not BGR).
 
 # Import utility functions
@@ -34,19 +36,27 @@ from .histogram import (
 )
 from .filters import (
     identity,
+    convolve,
     edge_detection_1,
     edge_detection_2,
     edge_detection_3,
     sharpen,
     gaussian_blur_3x3,
     gaussian_blur_5x5,
+    gaussian_blur,
     unsharp_masking,
     average_filter,
     low_pass_filter,
     high_pass_filter,
     bandstop_filter,
     prewitt,
-    sobel
+    sobel,
+    image_gradients,
+    gradient_magnitude
+)
+from .frequency import (
+    frequency_filter,
+    fft_convolve
 )
 from .arithmetic import (
     add_images,
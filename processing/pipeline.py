@@ -0,0 +1,167 @@
+"""
+Composable operation pipeline for image processing.
+This module chains functions from processing.ops and fuses consecutive
+per-pixel point operations into a single lookup table pass (256 entries for
+uint8 images, 65536 for uint16 images).
+"""
+
+import numpy as np
+import cv2
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+from .utils import _ensure_numpy
+from .lut import apply_lut, levels
+from .enhancement import invert, log_brightness, gamma_correction, brightness_contrast
+from .bitdepth import bit_depth
+from .arithmetic import add_constant, subtract_constant, multiply_constant, divide_constant
+
+
+# Ops whose output pixel depends only on the input pixel value and the parameters
+POINT_OPS = {
+    invert,
+    gamma_correction,
+    brightness_contrast,
+    bit_depth,
+    add_constant,
+    subtract_constant,
+    multiply_constant,
+    divide_constant,
+}
+
+# Point ops whose mapping also depends on the maximum value of their input
+MAX_DEPENDENT_POINT_OPS = {
+    log_brightness,
+}
+
+StageSpec = Union[Callable, Tuple[Callable, Dict]]
+
+
+class Stage:
+    """A single op with its keyword parameters"""
+
+    def __init__(self, fn: Callable, kwargs: Dict = None):
+        self.fn = fn
+        self.kwargs = dict(kwargs or {})
+
+    @property
+    def is_point_op(self) -> bool:
+        return self.fn in POINT_OPS or self.fn in MAX_DEPENDENT_POINT_OPS
+
+    def __call__(self, img: np.ndarray) -> np.ndarray:
+        return self.fn(img, **self.kwargs)
+
+    def __repr__(self):
+        params = ', '.join(f'{k}={v!r}' for k, v in self.kwargs.items())
+        return f'{self.fn.__name__}({params})'
+
+
+class _LutGroup:
+    """Consecutive point stages applied as one composed lookup table"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.data_dependent = any(s.fn in MAX_DEPENDENT_POINT_OPS for s in stages)
+        # Fixed mappings are composed once per pixel type, on first use
+        self._luts = {}
+
+    def _compose(self, dtype, present: np.ndarray) -> np.ndarray:
+        """Compose stage LUTs; present marks which input values occur in the image"""
+        identity = levels(dtype)
+        lut = identity
+        for stage in self.stages:
+            if stage.fn in MAX_DEPENDENT_POINT_OPS:
+                # Evaluate the op on 0..max so it normalizes by the same maximum
+                # it would see on the real image; higher values never occur.
+                max_val = int(lut[present].max()) if present.any() else 0
+                stage_lut = np.full(len(identity), identity[-1], dtype=dtype)
+                stage_lut[:max_val + 1] = stage(identity[:max_val + 1])
+            else:
+                stage_lut = stage(identity)
+            lut = stage_lut[lut]
+        return lut
+
+    def __call__(self, img: np.ndarray) -> np.ndarray:
+        if img.dtype not in (np.uint8, np.uint16):
+            # Float images have no table; run the stages one after another
+            for stage in self.stages:
+                img = stage(img)
+            return img
+        if self.data_dependent:
+            flat = np.ascontiguousarray(img).reshape(-1, 1)
+            bins = len(levels(img.dtype))
+            present = cv2.calcHist([flat], [0], None, [bins], [0, bins]).ravel() > 0
+            lut = self._compose(img.dtype, present)
+        else:
+            lut = self._luts.get(img.dtype)
+            if lut is None:
+                lut = self._luts[img.dtype] = self._compose(img.dtype, None)
+        if img.dtype == np.uint8:
+            return cv2.LUT(img, lut)
+        return apply_lut(img, lut)
+
+    def __repr__(self):
+        return 'LUT[' + ' -> '.join(repr(s) for s in self.stages) + ']'
+
+
+class Pipeline:
+    """Ordered chain of ops from processing.ops
+
+    Each stage is either an op function or an (op, kwargs) tuple, e.g.
+
+        Pipeline([(ops.gamma_correction, {'gamma': 0.8}),
+                  (ops.brightness_contrast, {'brightness': 10, 'contrast': 1.2}),
+                  ops.invert,
+                  (ops.bit_depth, {'bits': 4})])
+
+    Runs of consecutive point ops are fused into one lookup table, so the
+    result is bit-identical to calling the stages one by one but the image
+    is only traversed once per run.
+    """
+
+    def __init__(self, stages: Sequence[StageSpec] = ()):
+        self.stages: List[Stage] = []
+        self._plan = None
+        for spec in stages:
+            self.append(spec)
+
+    def append(self, spec: StageSpec, **kwargs) -> 'Pipeline':
+        """Add a stage at the end; returns self for chaining"""
+        if isinstance(spec, tuple):
+            fn, params = spec
+            kwargs = {**params, **kwargs}
+        else:
+            fn = spec
+        if not callable(fn):
+            raise TypeError(f"Pipeline stage is not callable: {fn!r}")
+        self.stages.append(Stage(fn, kwargs))
+        self._plan = None
+        return self
+
+    def plan(self) -> list:
+        """Return the execution plan: single stages and fused LUT groups"""
+        if self._plan is None:
+            plan = []
+            run = []
+            for stage in self.stages:
+                if stage.is_point_op:
+                    run.append(stage)
+                    continue
+                if run:
+                    plan.append(_LutGroup(run))
+                    run = []
+                plan.append(stage)
+            if run:
+                plan.append(_LutGroup(run))
+            self._plan = plan
+        return self._plan
+
+    def __call__(self, img: np.ndarray) -> np.ndarray:
+        _ensure_numpy()
+        for step in self.plan():
+            img = step(img)
+        return img
+
+    def __len__(self):
+        return len(self.stages)
+
+    def __repr__(self):
+        return 'Pipeline(' + ' -> '.join(repr(s) for s in self.plan()) + ')'
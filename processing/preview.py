@@ -0,0 +1,49 @@
+"""
+Downscaled preview support for interactive adjustments.
+This module keeps a cached pyramid of reduced copies of an image so
+previews can be computed at the size of the view instead of full resolution.
+"""
+
+import numpy as np
+import cv2
+from .utils import _ensure_numpy
+
+
+class PreviewPyramid:
+    """Halving pyramid of an image, built on demand and cached"""
+
+    def __init__(self, img: np.ndarray, min_size: int = 32):
+        _ensure_numpy()
+        self._levels = [img]
+        self._min_size = min_size
+
+    @property
+    def full(self) -> np.ndarray:
+        return self._levels[0]
+
+    def _build_next(self) -> bool:
+        """Add the next smaller level; returns False when the top is reached"""
+        top = self._levels[-1]
+        h, w = top.shape[:2]
+        if min(h, w) // 2 < self._min_size:
+            return False
+        half = cv2.resize(top, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+        half.setflags(write=False)
+        self._levels.append(half)
+        return True
+
+    def level_for(self, width: int, height: int) -> np.ndarray:
+        """Smallest level that still has at least one pixel per view pixel
+
+        The view fits the image keeping its aspect ratio, so a level is large
+        enough when it covers the view in at least one dimension.
+        """
+        index = 0
+        while True:
+            if index + 1 >= len(self._levels) and not self._build_next():
+                break
+            h, w = self._levels[index + 1].shape[:2]
+            if w < width and h < height:
+                break
+            index += 1
+        return self._levels[index]
@@ -1,75 +1,107 @@
 import numpy as np
-import cv2
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QMessageBox
 from PyQt5.QtGui import QImage, QPixmap
-
-
-def pixmap_to_numpy(pix: QPixmap) -> np.ndarray:
-    """Convert QPixmap to numpy array in RGB format"""
-    img = pix.toImage()
-    if img.isNull():
+from PyQt5 import sip
+from typing import Optional, Union
+from .histogram import histogram_of
+from .utils import convert_depth
+
+
+class _QImageBuffer:
+    """Exposes a QImage's pixels to NumPy and keeps the QImage alive while arrays use them"""
+
+    def __init__(self, qimg: QImage, shape: tuple, strides: tuple):
+        self._qimg = qimg
+        ptr = qimg.bits()  # detaches if shared, so writes never leak into other images
+        self.__array_interface__ = {
+            'shape': shape,
+            'strides': strides,
+            'typestr': '|u1',
+            'data': (int(ptr), False),
+            'version': 3,
+        }
+
+
+def qimage_to_numpy(qimg: QImage) -> np.ndarray:
+    """View a QImage as an RGB (H, W, 3) or grayscale (H, W) uint8 array without copying
+
+    Images that are not Format_RGB888 or Format_Grayscale8 are converted once.
+    The returned array keeps the QImage alive.
+    """
+    if qimg.isNull():
         raise ValueError("QImage is null")
+    if qimg.format() not in (QImage.Format_RGB888, QImage.Format_Grayscale8):
+        qimg = qimg.convertToFormat(QImage.Format_RGB888)
+    w = qimg.width()
+    h = qimg.height()
+    bpl = qimg.bytesPerLine()
+    if qimg.format() == QImage.Format_Grayscale8:
+        buf = _QImageBuffer(qimg, (h, w), (bpl, 1))
+    else:
+        buf = _QImageBuffer(qimg, (h, w, 3), (bpl, 3, 1))
+    return np.asarray(buf)
 
-    # Ensure ARGB32 backing for predictable byte layout (BGRA in memory)
-    img = img.convertToFormat(img.Format_ARGB32)
-
-    w = img.width()
-    h = img.height()
-    ptr = img.bits()
-    ptr.setsize(img.byteCount())
-    arr = np.frombuffer(ptr, np.uint8).reshape((h, img.bytesPerLine() // 4, 4))
-    # BGRA -> RGB
-    rgb = arr[:, :w, 0:3][:, :, ::-1]
-    return rgb.copy()
 
+def numpy_to_qimage(arr: np.ndarray) -> QImage:
+    """Wrap a uint8 RGB (H, W, 3) or grayscale (H, W) array as a QImage sharing its memory
 
-def numpy_to_pixmap(arr: np.ndarray) -> QPixmap:
-    """Convert numpy array to QPixmap"""
+    The QImage holds a reference to the array, so the buffer lives as long as
+    the image. Arrays whose rows are not laid out contiguously are copied once.
+    uint16 and float arrays are converted to an 8-bit copy for display.
+    """
+    if arr.dtype != np.uint8:
+        arr = convert_depth(arr, np.uint8)
     if arr.ndim == 2:
-        h, w = arr.shape
-        # Convert to 3-channel grayscale for display
-        arr_rgb = np.stack([arr, arr, arr], axis=2)
+        fmt = QImage.Format_Grayscale8
+        pixel_bytes = 1
     elif arr.ndim == 3 and arr.shape[2] == 3:
-        h, w, _ = arr.shape
-        arr_rgb = arr
+        fmt = QImage.Format_RGB888
+        pixel_bytes = 3
     else:
         raise ValueError("Unsupported array shape for image: %r" % (arr.shape,))
 
-    # Ensure contiguous in memory
-    arr_rgb = np.ascontiguousarray(arr_rgb)
-    # Create QImage from numpy array
-    qimg = QImage(arr_rgb.data, w, h, 3 * w, QImage.Format_RGB888)
-    # Deep copy to detach from numpy memory
-    return QPixmap.fromImage(qimg.copy())
+    # Pixels within a row must be packed; rows may be strided
+    if arr.strides[1] != pixel_bytes or (arr.ndim == 3 and arr.strides[2] != 1) or arr.strides[0] <= 0:
+        arr = np.ascontiguousarray(arr)
+    h, w = arr.shape[:2]
+    qimg = QImage(sip.voidptr(arr.ctypes.data), w, h, arr.strides[0], fmt)
+    qimg._array = arr
+    return qimg
 
 
-def show_histogram(image: np.ndarray, title: str):
-    """Display histogram of the image in a dialog"""
-    fig, ax = plt.subplots()
-    if image.ndim == 3 and image.shape[2] == 3:
+def pixmap_to_numpy(pix: QPixmap) -> np.ndarray:
+    """Convert QPixmap to numpy array in RGB format"""
+    # Reading back the pixmap and converting it to RGB888 are the only copies
+    return qimage_to_numpy(pix.toImage())
+
+
+def numpy_to_pixmap(arr: np.ndarray) -> QPixmap:
+    """Convert numpy array to QPixmap"""
+    # QPixmap.fromImage converts to the display format, which is the only copy
+    return QPixmap.fromImage(numpy_to_qimage(arr))
+
+
+def _plot_histogram(ax, image: np.ndarray, title: str):
+    """Plot the histogram of image on ax: one line per RGB channel, or black for grayscale"""
+    # 256 bins whatever the pixel type, plotted against pixel values
+    hist = histogram_of(image, bins=256)
+    values = hist.bin_edges[:-1]
+    if hist.channels == 3:
         # RGB image - show separate histograms for each channel
-        colors = ['red', 'green', 'blue']
-        for i, color in enumerate(colors):
-            hist = cv2.calcHist([image], [i], None, [256], [0, 256])
-            ax.plot(hist, color=color, label=color)
+        for counts, color in zip(hist.channel_counts, ['red', 'green', 'blue']):
+            ax.plot(values, counts, color=color, label=color)
         ax.legend()
     else:
         # Grayscale or single channel
-        if image.ndim == 3:
-            # Convert to grayscale for histogram
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = image
-        hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
-        ax.plot(hist, color='black')
-
+        ax.plot(values, hist.luminance, color='black')
     ax.set_title(title)
     ax.set_xlabel('Pixel Value')
     ax.set_ylabel('Frequency')
 
-    # Create dialog
+
+def _exec_figure_dialog(fig, title: str):
     dialog = QDialog()
     dialog.setWindowTitle(title)
     layout = QVBoxLayout()
@@ -79,72 +111,51 @@ def show_histogram(image: np.ndarray, title: str):
     dialog.exec_()
 
 
-def show_input_histogram(input_pixmap: QPixmap):
-    """Show histogram for input image"""
-    arr = pixmap_to_numpy(input_pixmap)
+def show_histogram(image: np.ndarray, title: str):
+    """Display histogram of the image in a dialog"""
+    fig, ax = plt.subplots()
+    _plot_histogram(ax, image, title)
+    _exec_figure_dialog(fig, title)
+
+
+def _as_array(image: Union[QPixmap, np.ndarray, None]) -> Optional[np.ndarray]:
+    """Return image as an ndarray, reading back pixmaps only when no array is available"""
+    if image is None:
+        return None
+    if isinstance(image, np.ndarray):
+        return image
+    if image.isNull():
+        return None
+    return pixmap_to_numpy(image)
+
+
+def show_input_histogram(input_image: Union[QPixmap, np.ndarray]):
+    """Show histogram for input image (cached array or pixmap)"""
+    arr = _as_array(input_image)
     show_histogram(arr, "Input Histogram")
 
 
-def show_output_histogram(output_pixmap: QPixmap):
-    """Show histogram for output image"""
-    if output_pixmap is None or output_pixmap.isNull():
+def show_output_histogram(output_image: Union[QPixmap, np.ndarray, None]):
+    """Show histogram for output image (cached array or pixmap)"""
+    arr = _as_array(output_image)
+    if arr is None:
         QMessageBox.information(None, 'Info', 'No output image available.')
         return
-    arr = pixmap_to_numpy(output_pixmap)
     show_histogram(arr, "Output Histogram")
 
 
-def show_input_output_histogram(input_pixmap: QPixmap, output_pixmap: QPixmap):
+def show_input_output_histogram(input_image: Union[QPixmap, np.ndarray],
+                                output_image: Union[QPixmap, np.ndarray, None]):
     """Show histograms for both input and output images side by side"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
 
-    # Input histogram
-    arr_in = pixmap_to_numpy(input_pixmap)
-    if arr_in.ndim == 3 and arr_in.shape[2] == 3:
-        colors = ['red', 'green', 'blue']
-        for i, color in enumerate(colors):
-            hist = cv2.calcHist([arr_in], [i], None, [256], [0, 256])
-            ax1.plot(hist, color=color, label=color)
-        ax1.legend()
-    else:
-        if arr_in.ndim == 3:
-            gray = cv2.cvtColor(arr_in, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = arr_in
-        hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
-        ax1.plot(hist, color='black')
-    ax1.set_title('Input Histogram')
-    ax1.set_xlabel('Pixel Value')
-    ax1.set_ylabel('Frequency')
-
-    # Output histogram
-    if output_pixmap is not None and not output_pixmap.isNull():
-        arr_out = pixmap_to_numpy(output_pixmap)
-        if arr_out.ndim == 3 and arr_out.shape[2] == 3:
-            colors = ['red', 'green', 'blue']
-            for i, color in enumerate(colors):
-                hist = cv2.calcHist([arr_out], [i], None, [256], [0, 256])
-                ax2.plot(hist, color=color, label=color)
-            ax2.legend()
-        else:
-            if arr_out.ndim == 3:
-                gray = cv2.cvtColor(arr_out, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = arr_out
-            hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
-            ax2.plot(hist, color='black')
-        ax2.set_title('Output Histogram')
-        ax2.set_xlabel('Pixel Value')
-        ax2.set_ylabel('Frequency')
+    _plot_histogram(ax1, _as_array(input_image), 'Input Histogram')
+
+    arr_out = _as_array(output_image)
+    if arr_out is not None:
+        _plot_histogram(ax2, arr_out, 'Output Histogram')
     else:
         ax2.text(0.5, 0.5, 'No Output Available', transform=ax2.transAxes, ha='center', va='center')
         ax2.set_title('Output Histogram')
 
-    # Create dialog
-    dialog = QDialog()
-    dialog.setWindowTitle("Input vs Output Histogram")
-    layout = QVBoxLayout()
-    canvas = FigureCanvas(fig)
-    layout.addWidget(canvas)
-    dialog.setLayout(layout)
-    dialog.exec_()
+    _exec_figure_dialog(fig, "Input vs Output Histogram")
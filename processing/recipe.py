@@ -0,0 +1,122 @@
+"""
+Recipe files: op chains saved as data and replayed on many images.
+A recipe lists processing.ops calls with their parameters, in order:
+
+    [{"op": "gamma_correction", "gamma": 0.8}, {"op": "sobel"}]
+
+Recipes are stored as JSON, or as YAML (.yaml/.yml) when PyYAML is
+installed; a mapping with a "steps" list is accepted as well. The GUI
+exports the current edit as a recipe (File -> Ekspor Resep) and batch mode
+replays it:
+
+    python -m processing.batch "photos/**/*.jpg" out/ --recipe look.json
+
+compile_recipe() validates a recipe and turns it into a Pipeline once:
+functions are resolved, consecutive point ops are fused into one lookup
+table, and a small sample image is run through it so tables, kernels and
+JIT backends are built before the first real image.
+"""
+
+import json
+import os
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from .pipeline import Pipeline
+
+Recipe = List[Dict]
+
+YAML_EXTENSIONS = ('.yaml', '.yml')
+
+# Sample run through a compiled recipe to build its lookup tables and caches
+_WARM_UP_SHAPE = (64, 64, 3)
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("PyYAML is required for YAML recipes. Please install 'pyyaml' "
+                          "or save the recipe as .json.") from None
+    return yaml
+
+
+def _is_yaml(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in YAML_EXTENSIONS
+
+
+def validate_recipe(recipe: Union[Sequence[Dict], Dict]) -> Recipe:
+    """Check every step names a batch op with valid parameters; returns the steps as a list"""
+    from .batch import resolve_op
+    if isinstance(recipe, dict):
+        if 'steps' not in recipe:
+            raise ValueError("Recipe mapping has no 'steps' list")
+        recipe = recipe['steps']
+    if not isinstance(recipe, (list, tuple)) or not recipe:
+        raise ValueError("Recipe must be a non-empty list of steps")
+    steps = []
+    for i, step in enumerate(recipe, 1):
+        if not isinstance(step, dict) or not isinstance(step.get('op'), str):
+            raise ValueError(f"Step {i}: expected a mapping with an 'op' name, got {step!r}")
+        params = {k: v for k, v in step.items() if k != 'op'}
+        try:
+            resolve_op(step['op'], params)
+        except ValueError as e:
+            raise ValueError(f"Step {i}: {e}") from None
+        steps.append({'op': step['op'], **params})
+    return steps
+
+
+def load_recipe(path: str) -> Recipe:
+    """Read and validate a JSON or YAML recipe file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if _is_yaml(path):
+            data = _yaml().safe_load(f)
+        else:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in recipe {path}: {e}") from None
+    return validate_recipe(data)
+
+
+def save_recipe(path: str, recipe: Sequence[Dict]):
+    """Validate recipe and write it as JSON, or YAML for .yaml/.yml paths"""
+    steps = validate_recipe(recipe)
+    with open(path, 'w', encoding='utf-8') as f:
+        if _is_yaml(path):
+            _yaml().safe_dump(steps, f, sort_keys=False)
+        else:
+            json.dump(steps, f, indent=2)
+            f.write('\n')
+
+
+def warm_up(pipeline: Pipeline, dtype=np.uint8):
+    """Run pipeline once on a small image of dtype to build its tables and caches"""
+    if np.issubdtype(dtype, np.integer):
+        high = np.iinfo(dtype).max
+        sample = np.linspace(0, high, int(np.prod(_WARM_UP_SHAPE))).astype(dtype)
+    else:
+        sample = np.linspace(0, 1, int(np.prod(_WARM_UP_SHAPE)), dtype=dtype)
+    pipeline(sample.reshape(_WARM_UP_SHAPE))
+
+
+def compile_recipe(recipe: Union[Sequence[Dict], Dict],
+                   warm_up_dtypes: Sequence = (np.uint8,)) -> Pipeline:
+    """Validate recipe and build a Pipeline for it, warmed up for each of warm_up_dtypes
+
+    A recipe that fails on the warm-up image, e.g. one dividing by zero,
+    raises ValueError here rather than on every image it is applied to.
+    """
+    from . import ops
+    steps = validate_recipe(recipe)
+    pipeline = Pipeline([(getattr(ops, step['op']), {k: v for k, v in step.items() if k != 'op'})
+                         for step in steps])
+    pipeline.plan()
+    for dtype in warm_up_dtypes:
+        try:
+            warm_up(pipeline, dtype)
+        except Exception as e:
+            raise ValueError(f"Recipe fails on a {np.dtype(dtype).name} sample image: {e}") from e
+    return pipeline
@@ -0,0 +1,321 @@
+"""
+Operations over stacks of images for noise reduction and exposure stacking.
+This module reduces many frames (mean, weighted sum, median, min, max,
+absolute difference from a reference) to a single image without holding
+the whole stack in memory.
+
+Frames are decoded in parallel threads a few at a time and streamed through
+a running accumulator. The median cannot be computed that way, so frames are
+spilled to a temporary file and reduced in blocks of rows. Every frame is
+resized to the first frame with ensure_same_dimensions and converted to its
+channel layout (grayscale or RGB) and pixel type. Files are decoded to 8-bit
+RGB unless keep_depth is set, which keeps 16-bit and float frames (and
+grayscale files) as they are, e.g. to stack HDR exposures.
+
+Usage:
+    python -m processing.stack "frames/*.png" mean.png mean
+    python -m processing.stack "frames/*.png" median.png median -j 8
+    python -m processing.stack "scans/*.tif" mean.tif mean --keep-depth
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import cv2
+
+from .utils import _ensure_numpy, convert_depth, saturate
+from .io import write_image
+from .decode_cache import load_image
+from .arithmetic import ensure_same_dimensions, match_channels
+
+Frame = Union[str, np.ndarray]
+
+# Source data loaded per block when reducing the spilled stack
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _load(frame: Frame, keep_depth: bool = False) -> np.ndarray:
+    return load_image(frame, keep_depth=keep_depth) if isinstance(frame, str) else np.asarray(frame)
+
+
+def _match(frame: np.ndarray, like: np.ndarray) -> np.ndarray:
+    """frame resized and converted to the channel layout and pixel type of like"""
+    frame = match_channels(ensure_same_dimensions(like, frame)[1], like)
+    return convert_depth(frame, like.dtype)
+
+
+def iter_frames(frames: Iterable[Frame], workers: Optional[int] = None,
+                keep_depth: bool = False) -> Iterator[np.ndarray]:
+    """Yield frames in order, decoding paths in parallel and matching the first frame
+
+    Paths are decoded to 8-bit RGB, or at their own depth and channel count
+    with keep_depth=True. At most about 2 * workers decoded frames are held
+    at a time.
+    """
+    _ensure_numpy()
+    workers = workers or os.cpu_count() or 1
+    first = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        sources = iter(frames)
+        exhausted = False
+        while True:
+            # Keep the decoders busy without reading the whole stack ahead
+            while not exhausted and len(pending) < 2 * workers:
+                try:
+                    pending.append(pool.submit(_load, next(sources), keep_depth))
+                except StopIteration:
+                    exhausted = True
+            if not pending:
+                break
+            frame = pending.popleft().result()
+            if first is None:
+                first = frame
+            else:
+                frame = _match(frame, first)
+            yield frame
+
+
+def _to_dtype(acc: np.ndarray, dtype, scale: float = 1.0) -> np.ndarray:
+    """Scale a float accumulator, round and saturate to the frames' pixel type"""
+    if scale != 1.0:
+        acc *= np.float32(scale)
+    if dtype == np.uint8:
+        np.maximum(acc, 0, out=acc)
+        return cv2.convertScaleAbs(acc)
+    if np.dtype(dtype).kind != 'f':
+        np.rint(acc, out=acc)
+    return saturate(acc, dtype)
+
+
+class _Mean:
+    """Running float32 sum; exact for up to 65793 uint8 or 256 uint16 frames"""
+
+    def __init__(self):
+        self.acc = None
+        self.dtype = None
+        self.count = 0
+
+    def add(self, frame: np.ndarray):
+        if self.acc is None:
+            self.acc = np.zeros(frame.shape, np.float32)
+            self.dtype = frame.dtype
+        cv2.accumulate(frame, self.acc)
+        self.count += 1
+
+    def result(self) -> np.ndarray:
+        return _to_dtype(self.acc, self.dtype, 1.0 / self.count)
+
+
+class _WeightedSum:
+    """Running sum of weight * frame, optionally divided by the sum of the weights"""
+
+    def __init__(self, weights: Sequence[float], normalize: bool = False):
+        self.weights = list(weights)
+        self.normalize = normalize
+        self.acc = None
+        self.dtype = None
+        self.count = 0
+
+    def add(self, frame: np.ndarray):
+        if self.count >= len(self.weights):
+            raise ValueError(f"More frames than weights ({len(self.weights)})")
+        if self.acc is None:
+            self.acc = np.zeros(frame.shape, np.float32)
+            self.dtype = frame.dtype
+        cv2.addWeighted(self.acc, 1.0, frame, self.weights[self.count], 0,
+                        dst=self.acc, dtype=cv2.CV_32F)
+        self.count += 1
+
+    def result(self) -> np.ndarray:
+        if self.count != len(self.weights):
+            raise ValueError(f"Got {self.count} frames for {len(self.weights)} weights")
+        scale = 1.0
+        if self.normalize:
+            total = sum(self.weights)
+            if total == 0:
+                raise ValueError("Weights sum to zero")
+            scale = 1.0 / total
+        return _to_dtype(self.acc, self.dtype, scale)
+
+
+class _Min:
+    """Running per-pixel minimum"""
+
+    reduce = staticmethod(cv2.min)
+
+    def __init__(self):
+        self.acc = None
+
+    def add(self, frame: np.ndarray):
+        if self.acc is None:
+            self.acc = frame.copy()
+        else:
+            self.reduce(self.acc, frame, dst=self.acc)
+
+    def result(self) -> np.ndarray:
+        return self.acc
+
+
+class _Max(_Min):
+    """Running per-pixel maximum"""
+
+    reduce = staticmethod(cv2.max)
+
+
+class _AbsDiff:
+    """Largest (or mean) absolute difference of each frame from a reference
+
+    The reference defaults to the first frame.
+    """
+
+    def __init__(self, reference: Optional[Frame] = None, reduce: str = 'max'):
+        if reduce not in ('max', 'mean'):
+            raise ValueError(f"Unknown reduction: {reduce!r}")
+        # Loaded at full depth; add() converts it to the frames' type
+        self.reference = None if reference is None else _load(reference, keep_depth=True)
+        self.reduce = reduce
+        self.acc = None
+        self.diff = None
+        self.count = 0
+
+    def add(self, frame: np.ndarray):
+        if self.reference is None:
+            self.reference = frame
+        elif self.acc is None:
+            self.reference = _match(self.reference, frame)
+        if self.acc is None:
+            self.diff = np.empty_like(frame)
+            self.acc = (np.zeros(frame.shape, np.float32) if self.reduce == 'mean'
+                        else np.zeros_like(frame))
+        cv2.absdiff(frame, self.reference, dst=self.diff)
+        if self.reduce == 'mean':
+            cv2.accumulate(self.diff, self.acc)
+        else:
+            cv2.max(self.acc, self.diff, dst=self.acc)
+        self.count += 1
+
+    def result(self) -> np.ndarray:
+        if self.reduce == 'mean':
+            return _to_dtype(self.acc, self.diff.dtype, 1.0 / self.count)
+        return self.acc
+
+
+class _Median:
+    """Per-pixel median: frames are spilled to a temporary file, then reduced by row blocks"""
+
+    def __init__(self, spill_dir: Optional[str] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+        self.spill_dir = spill_dir
+        self.chunk_bytes = chunk_bytes
+        self.file = None
+        self.shape = None
+        self.dtype = None
+        self.count = 0
+
+    def add(self, frame: np.ndarray):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(dir=self.spill_dir)
+            self.shape, self.dtype = frame.shape, frame.dtype
+        self.file.write(np.ascontiguousarray(frame).tobytes())
+        self.count += 1
+
+    def result(self) -> np.ndarray:
+        try:
+            self.file.flush()
+            stack = np.memmap(self.file, dtype=self.dtype, mode='r',
+                              shape=(self.count,) + self.shape)
+            out = np.empty(self.shape, self.dtype)
+            row_bytes = max(1, stack[:, :1].nbytes)
+            rows = max(1, self.chunk_bytes // row_bytes)
+            for y0 in range(0, self.shape[0], rows):
+                block = np.asarray(stack[:, y0:y0 + rows])
+                median = np.median(block, axis=0)
+                out[y0:y0 + rows] = np.rint(median) if out.dtype.kind in 'iu' else median
+            del stack
+            return out
+        finally:
+            self.file.close()
+
+
+STACK_OPS = {
+    'mean': _Mean,
+    'sum': _WeightedSum,
+    'median': _Median,
+    'min': _Min,
+    'max': _Max,
+    'absdiff': _AbsDiff,
+}
+
+
+def stack_images(frames: Iterable[Frame], op: str = 'mean', workers: Optional[int] = None,
+                 keep_depth: bool = False, **kwargs) -> np.ndarray:
+    """Reduce a stack of frames (arrays or paths) to one image
+
+    op is one of STACK_OPS. With keep_depth=True paths are decoded at their
+    own depth (see iter_frames). Extra keyword arguments go to the reduction:
+    weights and normalize for 'sum', reference and reduce ('max' or 'mean')
+    for 'absdiff', spill_dir and chunk_bytes for 'median'.
+    """
+    _ensure_numpy()
+    if op not in STACK_OPS:
+        raise ValueError(f"Unknown stack op: {op!r}")
+    reduction = STACK_OPS[op](**kwargs)
+    count = 0
+    for frame in iter_frames(frames, workers, keep_depth):
+        reduction.add(frame)
+        count += 1
+    if not count:
+        raise ValueError("No frames to stack")
+    return reduction.result()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m processing.stack',
+        description='Reduce every image matching a glob to a single image.')
+    parser.add_argument('input', help='Input glob, e.g. "frames/*.png" (quote it)')
+    parser.add_argument('output', help='Output image file')
+    parser.add_argument('op', choices=sorted(STACK_OPS), help='Stack operation')
+    parser.add_argument('--weights', type=float, nargs='+', help='Per-frame weights for sum')
+    parser.add_argument('--normalize', action='store_true', help='Divide sum by the total weight')
+    parser.add_argument('--reference', help='Reference image for absdiff (default: first frame)')
+    parser.add_argument('--reduce', choices=('max', 'mean'), default='max',
+                        help='How absdiff combines frames')
+    parser.add_argument('--spill-dir', help='Directory for the median spill file')
+    parser.add_argument('--keep-depth', action='store_true',
+                        help='Keep 16-bit/float pixels and grayscale files single-channel')
+    parser.add_argument('-j', '--workers', type=int, help='Decoder threads (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(args.input, recursive=True))
+    if not paths:
+        print(f"No files match {args.input!r}", file=sys.stderr)
+        return 1
+
+    kwargs = {}
+    if args.op == 'sum':
+        kwargs = {'weights': args.weights or [1.0] * len(paths), 'normalize': args.normalize}
+    elif args.op == 'absdiff':
+        kwargs = {'reference': args.reference, 'reduce': args.reduce}
+    elif args.op == 'median':
+        kwargs = {'spill_dir': args.spill_dir}
+
+    try:
+        result = stack_images(paths, args.op, args.workers, args.keep_depth, **kwargs)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    write_image(args.output, result)
+    print(f"Stacked {len(paths)} images with {args.op} into {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
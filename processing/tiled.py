@@ -0,0 +1,213 @@
+"""
+Tiled, out-of-core execution of image processing operations.
+This module streams horizontal strips of a (memory-mapped) source image
+through an op and writes each result strip straight to a memory-mapped
+output, so images larger than RAM can be processed.
+
+Neighbourhood filters get each strip with enough extra rows (the halo) for
+their kernel, and the halo rows are cropped from the result, so the output
+matches running the op on the whole image. Ops that need image-wide
+statistics run in two passes: the first collects statistics strip by strip,
+the second applies the resulting mapping.
+"""
+
+import os
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+import cv2
+
+from .utils import _ensure_numpy
+from .decode_cache import load_image
+from .lut import apply_lut
+from . import colors, enhancement, filters, histogram
+from .pipeline import POINT_OPS
+
+# Default amount of source data loaded per strip
+DEFAULT_STRIP_BYTES = 64 * 1024 * 1024
+
+
+# Kernel radius (rows of context needed on each side) for neighbourhood ops
+HALO: Dict[Callable, Union[int, Callable[[Dict], int]]] = {
+    filters.identity: 0,
+    filters.edge_detection_1: 1,
+    filters.edge_detection_2: 1,
+    filters.edge_detection_3: 1,
+    filters.sharpen: 1,
+    filters.average_filter: lambda kw: int(kw.get('ksize', 3)) // 2,
+    filters.gaussian_blur: lambda kw: filters.gaussian_blur_radius(kw.get('ksize', 5),
+                                                                   kw.get('sigma', 0.0)),
+    filters.gaussian_blur_3x3: 1,
+    filters.prewitt: 1,
+    filters.sobel: 1,
+    filters.gaussian_blur_5x5: 2,
+    filters.unsharp_masking: 2,
+    filters.low_pass_filter: 2,
+    filters.high_pass_filter: 2,
+    filters.bandstop_filter: 4,
+    # Per-pixel colour ops need no context
+    colors.rgb_yellow: 0,
+    colors.rgb_cyan: 0,
+    colors.rgb_orange: 0,
+    colors.rgb_purple: 0,
+    colors.rgb_grey: 0,
+    colors.rgb_brown: 0,
+    colors.rgb_red: 0,
+    colors.to_grayscale_average: 0,
+    colors.to_grayscale_lightness: 0,
+    colors.to_grayscale_luminance: 0,
+}
+HALO.update({fn: 0 for fn in POINT_OPS})
+
+
+class _HistogramEqualization:
+    """Two-pass histogram equalization: per-channel histograms, then per-channel LUTs"""
+
+    lut_builder = staticmethod(histogram.equalization_lut)
+
+    def __init__(self):
+        self.hist = None
+        self.luts = None
+
+    def _prepare(self, strip: np.ndarray) -> np.ndarray:
+        return strip
+
+    def collect(self, strip: np.ndarray):
+        if self.hist is None:
+            self.hist = histogram.ImageHistogram(luminance=False)
+        self.hist.add(self._prepare(strip))
+
+    def finish(self):
+        self.luts = [self.lut_builder(h) for h in self.hist.channel_counts]
+
+    def apply(self, strip: np.ndarray) -> np.ndarray:
+        strip = self._prepare(strip)
+        if strip.ndim == 2:
+            return apply_lut(strip, self.luts[0])
+        return cv2.merge([apply_lut(strip[:, :, ch], lut) for ch, lut in enumerate(self.luts)])
+
+
+class _FuzzyEqualizationRGB(_HistogramEqualization):
+    """Two-pass fuzzy histogram equalization per RGB channel"""
+
+    lut_builder = staticmethod(histogram.fuzzy_equalization_lut)
+
+
+class _FuzzyEqualizationGray(_FuzzyEqualizationRGB):
+    """Two-pass fuzzy histogram equalization of the grayscale image"""
+
+    def _prepare(self, strip: np.ndarray) -> np.ndarray:
+        if strip.ndim == 3:
+            return cv2.cvtColor(strip, cv2.COLOR_RGB2GRAY)
+        return strip
+
+
+class _LogBrightness:
+    """Two-pass log brightness: global maximum, then the matching table"""
+
+    def __init__(self):
+        self.max_value = 0
+        self.lut = None
+
+    def collect(self, strip: np.ndarray):
+        if strip.size:
+            self.max_value = max(self.max_value, int(strip.max()))
+
+    def finish(self):
+        self.lut = enhancement._log_brightness_lut(self.max_value)
+
+    def apply(self, strip: np.ndarray) -> np.ndarray:
+        return apply_lut(strip, self.lut)
+
+
+# Ops whose mapping depends on statistics of the whole image
+TWO_PASS_OPS = {
+    histogram.histogram_equalization: _HistogramEqualization,
+    histogram.fuzzy_histogram_equalization_rgb: _FuzzyEqualizationRGB,
+    histogram.fuzzy_histogram_equalization_grayscale: _FuzzyEqualizationGray,
+    enhancement.log_brightness: _LogBrightness,
+}
+
+
+def halo_for(op: Callable, kwargs: Optional[Dict] = None) -> int:
+    """Rows of context op needs on each side of a strip"""
+    if op not in HALO:
+        raise ValueError(f"No tiling rule for op: {getattr(op, '__name__', op)!r}")
+    halo = HALO[op]
+    return halo(kwargs or {}) if callable(halo) else halo
+
+
+def open_source(path: str, shape: Optional[tuple] = None, dtype=np.uint8) -> np.ndarray:
+    """Open an image for strip-wise reading
+
+    .npy files are memory-mapped; raw files are memory-mapped with the given
+    shape and dtype. Other formats cannot be decoded partially, so they are
+    decoded once into memory, or memory-mapped from the decode cache when one
+    is configured.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return np.load(path, mmap_mode='r')
+    if shape is not None:
+        return np.memmap(path, dtype=dtype, mode='r', shape=tuple(shape))
+    return load_image(path)
+
+
+def _strip_rows(src: np.ndarray, strip_bytes: int, halo: int) -> int:
+    row_bytes = max(1, src[:1].nbytes)
+    return max(2 * halo + 1, strip_bytes // row_bytes)
+
+
+def _open_output(output: Optional[str], shape: tuple, dtype) -> np.ndarray:
+    if output is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(output, mode='w+', dtype=dtype, shape=shape)
+
+
+def process_tiled(source: Union[str, np.ndarray], op: Callable, output: Optional[str] = None,
+                  strip_bytes: int = DEFAULT_STRIP_BYTES, **kwargs) -> np.ndarray:
+    """Apply op to source strip by strip
+
+    source is an array (typically a memmap) or a path accepted by open_source.
+    output is the path of an .npy file written incrementally as a memmap; when
+    None the result is collected in memory. Extra keyword arguments are passed
+    to op.
+    """
+    _ensure_numpy()
+    src = open_source(source) if isinstance(source, str) else source
+    height = src.shape[0]
+    out = None
+
+    if op in TWO_PASS_OPS:
+        if src.dtype != np.uint8:
+            raise ValueError(f"Tiled {op.__name__} requires a uint8 image")
+        mapping = TWO_PASS_OPS[op]()
+        rows = _strip_rows(src, strip_bytes, 0)
+        # Pass one: statistics
+        for y0 in range(0, height, rows):
+            mapping.collect(np.asarray(src[y0:y0 + rows]))
+        mapping.finish()
+        # Pass two: apply the mapping
+        for y0 in range(0, height, rows):
+            result = mapping.apply(np.asarray(src[y0:y0 + rows]))
+            if out is None:
+                out = _open_output(output, (height,) + result.shape[1:], result.dtype)
+            out[y0:y0 + rows] = result
+            if isinstance(out, np.memmap):
+                out.flush()
+        return out
+
+    halo = halo_for(op, kwargs)
+    rows = _strip_rows(src, strip_bytes, halo)
+    for y0 in range(0, height, rows):
+        y1 = min(height, y0 + rows)
+        # Read the strip plus its halo; image borders keep the op's own border handling
+        a0 = max(0, y0 - halo)
+        a1 = min(height, y1 + halo)
+        result = op(np.asarray(src[a0:a1]), **kwargs)
+        if out is None:
+            out = _open_output(output, (height,) + result.shape[1:], result.dtype)
+        out[y0:y1] = result[y0 - a0:y1 - a0]
+        if isinstance(out, np.memmap):
+            out.flush()
+    return out
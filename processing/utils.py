@@ -6,6 +6,7 @@ This module contains shared helper functions used across different processing mo
 import numpy as np
 from PIL import Image
 from typing import Union, Tuple
+from . import backends
 
 
 def _ensure_numpy():
@@ -13,6 +14,76 @@ def _ensure_numpy():
         raise ImportError("NumPy is required for image processing operations. Please install 'numpy'.")
 
 
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    """Mark an array read-only so it can be cached and shared safely"""
+    if arr is not None:
+        arr.setflags(write=False)
+    return arr
+
+
+def _is_frozen(arr: np.ndarray) -> bool:
+    """True if arr and every array it views are read-only, so its pixels cannot change
+
+    A read-only view of a writable array is not frozen: the data can still
+    be changed through the base. Views of buffers NumPy does not manage
+    (e.g. a QImage) are not frozen either, since their owner may write them.
+    """
+    while isinstance(arr, np.ndarray):
+        if arr.flags.writeable:
+            return False
+        if isinstance(arr, np.memmap):
+            # Read-only mappings of decode cache entries, which are replaced, never rewritten
+            return arr.mode == 'r'
+        arr = arr.base
+    return arr is None or isinstance(arr, bytes)
+
+
+# Pixel types the processing package works in. Integer images span their
+# whole type; float images are nominally 0..1, HDR values above 1 are kept
+PIXEL_TYPES = (np.uint8, np.uint16, np.float32)
+
+
+def max_value(dtype) -> float:
+    """Nominal white level of a pixel type: 255, 65535, or 1.0 for floats"""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return 1.0
+    if dtype in (np.uint8, np.uint16):
+        return float(np.iinfo(dtype).max)
+    raise ValueError(f"Unsupported pixel type: {dtype}")
+
+
+def saturate(result: np.ndarray, dtype) -> np.ndarray:
+    """Clip a float result to the range of an integer dtype and truncate; floats are only cast"""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return result.astype(dtype, copy=False)
+    return np.clip(result, 0, max_value(dtype)).astype(dtype)
+
+
+def convert_depth(img: np.ndarray, dtype) -> np.ndarray:
+    """Rescale img to another pixel type, rounding and saturating integer results"""
+    import cv2
+    dtype = np.dtype(dtype)
+    if img.dtype == dtype:
+        return img
+    scale = max_value(dtype) / max_value(img.dtype)
+    if dtype.kind == 'f':
+        result = img.astype(dtype)
+        result *= dtype.type(scale)
+        return result
+    if dtype == np.uint8:
+        # convertScaleAbs takes the absolute value, so negative floats are zeroed first
+        src = np.maximum(img, 0) if img.dtype.kind == 'f' else img
+        return cv2.convertScaleAbs(src, alpha=scale)
+    if img.dtype == np.uint8:
+        # 255 * 257 == 65535, exact in integers
+        return img.astype(np.uint16) * np.uint16(257)
+    result = np.clip(img.astype(np.float32, copy=False) * np.float32(scale), 0, 65535)
+    result += np.float32(0.5)
+    return result.astype(np.uint16)
+
+
 def _pil_to_numpy(pil_img: Image.Image) -> np.ndarray:
     """Convert PIL Image to numpy array (RGB)"""
     return np.array(pil_img)
@@ -28,10 +99,24 @@ def _numpy_to_pil(arr: np.ndarray) -> Image.Image:
         raise ValueError(f"Unsupported array shape: {arr.shape}")
 
 
+@backends.dispatched(tolerance=1, sample_kwargs={'r_factor': 1.2, 'g_factor': 0.85,
+                                                  'b_factor': 1.1, 'bias': -15})
 def _apply_color_tint(img: np.ndarray, r_factor: float = 1.0, g_factor: float = 1.0,
                      b_factor: float = 1.0, bias: int = 0) -> np.ndarray:
-    """Apply color tint using optimized NumPy operations"""
+    """Apply color tint using optimized NumPy operations
+
+    bias is in 8-bit units and scales with the pixel type.
+    """
     _ensure_numpy()
+    if img.dtype == np.uint16:
+        # One 65536-entry table per channel rather than a float copy of the image
+        return _apply_color_tint_fixed(img, r_factor, g_factor, b_factor, bias)
+    if img.dtype != np.uint8:
+        # Floats are evaluated in float32 and not clipped, so HDR values survive
+        factors = np.array([r_factor, g_factor, b_factor], dtype=np.float32)
+        tinted = img.astype(np.float32) * factors
+        tinted += np.float32(bias / 255.0)
+        return tinted.astype(img.dtype, copy=False)
 
     # Ensure image is float32 for calculations
     img_f = img.astype(np.float32)
@@ -44,4 +129,37 @@ def _apply_color_tint(img: np.ndarray, r_factor: float = 1.0, g_factor: float =
         tinted += bias
 
     # Clip to valid range and convert back to uint8
-    return np.clip(tinted, 0, 255).astype(np.uint8)
\ No newline at end of file
+    return np.clip(tinted, 0, 255).astype(np.uint8)
+
+
+def _tint_lut(r_factor: float, g_factor: float, b_factor: float, bias: int,
+              dtype=np.uint8) -> np.ndarray:
+    """Per-channel tables with the exact arithmetic of the float version, shape (N, 1, 3)"""
+    from .lut import levels as lut_levels
+    values = lut_levels(dtype)
+    levels = values.astype(np.float32)[:, None]
+    tinted = levels * np.array([r_factor, g_factor, b_factor])
+    if bias != 0:
+        tinted += bias * max_value(dtype) / 255.0
+    return saturate(tinted, dtype).reshape(len(values), 1, 3)
+
+
+@backends.implementation('_apply_color_tint', 'fixed')
+def _apply_color_tint_fixed(img: np.ndarray, r_factor: float = 1.0, g_factor: float = 1.0,
+                            b_factor: float = 1.0, bias: int = 0) -> np.ndarray:
+    """Tint as one cached table per channel, identical to the float version"""
+    from .lut import get_lut, apply_lut
+    key = ('tint', img.dtype.str, float(r_factor), float(g_factor), float(b_factor), float(bias))
+    lut = get_lut(key, lambda: _tint_lut(r_factor, g_factor, b_factor, bias, img.dtype))
+    return apply_lut(img, lut)
+
+
+@backends.implementation('_apply_color_tint', 'opencv')
+def _apply_color_tint_opencv(img: np.ndarray, r_factor: float = 1.0, g_factor: float = 1.0,
+                             b_factor: float = 1.0, bias: int = 0) -> np.ndarray:
+    """Per-channel scale and bias as a single cv2.transform pass (rounds instead of truncating)"""
+    import cv2
+    matrix = np.array([[r_factor, 0, 0, bias],
+                       [0, g_factor, 0, bias],
+                       [0, 0, b_factor, bias]], dtype=np.float32)
+    return cv2.transform(img, matrix)
@@ -0,0 +1,161 @@
+"""
+Cross-check every backend registered in processing.backends.
+
+Each alternative backend must stay within its op's tolerance of the
+reference (NumPy) implementation, on odd shapes and on 2-D input, whether
+it is picked by calibration, pinned, or selected through PROCESSING_BACKENDS;
+calibration alone only ever picks backends that match the reference exactly.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import backends, ops, utils  # noqa: E402
+
+# Odd sizes exercise row padding and partial SIMD blocks
+SHAPES = [(1, 1, 3), (7, 5, 3), (97, 131, 3), (480, 640, 3)]
+GRAY_SHAPES = [(1, 1), (97, 131)]
+
+# Ops whose reference only takes RGB input
+RGB_ONLY = {'_apply_color_tint'}
+
+BACKENDS = [(name, backend) for name, impls in backends.available().items() for backend in impls]
+
+
+def _sample(shape):
+    return np.random.default_rng(1).integers(0, 256, shape, dtype=np.uint8)
+
+
+def _dispatcher(name):
+    """The public, dispatched function of a registered op"""
+    for module in (ops, utils):
+        fn = getattr(module, name, None)
+        if fn is not None:
+            return fn
+    raise LookupError(name)
+
+
+def _max_diff(a, b):
+    assert a.shape == b.shape and a.dtype == b.dtype
+    return int(np.abs(a.astype(np.int32) - b.astype(np.int32)).max())
+
+
+@pytest.fixture
+def restore_backends(monkeypatch):
+    """Undo pins and the parsed PROCESSING_BACKENDS after a test"""
+    monkeypatch.setattr(backends, '_env_loaded', False)
+    monkeypatch.setattr(backends, '_preferred', [])
+    pinned = {name: op.pinned for name, op in backends._ops.items()}
+    yield monkeypatch
+    for name, backend in pinned.items():
+        backends._ops[name].pinned = backend
+
+
+@pytest.mark.parametrize('shape', SHAPES + GRAY_SHAPES, ids=str)
+@pytest.mark.parametrize('name', list(backends.available()))
+def test_cross_check_within_tolerance(name, shape):
+    if len(shape) == 2 and name in RGB_ONLY:
+        pytest.skip(f"{name} takes RGB input only")
+    tolerance = backends._ops[name].tolerance
+    diffs = backends.cross_check(name, _sample(shape))
+    assert set(diffs) == set(backends.available()[name])
+    assert all(diff <= tolerance for diff in diffs.values()), diffs
+
+
+@pytest.mark.parametrize('name,backend', BACKENDS)
+def test_pinned_backend_matches_reference(restore_backends, name, backend):
+    op = backends._ops[name]
+    fn = _dispatcher(name)
+    for shape in SHAPES + ([] if name in RGB_ONLY else GRAY_SHAPES):
+        img = _sample(shape)
+        backends.pin(name, backend)
+        result = fn(img, **op.sample_kwargs)
+        backends.pin(name, None)
+        assert _max_diff(result, op.impls[backends.REFERENCE](img, **op.sample_kwargs)) <= op.tolerance
+
+
+@pytest.mark.parametrize('name,backend', BACKENDS)
+def test_env_selected_backend_matches_reference(restore_backends, name, backend):
+    restore_backends.setenv(backends.ENV_VAR, f'{name}={backend}')
+    op = backends._ops[name]
+    img = _sample(SHAPES[2])
+    result = _dispatcher(name)(img, **op.sample_kwargs)
+    assert op.pinned == backend
+    assert _max_diff(result, op.impls[backends.REFERENCE](img, **op.sample_kwargs)) <= op.tolerance
+
+
+@pytest.mark.parametrize('backend', sorted({b for _, b in BACKENDS} - {backends.REFERENCE}))
+def test_env_preferred_backend_is_used(restore_backends, backend):
+    restore_backends.setenv(backends.ENV_VAR, backend)
+    for name, impls in backends.available().items():
+        if backend not in impls:
+            continue
+        op = backends._ops[name]
+        calls = []
+        impl = op.impls[backend]
+        restore_backends.setitem(op.impls, backend, lambda *a, **k: calls.append(1) or impl(*a, **k))
+        img = _sample(SHAPES[2])
+        result = _dispatcher(name)(img, **op.sample_kwargs)
+        assert calls
+        assert _max_diff(result, op.impls[backends.REFERENCE](img, **op.sample_kwargs)) <= op.tolerance
+
+
+def test_unknown_env_entries_are_ignored(restore_backends):
+    restore_backends.setenv(backends.ENV_VAR, 'invert=nope,no_such_op=numpy')
+    with pytest.warns(UserWarning):
+        ops.invert(_sample(SHAPES[1]))
+    assert backends._ops['invert'].pinned is None
+
+
+def test_env_loaded_once_across_threads(restore_backends):
+    restore_backends.setenv(backends.ENV_VAR, 'opencv,numpy')
+    img = _sample(SHAPES[1])
+    barrier = threading.Barrier(8)
+
+    def first_call():
+        barrier.wait()
+        ops.invert(img)
+
+    threads = [threading.Thread(target=first_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backends._preferred == ['opencv', 'numpy']
+
+
+@pytest.mark.parametrize('name', list(backends.available()))
+def test_calibration_picks_an_exact_backend(restore_backends, name):
+    op = backends._ops[name]
+    restore_backends.setattr(op, 'selected', {})
+    restore_backends.setattr(op, 'timings', {})
+    size = backends.SIZE_CLASSES[0][0]
+    backend = backends._calibrate_op(op, size)
+    img = backends._sample(backends.SIZE_CLASSES[0][2])
+    assert backends.cross_check(name, img)[backend] == 0
+
+
+def test_select_applies_choices_without_calibrating(restore_backends):
+    op = backends._ops['invert']
+    restore_backends.setattr(op, 'selected', {})
+    restore_backends.setattr(backends, '_calibrate_op', lambda *a: pytest.fail('calibrated'))
+    backends.select({'invert': {size: backends.REFERENCE for size, _, _ in backends.SIZE_CLASSES}})
+    img = _sample(SHAPES[2])
+    assert np.array_equal(ops.invert(img), 255 - img)
+    with pytest.raises(ValueError):
+        backends.select({'invert': {'small': 'nope'}})
+
+
+def test_calibrate_for_returns_the_ops_used(restore_backends):
+    op = backends._ops['invert']
+    restore_backends.setattr(op, 'selected', {})
+    choices = backends.calibrate_for(ops.invert)
+    assert set(choices['invert']) == {size for size, _, _ in backends.SIZE_CLASSES}
@@ -0,0 +1,106 @@
+"""
+Check processing.history.History under a memory budget.
+
+Results the budget pushes out, whether spilled to disk or dropped and
+replayed, must come back equal to what was pushed; the root and the current
+entry are never released, and undone steps leave no spill files behind.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing.history import History  # noqa: E402
+
+SHAPE = (97, 131, 3)
+TILE_SIZE = 32
+STEPS = 12
+
+
+def _shift(img, amount):
+    """Deterministic op that changes every tile"""
+    return (img.astype(np.int32) + amount).astype(np.uint8)
+
+
+def _root():
+    return np.random.default_rng(0).integers(0, 256, SHAPE, dtype=np.uint8)
+
+
+def _build(budget_bytes, spill_dir=None, steps=STEPS):
+    """A history of steps shifts by 1..steps and the results that were pushed"""
+    history = History(budget_bytes, TILE_SIZE, keyframe_interval=4, spill_dir=spill_dir)
+    img = _root()
+    history.reset(img)
+    results = [img]
+    for amount in range(1, steps + 1):
+        img = _shift(img, amount)
+        history.push(img, _shift, (amount,))
+        results.append(img)
+    return history, results
+
+
+@pytest.fixture(params=['drop', 'spill'])
+def spill_dir(request, tmp_path):
+    return None if request.param == 'drop' else str(tmp_path)
+
+
+def test_evicted_results_come_back_equal(spill_dir):
+    # Room for about two results besides the current one
+    history, results = _build(2 * _root().nbytes, spill_dir)
+    assert any(entry.storage != 'memory' for entry in history.entries)
+    for entry, expected in zip(reversed(history.entries), reversed(results)):
+        assert np.array_equal(history.image(entry), expected)
+
+
+def test_memory_stays_within_budget(spill_dir):
+    budget = 3 * _root().nbytes
+    history = History(budget, TILE_SIZE, keyframe_interval=4, spill_dir=spill_dir)
+    img = _root()
+    history.reset(img)
+    for amount in range(1, STEPS + 1):
+        img = _shift(img, amount)
+        history.push(img, _shift, (amount,))
+        assert history.memory_bytes() <= budget
+    for entry in history.entries:
+        history.image(entry)
+        assert history.memory_bytes() <= budget
+
+
+def test_root_and_current_are_never_released(spill_dir):
+    history = History(0, TILE_SIZE, keyframe_interval=4, spill_dir=spill_dir)
+    img = _root()
+    history.reset(img)
+    for amount in range(1, STEPS + 1):
+        img = _shift(img, amount)
+        history.push(img, _shift, (amount,))
+        assert history.root.storage == 'memory'
+        assert history.current.storage == 'memory'
+        assert all(entry.storage != 'memory' for entry in history.entries[1:-1])
+    while history.undo() is not None:
+        history.image()
+        assert history.root.storage == 'memory'
+    assert np.array_equal(history.image(), _root())
+
+
+def test_push_after_undo_drops_redo_steps_and_spill_files(tmp_path):
+    history, results = _build(0, str(tmp_path))
+    for _ in range(STEPS - 2):
+        history.undo()
+    redo = history.entries[history.index + 1:]
+    spilled = [entry._spilled for entry in redo if entry._spilled is not None]
+    assert spilled and all(os.path.exists(path) for path in spilled)
+
+    pushed = _shift(history.image(), 100)
+    entry = history.push(pushed, _shift, (100,))
+    assert history.entries[-1] is entry and not history.can_redo()
+    assert len(history.entries) == 4
+    assert not any(e in history.entries for e in redo)
+    assert not any(os.path.exists(path) for path in spilled)
+    assert np.array_equal(history.image(), pushed)
+    assert np.array_equal(history.image(history.entries[1]), results[1])
@@ -5,13 +5,32 @@ from PyQt5.QtCore import Qt, QRectF
 from PyQt5 import uic
 from processing.qt import pixmap_to_numpy, numpy_to_pixmap
 from processing import ops
+from processing.arithmetic import ResizeCache, ensure_same_dimensions
+from processing.utils import _readonly
+from processing.decode_cache import load_image
+from processing.preview import PreviewPyramid
+from ui.jobs import BackgroundWriter, JobRunner
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 UI_DIR = os.path.join(BASE_DIR, 'ui')
 
+# Alignment combo box text -> processing.arithmetic policy
+ALIGNMENT_POLICIES = {
+    'Stretch': 'stretch',
+    'Letterbox': 'letterbox',
+    'Center Crop': 'center-crop',
+    'Tile': 'tile',
+}
+
+
+def _run_aligned(fn, cache, policy, input1, input2, *args):
+    """Fit input2 to input1 through the dialog's resize cache, then run fn"""
+    input1, input2 = ensure_same_dimensions(input1, input2, policy, cache)
+    return fn(input1, input2, *args)
+
 
 class ArithmeticDialog(QDialog):
-    def __init__(self, parent=None, input_image=None):
+    def __init__(self, parent=None, input_image=None, input_array=None):
         super().__init__(parent)
         uic.loadUi(os.path.join(UI_DIR, 'ArithmeticDialog.ui'), self)
 
@@ -38,11 +57,35 @@ class ArithmeticDialog(QDialog):
         self._input1_pixmap = input_image
         self._input2_pixmap = None
         self._output_pixmap = None
+        self._output_array = None
+        # Read-only arrays of the inputs, converted once per loaded image
+        if input_array is None and input_image is not None and not input_image.isNull():
+            input_array = pixmap_to_numpy(input_image)
+        self._input1_array = _readonly(input_array)
+        self._input2_array = None
+        # Downscaled copies of the inputs for live previews
+        self._input1_pyramid = None
+        self._input2_pyramid = None
+        self._output_stale = False
+        # Save was requested while the output was stale; it continues once
+        # the full-resolution render has finished
+        self._save_pending = False
+        # Input 2 resized to Input 1, reused across operations and previews
+        self._resize_cache = ResizeCache()
 
         # Load initial image if provided
         if input_image:
             self._display_pixmap_on_input1(input_image)
 
+        # Operations run off the GUI thread
+        self._jobs = JobRunner(self)
+        self._jobs.finished.connect(self._on_job_finished)
+        self._jobs.failed.connect(self._on_job_failed)
+        self._jobs.busy_changed.connect(self._on_job_busy)
+        self._writer = BackgroundWriter(self)
+        self._writer.saved.connect(self._on_saved)
+        self._writer.failed.connect(self._on_save_failed)
+
         # Connect signals
         self.pushButtonLoadInput1.clicked.connect(self._load_input1)
         self.pushButtonLoadInput2.clicked.connect(self._load_input2)
@@ -51,6 +94,14 @@ class ArithmeticDialog(QDialog):
         self.comboBoxOperation.currentTextChanged.connect(self._on_operation_changed)
         self.comboBoxType.currentTextChanged.connect(self._on_type_changed)
 
+        # Live preview while parameters change; Execute renders full resolution
+        self.comboBoxOperation.currentTextChanged.connect(self._update_preview)
+        self.comboBoxType.currentTextChanged.connect(self._update_preview)
+        self.doubleSpinBoxAlpha.valueChanged.connect(self._update_preview)
+        self.doubleSpinBoxBeta.valueChanged.connect(self._update_preview)
+        self.doubleSpinBoxConstant.valueChanged.connect(self._update_preview)
+        self.comboBoxAlignment.currentTextChanged.connect(self._update_preview)
+
         # Initialize UI state
         self._on_operation_changed()
         self._on_type_changed()
@@ -92,12 +143,18 @@ class ArithmeticDialog(QDialog):
         )
         if not file_path:
             return
-        pixmap = QPixmap(file_path)
-        if pixmap.isNull():
+        try:
+            arr = load_image(file_path, keep_depth=True)
+        except ValueError:
             QMessageBox.warning(self, 'Error', 'Cannot load the selected image.')
             return
+        pixmap = numpy_to_pixmap(arr)
         self._input1_pixmap = pixmap
+        self._input1_array = _readonly(arr)
+        self._input1_pyramid = None
+        self._resize_cache.clear()
         self._display_pixmap_on_input1(pixmap)
+        self._update_preview()
 
     def _load_input2(self):
         """Load image for input 2"""
@@ -109,15 +166,29 @@ class ArithmeticDialog(QDialog):
         )
         if not file_path:
             return
-        pixmap = QPixmap(file_path)
-        if pixmap.isNull():
+        try:
+            arr = load_image(file_path, keep_depth=True)
+        except ValueError:
             QMessageBox.warning(self, 'Error', 'Cannot load the selected image.')
             return
+        pixmap = numpy_to_pixmap(arr)
         self._input2_pixmap = pixmap
+        self._input2_array = _readonly(arr)
+        self._input2_pyramid = None
+        self._resize_cache.clear()
         self._display_pixmap_on_input2(pixmap)
+        self._update_preview()
 
     def _save_output(self):
         """Save output image"""
+        if self._output_stale and self._input1_array is not None:
+            # Render the previewed settings at full resolution in the
+            # background; _on_job_finished asks for the file name afterwards
+            fn, args = self._selected_operation(self._input1_array, self._input2_array)
+            if fn is not None:
+                self._save_pending = True
+                self._jobs.submit(fn, *args, label=self.comboBoxOperation.currentText())
+                return
         if self._output_pixmap is None or self._output_pixmap.isNull():
             QMessageBox.information(self, 'Save', 'No output image to save.')
             return
@@ -146,13 +217,15 @@ class ArithmeticDialog(QDialog):
             if not any(file_path.lower().endswith(ext) for ext in ['.tif', '.tiff']):
                 file_path += '.png'  # Default to PNG if no extension
 
-        try:
-            if self._output_pixmap.save(file_path):
-                QMessageBox.information(self, 'Save', f'Image saved successfully to:\n{file_path}')
-            else:
-                QMessageBox.warning(self, 'Save', f'Failed to save the image to:\n{file_path}\n\nPlease check file permissions and try again.')
-        except Exception as e:
-            QMessageBox.warning(self, 'Save', f'Error saving image:\n{str(e)}')
+        # Grayscale results are written as single-channel images; encoding
+        # runs on the writer thread and the outcome is reported when it ends
+        self._writer.save(file_path, self._output_array, quality=95)
+
+    def _on_saved(self, file_path):
+        QMessageBox.information(self, 'Save', f'Image saved successfully to:\n{file_path}')
+
+    def _on_save_failed(self, file_path, message):
+        QMessageBox.warning(self, 'Save', f'Error saving image:\n{message}')
 
     def _on_operation_changed(self):
         """Handle operation combo box change"""
@@ -174,62 +247,121 @@ class ArithmeticDialog(QDialog):
         operation_type = self.comboBoxType.currentText()
         if operation_type == "Image + Constant":
             self.doubleSpinBoxConstant.setEnabled(True)
+            self.comboBoxAlignment.setEnabled(False)
         else:
             self.doubleSpinBoxConstant.setEnabled(False)
+            self.comboBoxAlignment.setEnabled(True)
+
+    def _selected_operation(self, input1_arr, input2_arr):
+        """Return (fn, args) for the selected operation, or (None, message) if it cannot run"""
+        operation = self.comboBoxOperation.currentText()
+        operation_type = self.comboBoxType.currentText()
+
+        if operation_type == "Image + Image":
+            if input2_arr is None:
+                return None, 'Please load Input 2 image for image-to-image operations.'
+
+            image_ops = {
+                "Add": ops.add_images,
+                "Subtract": ops.subtract_images,
+                "Multiply": ops.multiply_images,
+                "Divide": ops.divide_images,
+                "Absolute Difference": ops.absolute_difference,
+                "Blend": ops.blend_images,
+            }
+            if operation in image_ops:
+                args = ()
+                if operation == "Blend":
+                    args = (self.doubleSpinBoxAlpha.value(), self.doubleSpinBoxBeta.value())
+                policy = ALIGNMENT_POLICIES[self.comboBoxAlignment.currentText()]
+                return _run_aligned, (image_ops[operation], self._resize_cache, policy,
+                                      input1_arr, input2_arr) + args
+
+        else:  # Image + Constant
+            constant = self.doubleSpinBoxConstant.value()
+
+            if operation == "Add":
+                return ops.add_constant, (input1_arr, constant)
+            elif operation == "Subtract":
+                return ops.subtract_constant, (input1_arr, constant)
+            elif operation == "Multiply":
+                return ops.multiply_constant, (input1_arr, constant)
+            elif operation == "Divide":
+                return ops.divide_constant, (input1_arr, constant)
+
+        return None, f'Operation failed: {operation} is not available for {operation_type}.'
 
     def _execute_operation(self):
-        """Execute the selected arithmetic operation"""
-        if self._input1_pixmap is None:
+        """Execute the selected arithmetic operation at full resolution"""
+        if self._input1_array is None:
             QMessageBox.warning(self, 'Error', 'Please load Input 1 image.')
             return
 
-        operation = self.comboBoxOperation.currentText()
-        operation_type = self.comboBoxType.currentText()
+        fn, args = self._selected_operation(self._input1_array, self._input2_array)
+        if fn is None:
+            QMessageBox.warning(self, 'Error', args)
+            return
 
-        try:
-            if operation_type == "Image + Image":
-                if self._input2_pixmap is None:
-                    QMessageBox.warning(self, 'Error', 'Please load Input 2 image for image-to-image operations.')
-                    return
-
-                input1_arr = pixmap_to_numpy(self._input1_pixmap)
-                input2_arr = pixmap_to_numpy(self._input2_pixmap)
-
-                if operation == "Add":
-                    result = ops.add_images(input1_arr, input2_arr)
-                elif operation == "Subtract":
-                    result = ops.subtract_images(input1_arr, input2_arr)
-                elif operation == "Multiply":
-                    result = ops.multiply_images(input1_arr, input2_arr)
-                elif operation == "Divide":
-                    result = ops.divide_images(input1_arr, input2_arr)
-                elif operation == "Absolute Difference":
-                    result = ops.absolute_difference(input1_arr, input2_arr)
-                elif operation == "Blend":
-                    alpha = self.doubleSpinBoxAlpha.value()
-                    beta = self.doubleSpinBoxBeta.value()
-                    result = ops.blend_images(input1_arr, input2_arr, alpha, beta)
-
-            else:  # Image + Constant
-                input1_arr = pixmap_to_numpy(self._input1_pixmap)
-                constant = self.doubleSpinBoxConstant.value()
-
-                if operation == "Add":
-                    result = ops.add_constant(input1_arr, constant)
-                elif operation == "Subtract":
-                    result = ops.subtract_constant(input1_arr, constant)
-                elif operation == "Multiply":
-                    result = ops.multiply_constant(input1_arr, constant)
-                elif operation == "Divide":
-                    result = ops.divide_constant(input1_arr, constant)
-
-            # Convert result back to pixmap and display
-            result_pixmap = numpy_to_pixmap(result)
-            self._output_pixmap = result_pixmap
-            self._display_pixmap_on_output(result_pixmap)
+        # Run in the background; a new click supersedes a pending one
+        self._jobs.submit(fn, *args, label=self.comboBoxOperation.currentText())
 
+    def _update_preview(self, *_):
+        """Render the selected operation on view-sized copies of the inputs"""
+        if self._input1_array is None:
+            return
+        viewport = self.graphicsViewOutput.viewport().size()
+        if self._input1_pyramid is None:
+            self._input1_pyramid = PreviewPyramid(self._input1_array)
+        input1_level = self._input1_pyramid.level_for(viewport.width(), viewport.height())
+        input2_level = None
+        if self._input2_array is not None:
+            if self._input2_pyramid is None:
+                self._input2_pyramid = PreviewPyramid(self._input2_array)
+            input2_level = self._input2_pyramid.level_for(input1_level.shape[1], input1_level.shape[0])
+
+        fn, args = self._selected_operation(input1_level, input2_level)
+        if fn is None:
+            return
+        try:
+            preview = fn(*args)
         except Exception as e:
-            QMessageBox.warning(self, 'Error', f'Operation failed: {str(e)}')
+            # Do not leave an earlier preview up as if it were this operation's result
+            self._output_scene.clear()
+            self._output_stale = True
+            self.labelOutput.setText(f'Output (preview failed: {e})')
+            return
+        self.labelOutput.setText('Output')
+        # The committed output no longer matches what is shown
+        self._output_stale = True
+
+        # Stretch the preview over the full-size rect so the view does not jump on commit
+        full_h, full_w = self._input1_array.shape[:2]
+        self._output_scene.clear()
+        item = self._output_scene.addPixmap(numpy_to_pixmap(preview))
+        item.setTransformationMode(Qt.SmoothTransformation)
+        item.setScale(full_w / preview.shape[1])
+        rect = QRectF(0, 0, full_w, full_h)
+        self._output_scene.setSceneRect(rect)
+        self.graphicsViewOutput.fitInView(rect, Qt.KeepAspectRatio)
+
+    def _on_job_finished(self, result):
+        """Convert result back to pixmap and display"""
+        result_pixmap = numpy_to_pixmap(result)
+        self._output_pixmap = result_pixmap
+        self._output_array = result
+        self._output_stale = False
+        self.labelOutput.setText('Output')
+        self._display_pixmap_on_output(result_pixmap)
+        if self._save_pending:
+            self._save_pending = False
+            self._save_output()
+
+    def _on_job_failed(self, message):
+        self._save_pending = False
+        QMessageBox.warning(self, 'Error', f'Operation failed: {message}')
+
+    def _on_job_busy(self, busy, label):
+        self.setCursor(Qt.BusyCursor if busy else Qt.ArrowCursor)
 
     def resizeEvent(self, event):
         """Handle window resize to keep images fitted"""
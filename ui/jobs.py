@@ -0,0 +1,122 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _JobSignals(QObject):
+    """Signals emitted from the worker thread, delivered on the GUI thread"""
+    done = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+
+
+class _Job(QRunnable):
+    """Runs fn(*args, **kwargs) on a pool thread"""
+
+    def __init__(self, job_id, fn, args, kwargs):
+        super().__init__()
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _JobSignals()
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(self.job_id, str(e))
+            return
+        self.signals.done.emit(self.job_id, result)
+
+
+class JobRunner(QObject):
+    """Runs one processing job at a time off the GUI thread
+
+    Submitting while a job is running queues the new job and replaces any
+    job still waiting, so rapid clicks only compute the latest request.
+    The running job cannot be interrupted mid-computation; when it is
+    cancelled or superseded its result is dropped instead of delivered.
+    """
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    busy_changed = pyqtSignal(bool, str)
+
+    def __init__(self, parent=None, pool: QThreadPool = None):
+        super().__init__(parent)
+        self._pool = pool or QThreadPool.globalInstance()
+        self._next_id = 0
+        self._running = None   # (job id, signals) of the job in flight
+        self._pending = None   # (fn, args, kwargs, label)
+        self._wanted = None    # id whose result should be delivered
+
+    def is_busy(self) -> bool:
+        return self._running is not None
+
+    def submit(self, fn, *args, label: str = '', **kwargs):
+        """Run fn(*args, **kwargs) in the background; supersedes earlier requests"""
+        self._pending = (fn, args, kwargs, label)
+        if self._running is None:
+            self._start_pending()
+        else:
+            # Result of the job in flight is stale now
+            self._wanted = None
+
+    def cancel(self):
+        """Drop the waiting job and discard the result of the running one"""
+        self._pending = None
+        self._wanted = None
+        if self._running is not None:
+            self.busy_changed.emit(False, '')
+
+    def _start_pending(self):
+        fn, args, kwargs, label = self._pending
+        self._pending = None
+        self._next_id += 1
+        job = _Job(self._next_id, fn, args, kwargs)
+        job.signals.done.connect(self._on_done)
+        job.signals.error.connect(self._on_error)
+        # Keep the signals object alive until its queued results are delivered
+        self._running = (job.job_id, job.signals)
+        self._wanted = job.job_id
+        self.busy_changed.emit(True, label)
+        self._pool.start(job)
+
+    def _job_ended(self, job_id) -> bool:
+        """Bookkeeping when a job ends; returns whether its outcome should be reported"""
+        wanted = job_id == self._wanted
+        self._running = None
+        self._wanted = None
+        if self._pending is not None:
+            self._start_pending()
+        elif wanted:
+            self.busy_changed.emit(False, '')
+        return wanted
+
+    def _on_done(self, job_id, result):
+        if self._job_ended(job_id):
+            self.finished.emit(result)
+
+    def _on_error(self, job_id, message):
+        if self._job_ended(job_id):
+            self.failed.emit(message)
+
+
+class BackgroundWriter(QObject):
+    """Saves arrays with processing.io on its writer thread, reporting on the GUI thread"""
+
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def save(self, file_path: str, arr, **options):
+        """Queue arr to be encoded to file_path; options go to processing.io.write_image"""
+        from processing.io import write_image_async
+        future = write_image_async(file_path, arr, **options)
+        # Runs on the writer thread; the signals are queued to this object's thread
+        future.add_done_callback(lambda f: self._report(file_path, f))
+
+    def _report(self, file_path, future):
+        error = future.exception()
+        if error is None:
+            self.saved.emit(file_path)
+        else:
+            self.failed.emit(file_path, str(error))
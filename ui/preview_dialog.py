@@ -0,0 +1,66 @@
+from PyQt5.QtWidgets import (QDialog, QFormLayout, QHBoxLayout, QSlider, QDoubleSpinBox,
+                             QDialogButtonBox, QVBoxLayout, QWidget)
+from PyQt5.QtCore import Qt
+
+
+class PreviewDialog(QDialog):
+    """Sliders for an operation's parameters with a live preview callback
+
+    params is a list of (name, label, minimum, maximum, default, decimals).
+    on_change is called with the current values each time a parameter moves,
+    so the caller can render a downscaled preview; the caller runs the
+    full-resolution operation only after the dialog is accepted.
+    """
+
+    def __init__(self, parent, title, params, on_change=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self._on_change = on_change
+        self._spins = {}
+
+        form = QFormLayout()
+        for name, label, minimum, maximum, default, decimals in params:
+            scale = 10 ** decimals
+            slider = QSlider(Qt.Horizontal)
+            slider.setRange(int(round(minimum * scale)), int(round(maximum * scale)))
+            slider.setValue(int(round(default * scale)))
+            spin = QDoubleSpinBox()
+            spin.setDecimals(decimals)
+            spin.setRange(minimum, maximum)
+            spin.setSingleStep(1.0 / scale)
+            spin.setValue(default)
+            # Keep slider and spin box in sync without feedback loops
+            slider.valueChanged.connect(lambda v, s=spin, k=scale: s.setValue(v / k))
+            spin.valueChanged.connect(lambda v, s=slider, k=scale: self._sync_slider(s, v, k))
+            spin.valueChanged.connect(self._emit_change)
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            row_layout.addWidget(slider, 1)
+            row_layout.addWidget(spin)
+            form.addRow(label, row)
+            self._spins[name] = (spin, decimals)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(buttons)
+        self.setMinimumWidth(360)
+
+    @staticmethod
+    def _sync_slider(slider, value, scale):
+        slider.blockSignals(True)
+        slider.setValue(int(round(value * scale)))
+        slider.blockSignals(False)
+
+    def _emit_change(self, *_):
+        if self._on_change:
+            self._on_change(self.values())
+
+    def values(self) -> dict:
+        """Current parameter values; integer parameters are returned as int"""
+        return {name: (spin.value() if decimals else int(spin.value()))
+                for name, (spin, decimals) in self._spins.items()}